@@ -0,0 +1,225 @@
+"""Precomputed business-day / ISO-week calendar.
+
+For a range of years the table holds, as NumPy arrays:
+- a cumulative working-day count per calendar day (any inclusive date span costs two lookups),
+- ISO week start dates and working days per week, indexed by (year, week),
+- working days per month and the working-day overlap of every (week, month) pair.
+
+Working days are Monday-Friday minus an optional plant holiday list. The holiday file is read
+from HOLIDAYS_FILE_PATH (default: holidays.txt in the repository root), one YYYY-MM-DD per line;
+text after the date and lines starting with '#' are ignored.
+"""
+import os
+import pathlib
+from datetime import date
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_HOLIDAYS = ROOT / 'holidays.txt'
+
+WEEKS_PER_YEAR = 53
+# data-driven range extension stops this far from the current year (guards against junk years)
+MAX_YEARS_AROUND = 50
+_ONE_DAY = np.timedelta64(1, 'D')
+
+
+def _monday(days: np.ndarray) -> np.ndarray:
+    """Monday of the ISO week containing each datetime64[D] (1970-01-01 was a Thursday)."""
+    n = days.astype('datetime64[D]').astype(np.int64)
+    return (n - (n + 3) % 7).astype('datetime64[D]')
+
+
+def load_holidays(path: pathlib.Path) -> list:
+    """Read holiday dates from a text/CSV file; returns [] when the file is missing."""
+    out = []
+    try:
+        lines = pathlib.Path(path).read_text(encoding='utf-8-sig').splitlines()
+    except (OSError, ValueError):
+        return out
+    for line in lines:
+        token = line.strip().replace(';', ',').split(',')[0].split(' ')[0]
+        if not token or token.startswith('#'):
+            continue
+        try:
+            out.append(date.fromisoformat(token))
+        except ValueError:
+            continue
+    return out
+
+
+class BusinessCalendar:
+    """Working-day and ISO-week lookup tables for years first_year..last_year."""
+
+    def __init__(self, first_year: int, last_year: int, holidays=()):
+        self.first_year = int(first_year)
+        self.last_year = int(last_year)
+        self.holidays = np.array(sorted({np.datetime64(h, 'D') for h in holidays}), dtype='datetime64[D]')
+
+        # day axis with a week of margin so ISO weeks crossing the range edges are covered
+        self.origin = np.datetime64(date(self.first_year, 1, 1), 'D') - np.timedelta64(7, 'D')
+        self.end = np.datetime64(date(self.last_year, 12, 31), 'D') + np.timedelta64(8, 'D')
+        days = np.arange(self.origin, self.end, dtype='datetime64[D]')
+        self.cum_workdays = np.concatenate([[0], np.cumsum(np.is_busday(days, holidays=self.holidays))]).astype(np.int64)
+
+        # ISO weeks, [year - first_year, week - 1]
+        years = np.arange(self.first_year, self.last_year + 2)
+        jan4 = np.array([np.datetime64(f'{y:04d}-01-04', 'D') for y in years])
+        week1 = _monday(jan4)
+        self.weeks_in_year = ((week1[1:] - week1[:-1]) // np.timedelta64(7, 'D')).astype(np.int64)
+        offsets = np.arange(WEEKS_PER_YEAR) * np.timedelta64(7, 'D')
+        starts = week1[:-1, None] + offsets[None, :]
+        self.week_valid = np.arange(WEEKS_PER_YEAR)[None, :] < self.weeks_in_year[:, None]
+        self.week_start = np.where(self.week_valid, starts, np.datetime64('NaT'))
+        safe = np.where(self.week_valid, starts, week1[:-1, None])
+        self.week_workdays = np.where(self.week_valid, self.workdays(safe, safe + np.timedelta64(6, 'D')), 0)
+
+        # months, flat index (year - first_year) * 12 + month - 1
+        self.month_first = np.arange(np.datetime64(f'{self.first_year:04d}-01', 'M'),
+                                     np.datetime64(f'{self.last_year + 1:04d}-01', 'M')).astype('datetime64[D]')
+        self.month_last = (self.month_first.astype('datetime64[M]') + 1).astype('datetime64[D]') - _ONE_DAY
+        self.month_workdays = self.workdays(self.month_first, self.month_last)
+
+        # (week, month) overlap: a week touches at most two consecutive months, so each week stores
+        # the flat index and working-day overlap of its first and second month (equal when it does not split)
+        base_month = np.datetime64(f'{self.first_year:04d}-01', 'M')
+        s = self.week_start.ravel()
+        e = s + np.timedelta64(6, 'D')
+        valid = self.week_valid.ravel()
+        s_month = s.astype('datetime64[M]')
+        self.week_month1 = np.where(valid, (s_month - base_month).astype(np.int64), -1)
+        self.week_month2 = np.where(valid, (e.astype('datetime64[M]') - base_month).astype(np.int64), -1)
+        split_end = np.where(self.week_month1 == self.week_month2, e, (s_month + 1).astype('datetime64[D]') - _ONE_DAY)
+        self.week_overlap1 = np.zeros(len(s), dtype=np.int64)
+        self.week_overlap1[valid] = self.workdays(s[valid], split_end[valid])
+        self.week_overlap2 = self.week_workdays.ravel() - self.week_overlap1
+
+    def covers(self, year: int) -> bool:
+        return self.first_year <= int(year) <= self.last_year
+
+    def week_index(self, years, weeks) -> np.ndarray:
+        """Flat week index for each (ISO year, week); -1 where the week does not exist or is out of range."""
+        y = np.asarray(years, dtype=np.int64) - self.first_year
+        w = np.asarray(weeks, dtype=np.int64) - 1
+        n_years = self.last_year - self.first_year + 1
+        ok = (y >= 0) & (y < n_years) & (w >= 0) & (w < WEEKS_PER_YEAR)
+        idx = np.where(ok, y * WEEKS_PER_YEAR + w, -1)
+        ok[ok] = self.week_valid.ravel()[idx[ok]]
+        return np.where(ok, idx, -1)
+
+    def week_starts(self, week_idx) -> np.ndarray:
+        idx = np.asarray(week_idx, dtype=np.int64)
+        out = np.full(idx.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        ok = idx >= 0
+        out[ok] = self.week_start.ravel()[idx[ok]]
+        return out
+
+    def week_range(self, year: int, week: int) -> tuple:
+        """ISO week (Monday, Sunday) as dates; raises ValueError for non-existent weeks."""
+        if not self.covers(year):
+            return date.fromisocalendar(year, week, 1), date.fromisocalendar(year, week, 7)
+        idx = int(self.week_index([year], [week])[0])
+        if idx < 0:
+            raise ValueError(f'Nieprawidłowy tydzień ISO: {year}-{week}')
+        start = self.week_start.ravel()[idx].item()
+        return start, date.fromordinal(start.toordinal() + 6)
+
+    def workdays(self, starts, ends) -> np.ndarray:
+        """Working days in each inclusive [start, end] span (0 when end < start)."""
+        s = np.asarray(starts, dtype='datetime64[D]')
+        e = np.asarray(ends, dtype='datetime64[D]')
+        if s.size and (s.min() < self.origin or e.max() >= self.end):
+            return np.maximum(np.busday_count(s, e + _ONE_DAY, holidays=self.holidays), 0)
+        i = (s - self.origin).astype(np.int64)
+        j = (e - self.origin).astype(np.int64) + 1
+        return np.maximum(self.cum_workdays[np.maximum(j, i)] - self.cum_workdays[i], 0)
+
+    def workdays_between(self, start: date, end: date) -> int:
+        return int(self.workdays(np.datetime64(start, 'D'), np.datetime64(end, 'D')))
+
+    def month_index(self, year: int, month: int) -> int:
+        """Flat month index, or -1 when the month is outside the table."""
+        if not self.covers(year):
+            return -1
+        return (int(year) - self.first_year) * 12 + int(month) - 1
+
+    def working_days_in_month(self, year: int, month: int) -> int:
+        m = self.month_index(year, month)
+        if m < 0:
+            first = np.datetime64(f'{int(year):04d}-{int(month):02d}', 'M')
+            return int(self.workdays(first.astype('datetime64[D]'), (first + 1).astype('datetime64[D]') - _ONE_DAY))
+        return int(self.month_workdays[m])
+
+    def range_weights(self, week_idx, first: date, last: date) -> tuple:
+        """For weeks `week_idx`, return (touches, overlap working days) against the span [first, last].
+
+        Whole months inside the table use the precomputed (week, month) columns; other spans use
+        the cumulative working-day array.
+        """
+        idx = np.asarray(week_idx, dtype=np.int64)
+        first_d = np.datetime64(first, 'D')
+        last_d = np.datetime64(last, 'D')
+        m = self.month_index(first.year, first.month)
+        if m >= 0 and first_d == self.month_first[m] and last_d == self.month_last[m]:
+            in1 = self.week_month1[idx] == m
+            in2 = (self.week_month2[idx] == m) & ~in1
+            overlap = np.where(in1, self.week_overlap1[idx], 0) + np.where(in2, self.week_overlap2[idx], 0)
+            return in1 | in2, overlap
+        starts = self.week_start.ravel()[idx]
+        ends = starts + np.timedelta64(6, 'D')
+        touches = (ends >= first_d) & (starts <= last_d)
+        overlap = np.zeros(len(idx), dtype=np.int64)
+        if touches.any():
+            overlap[touches] = self.workdays(np.maximum(starts[touches], first_d), np.minimum(ends[touches], last_d))
+        return touches, overlap
+
+
+_calendar = None
+
+
+def _default_years() -> tuple:
+    this_year = date.today().year
+    try:
+        first = int(os.environ.get('CALENDAR_FIRST_YEAR', this_year - 5))
+        last = int(os.environ.get('CALENDAR_LAST_YEAR', this_year + 5))
+    except ValueError:
+        first, last = this_year - 5, this_year + 5
+    return first, last
+
+
+def holidays_path() -> pathlib.Path:
+    v = os.environ.get('HOLIDAYS_FILE_PATH')
+    if not v:
+        return DEFAULT_HOLIDAYS
+    p = pathlib.Path(v)
+    return p if p.is_absolute() else (ROOT / p).resolve()
+
+
+def get_calendar(min_year: int = None, max_year: int = None) -> BusinessCalendar:
+    """Return the shared calendar, rebuilding it (once) when a wider year range is needed."""
+    global _calendar
+    cal = _calendar
+    if cal is None:
+        first, last = _default_years()
+    else:
+        first, last = cal.first_year, cal.last_year
+    this_year = date.today().year
+    if min_year is not None:
+        first = min(first, max(int(min_year), this_year - MAX_YEARS_AROUND))
+    if max_year is not None:
+        last = max(last, min(int(max_year), this_year + MAX_YEARS_AROUND))
+    if cal is None or first != cal.first_year or last != cal.last_year:
+        holidays = cal.holidays if cal is not None else load_holidays(holidays_path())
+        cal = BusinessCalendar(first, last, holidays)
+        _calendar = cal
+    return cal
+
+
+def reset_calendar(holidays=None) -> BusinessCalendar:
+    """Rebuild the shared calendar, re-reading the holiday file unless `holidays` is given."""
+    global _calendar
+    first, last = _default_years()
+    if _calendar is not None:
+        first, last = min(first, _calendar.first_year), max(last, _calendar.last_year)
+    _calendar = BusinessCalendar(first, last, load_holidays(holidays_path()) if holidays is None else holidays)
+    return _calendar
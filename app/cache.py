@@ -1,48 +1,329 @@
+"""Columnar on-disk cache for normalized tables.
+
+Each cached table is a directory holding one file per column: numeric, boolean and datetime
+columns are raw ``.npy`` arrays opened with ``mmap_mode='r'`` (pages are shared through the OS
+cache between workers and restarts), everything else is dictionary-encoded as int32 codes plus a
+JSON list of distinct values. ``meta.json`` is written last and the directory is renamed into place, so
+a reader never sees a half-written table. The index is not stored; tables load with a RangeIndex.
+
+The directory is bounded: after every write the least recently used tables (by meta.json mtime,
+refreshed on each hit) are evicted until the total fits CACHE_MAX_MB. Keys use a content
+fingerprint instead of the mtime unless CACHE_FINGERPRINT=0, because SMB shares report new mtimes
+for files that were merely copied or touched.
+"""
 import hashlib
-import pickle
+import json
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
+import pandas as pd
+
 CACHE_DIR = Path(__file__).resolve().parent.parent / '.cache'
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+FORMAT_VERSION = 1
+_META = 'meta.json'
+_ARRAY_KINDS = 'biufcmM'
+# leftovers of interrupted writes older than this are removed by the sweep
+_STALE_TMP_SECONDS = 3600
+_FINGERPRINT_BLOCK = 64 * 1024
+_ZIP_MAGIC = b'PK\x03\x04'
+
+_lock = threading.Lock()
+_fingerprints = {}
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'write_errors': 0, 'evictions': 0, 'evicted_bytes': 0}
+
+
+def _max_bytes() -> int:
+    try:
+        return max(0, int(float(os.environ.get('CACHE_MAX_MB', '512')) * 1024 * 1024))
+    except ValueError:
+        return 512 * 1024 * 1024
+
+
+def _use_fingerprint() -> bool:
+    return os.environ.get('CACHE_FINGERPRINT', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _lock:
+        _stats[name] += n
+
+
+def file_fingerprint(path: Path, st=None) -> str:
+    """Size plus a content hash; remembered per (path, mtime, size).
+
+    A zip (.xlsx) is sampled: its first and last 64 KiB, where the tail holds the central
+    directory with a CRC of every member, so any content change alters the fingerprint while a
+    bare touch/copy does not. Other files (the Scalanie CSV) have no such summary and are hashed
+    whole.
+    """
+    st = st or path.stat()
+    version = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _fingerprints.get(str(path))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        head = fh.read(_FINGERPRINT_BLOCK)
+        h.update(head)
+        if head.startswith(_ZIP_MAGIC):
+            if st.st_size > _FINGERPRINT_BLOCK:
+                fh.seek(max(_FINGERPRINT_BLOCK, st.st_size - _FINGERPRINT_BLOCK))
+                h.update(fh.read(_FINGERPRINT_BLOCK))
+        else:
+            for block in iter(lambda: fh.read(1024 * 1024), b''):
+                h.update(block)
+    fp = f"{st.st_size}-{h.hexdigest()}"
+    with _lock:
+        _fingerprints[str(path)] = (version, fp)
+    return fp
+
 
 def _meta_for(path: Path) -> str:
     try:
         st = path.stat()
+        if _use_fingerprint():
+            return 'fp-' + file_fingerprint(path, st)
         return f"{int(st.st_mtime)}-{st.st_size}"
     except Exception:
         return "no-meta"
 
 
-def _cache_path_for(path: Path) -> Path:
-    key = str(path.resolve()).encode('utf-8') + b'|' + _meta_for(path).encode('utf-8')
-    h = hashlib.sha256(key).hexdigest()
-    return CACHE_DIR / f"{h}.pkl"
+def _table_dir(path: Path, name: str) -> Path:
+    # the table name is part of the key: several sheets/tables come from the same workbook
+    key = '|'.join([str(Path(path).resolve()), _meta_for(Path(path)), name, str(FORMAT_VERSION)])
+    return CACHE_DIR / hashlib.sha256(key.encode('utf-8')).hexdigest()
 
 
-def load_df(path: Path):
-    """Load DataFrame from cache if available. Returns None if not cached."""
-    cache_file = _cache_path_for(path)
-    if cache_file.exists():
-        try:
-            with open(cache_file, 'rb') as fh:
-                return pickle.load(fh)
-        except Exception:
-            try:
-                cache_file.unlink()
-            except Exception:
-                pass
-    return None
+def _json_value(v):
+    """Dictionary entries keep JSON-native types; anything else is stored as text."""
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, np.generic):
+        return v.item()
+    return str(v)
+
+
+def _remove(path: Path) -> None:
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def write_table(target: Path, columns: dict, info: Optional[dict] = None) -> bool:
+    """Write 1-D arrays (all of equal length) as a table directory at `target`.
+
+    Returns False when `target` already exists (an identical table was written concurrently).
+    """
+    tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    _remove(tmp)
+    tmp.mkdir(parents=True)
+    try:
+        meta = {'format': FORMAT_VERSION, **(info or {}), 'rows': None, 'columns': []}
+        for i, (col, values) in enumerate(columns.items()):
+            arr = np.asarray(values)
+            if meta['rows'] is None:
+                meta['rows'] = len(arr)
+            elif len(arr) != meta['rows']:
+                raise ValueError(f'column {col!r} has {len(arr)} rows, expected {meta["rows"]}')
+            entry = {'name': _json_value(col), 'file': f'c{i}.npy'}
+            if arr.dtype.kind in _ARRAY_KINDS:
+                entry['kind'] = 'array'
+                np.save(tmp / entry['file'], np.ascontiguousarray(arr), allow_pickle=False)
+            else:
+                codes, uniques = pd.factorize(pd.Series(arr, dtype=object), use_na_sentinel=True)
+                entry['kind'] = 'dict'
+                entry['values'] = [_json_value(u) for u in uniques]
+                np.save(tmp / entry['file'], codes.astype(np.int32), allow_pickle=False)
+            meta['columns'].append(entry)
+        meta['rows'] = meta['rows'] or 0
+        with open(tmp / _META, 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh, ensure_ascii=False)
+        if target.exists():
+            _remove(tmp)
+            return False
+        os.replace(tmp, target)
+    except Exception:
+        _remove(tmp)
+        raise
+    return True
+
+
+def read_table(table: Path) -> dict:
+    """Memory-map the table directory `table` as {column: array}; raises when it is missing or damaged."""
+    with open(table / _META, encoding='utf-8') as fh:
+        meta = json.load(fh)
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError('unsupported cache format')
+    out = {}
+    for entry in meta['columns']:
+        arr = np.load(table / entry['file'], mmap_mode='r', allow_pickle=False)
+        if entry['kind'] == 'dict':
+            # code -1 (missing) picks the trailing None
+            values = np.empty(len(entry['values']) + 1, dtype=object)
+            values[:-1] = entry['values']
+            arr = values[arr]
+        if len(arr) != meta['rows']:
+            raise ValueError('truncated column')
+        out[entry['name']] = arr
+    return out
+
+
+def _store(target: Path, columns: dict, info: dict) -> None:
+    try:
+        written = write_table(target, columns, info)
+    except Exception:
+        _count('write_errors')
+        raise
+    if not written:
+        # an identical table was written concurrently; keep the existing one
+        return
+    _count('writes')
+    sweep(keep=target)
 
 
-def save_df(path: Path, df) -> None:
-    cache_file = _cache_path_for(path)
+def _load(table: Path) -> Optional[dict]:
+    meta_file = table / _META
+    if not meta_file.exists():
+        _count('misses')
+        return None
     try:
-        with open(cache_file, 'wb') as fh:
-            pickle.dump(df, fh)
+        out = read_table(table)
     except Exception:
+        _remove(table)
+        _count('misses')
+        return None
+    try:
+        # the meta.json mtime is the LRU clock
+        os.utime(meta_file)
+    except OSError:
+        pass
+    _count('hits')
+    return out
+
+
+def save_columns(path: Path, name: str, columns: dict) -> None:
+    """Store 1-D arrays (all of equal length) as table `name` for source file `path`."""
+    _store(_table_dir(path, name), columns, {'source': str(path), 'table': name})
+
+
+def load_columns(path: Path, name: str) -> Optional[dict]:
+    """Memory-map table `name` for `path`; returns {column: array} or None when not cached."""
+    return _load(_table_dir(path, name))
+
+
+def _content_dir(digest: str, name: str) -> Path:
+    key = '|'.join(['content', digest, name, str(FORMAT_VERSION)])
+    return CACHE_DIR / hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def save_content_df(digest: str, name: str, df: pd.DataFrame) -> None:
+    """Store table `name` derived from content with hash `digest` (e.g. one sheet), whatever file it came from."""
+    _store(_content_dir(digest, name), {c: df[c].to_numpy() for c in df.columns}, {'digest': digest, 'table': name})
+
+
+def load_content_df(digest: str, name: str) -> Optional[pd.DataFrame]:
+    columns = _load(_content_dir(digest, name))
+    if columns is None:
+        return None
+    return pd.DataFrame(columns, copy=False)
+
+
+def save_df(path: Path, name: str, df: pd.DataFrame) -> None:
+    save_columns(path, name, {c: df[c].to_numpy() for c in df.columns})
+
+
+def load_df(path: Path, name: str) -> Optional[pd.DataFrame]:
+    """Load cached table `name` for `path` as a DataFrame backed by the mapped arrays, or None."""
+    columns = load_columns(path, name)
+    if columns is None:
+        return None
+    return pd.DataFrame(columns, copy=False)
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for f in path.iterdir():
         try:
-            cache_file.unlink()
-        except Exception:
+            total += f.stat().st_size
+        except OSError:
             pass
+    return total
+
+
+def _entries() -> tuple:
+    """(last_used, size, path) for every finished table, plus stale leftovers to delete."""
+    entries, junk = [], []
+    now = time.time()
+    for p in CACHE_DIR.iterdir():
+        try:
+            if p.is_file():
+                # pickles from the previous cache format
+                if p.suffix == '.pkl':
+                    junk.append(p)
+                continue
+            meta = p / _META
+            if meta.exists():
+                entries.append((meta.stat().st_mtime, _dir_size(p), p))
+            elif now - p.stat().st_mtime > _STALE_TMP_SECONDS:
+                junk.append(p)
+        except OSError:
+            continue
+    return entries, junk
+
+
+def sweep(keep: Optional[Path] = None, max_bytes: Optional[int] = None) -> int:
+    """Evict least recently used tables until the cache fits the budget; returns bytes evicted."""
+    budget = _max_bytes() if max_bytes is None else max_bytes
+    try:
+        entries, junk = _entries()
+    except OSError:
+        return 0
+    for p in junk:
+        if p.is_file():
+            try:
+                p.unlink()
+            except OSError:
+                pass
+        else:
+            _remove(p)
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, p in sorted(entries, key=lambda e: e[0]):
+        if total <= budget:
+            break
+        if keep is not None and p == keep:
+            continue
+        try:
+            # drop meta.json first: the table is invalid even if mapped files cannot be removed yet
+            # (Windows keeps them open while a process maps them; the next sweep retries)
+            (p / _META).unlink()
+        except OSError:
+            continue
+        _remove(p)
+        total -= size
+        evicted += size
+        _count('evictions')
+    if evicted:
+        _count('evicted_bytes', evicted)
+    return evicted
+
+
+def stats() -> dict:
+    """Hit/miss/write/eviction counters plus the current size of the cache directory."""
+    with _lock:
+        out = dict(_stats)
+    try:
+        entries, _ = _entries()
+    except OSError:
+        entries = []
+    out['entries'] = len(entries)
+    out['bytes'] = sum(size for _, size, _ in entries)
+    out['max_bytes'] = _max_bytes()
+    out['fingerprint'] = _use_fingerprint()
+    return out
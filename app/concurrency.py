@@ -0,0 +1,94 @@
+"""Bounded executor and single-flight deduplication for blocking loaders.
+
+Excel parsing and NAS `stat()` calls block, so endpoints hand them to LOADER_POOL instead of
+running them on the event loop. SingleFlight makes concurrent callers with the same key share
+one in-flight call: the first caller runs it, the others wait for its result (async callers
+wait without occupying a pool thread).
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def _pool_size() -> int:
+    try:
+        return max(1, int(os.environ.get('LOADER_THREADS', '4')))
+    except ValueError:
+        return 4
+
+
+# threads rather than processes: the loaders fill module-level caches that requests read
+LOADER_POOL = ThreadPoolExecutor(max_workers=_pool_size(), thread_name_prefix='loader')
+
+
+class SingleFlight:
+    """Share one execution of `fn` between concurrent callers using the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _claim(self, key):
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            return fut, True
+
+    def _run(self, key, fut: Future, fn):
+        try:
+            result = fn()
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn):
+        """Run `fn()` in the calling thread, or wait for the call already running under `key`."""
+        fut, leader = self._claim(key)
+        if not leader:
+            return fut.result()
+        return self._run(key, fut, fn)
+
+    async def do_async(self, key, fn, executor=None):
+        """Run `fn()` in `executor` (default LOADER_POOL), or await the call already running under `key`."""
+        fut, leader = self._claim(key)
+        if leader:
+            pool = executor or LOADER_POOL
+            try:
+                pool.submit(self._run_quiet, key, fut, fn)
+            except BaseException as exc:
+                # e.g. pool already shut down: release waiters instead of leaving them hanging
+                with self._lock:
+                    self._calls.pop(key, None)
+                fut.set_exception(exc)
+        return await asyncio.wrap_future(fut)
+
+    def _run_quiet(self, key, fut, fn):
+        # the exception is delivered through `fut`; don't let the executor log it a second time
+        try:
+            self._run(key, fut, fn)
+        except BaseException:
+            pass
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable in LOADER_POOL and await its result (in a copy of the caller's context)."""
+    loop = asyncio.get_running_loop()
+    # the copy carries the pinned snapshot and the request's stage timings into the thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(LOADER_POOL, functools.partial(ctx.run, fn, *args, **kwargs))
@@ -0,0 +1,184 @@
+"""Group -> display name (NazwaUrz.) table from Scalanie17.xlsx or scalanie_group_name.csv.
+
+Scalanie17.xlsx lists machines with their resource group ('Grupa zasobów') and name
+('NazwaUrz.'), possibly over several sheets. Every sheet is streamed with only those two columns,
+turned into normalized (group, name) pairs, and the pairs become one row per group with its
+unique names sorted and joined with ';' - the same table scripts/merge_scalanie17.py writes to
+scalanie_group_name.csv, which stays readable as a fallback source.
+
+The pairs of each sheet are cached under a digest of the sheet's cell data and the shared strings
+it references (sheet_digests), so after an edit only the sheets that changed are parsed again.
+"""
+import hashlib
+import logging
+import pathlib
+import posixpath
+import re
+import zipfile
+from typing import Optional
+from xml.etree import ElementTree
+
+import pandas as pd
+from openpyxl.reader.strings import read_string_table
+
+from .xlsx_reader import open_workbook, read_columns
+
+EXCLUDE_STR = {"nan", "none"}
+SEPARATOR = ';'
+PAIRS_TABLE = 'scalanie_pairs'
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+# <c ... t="s"><v>N</v>: cell holding shared string N
+_SHARED_CELL = re.compile(rb'<(?:\w+:)?c\s[^>]*?\bt=["\']s["\'][^>]*>\s*<(?:\w+:)?v>(\d+)<')
+
+
+def find_columns(columns) -> tuple:
+    """(group column, name column) among `columns`; either may be None."""
+    low_map = {str(c).lower(): c for c in columns}
+    group_col = next((orig for k, orig in low_map.items() if "grupa" in k and "zasob" in k), None)
+    if group_col is None:
+        group_col = next((orig for k, orig in low_map.items() if "grupa" in k), None)
+    name_col = next((orig for k, orig in low_map.items()
+                     if "nazwa" in k and any(x in k for x in ("urz", "urzad", "urząd"))), None)
+    if name_col is None:
+        name_col = next((orig for k, orig in low_map.items() if any(x in k for x in ("nazwa", "urz", "urzad"))), None)
+    return group_col, name_col
+
+
+def _text(values) -> pd.Series:
+    s = pd.Series(values)
+    if s.dtype.kind == 'f':
+        # a numeric column with blanks is float: 100.0 is group '100'
+        s = s.astype(object).where(s.isna() | (s % 1 != 0), s.round().astype('Int64').astype(object))
+    return s.astype(object).fillna("").astype(str).str.strip()
+
+
+def empty_pairs() -> pd.DataFrame:
+    return pd.DataFrame({'group': pd.Series(dtype=object), 'name': pd.Series(dtype=object)})
+
+
+def sheet_pairs(df: pd.DataFrame) -> pd.DataFrame:
+    """Unique normalized (group, name) pairs of one sheet; an excluded or empty name becomes ''."""
+    group_col, name_col = find_columns(df.columns)
+    if group_col is None or df.empty:
+        return empty_pairs()
+    group = _text(df[group_col].to_numpy())
+    if name_col is not None:
+        name = _text(df[name_col].to_numpy())
+        name = name.where(~name.str.lower().isin(EXCLUDE_STR), "")
+    else:
+        name = pd.Series([""] * len(df), dtype=object)
+    return pd.DataFrame({'group': group, 'name': name}).drop_duplicates(ignore_index=True)
+
+
+def merge_pairs(pairs: pd.DataFrame) -> pd.DataFrame:
+    """One row per group (sorted) with its unique non-empty names sorted and joined: columns group,names."""
+    if pairs.empty:
+        return pd.DataFrame(columns=['group', 'names'])
+    pairs = pairs.drop_duplicates()
+    groups = pd.Index(pairs['group'].unique()).sort_values()
+    named = pairs[pairs['name'] != ""].sort_values(['group', 'name'])
+    names = named.groupby('group', sort=False)['name'].agg(SEPARATOR.join)
+    return pd.DataFrame({'group': groups, 'names': names.reindex(groups, fill_value="").to_numpy()})
+
+
+def _select(names) -> list:
+    return [c for c in find_columns(names) if c is not None]
+
+
+def _part(target: str) -> str:
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def _sheet_data(xml: bytes) -> bytes:
+    # selection, zoom and column widths change when the file is merely opened and saved
+    start, end = xml.find(b'sheetData'), xml.rfind(b'sheetData')
+    return xml[start:end] if 0 <= start < end else xml
+
+
+def sheet_digests(path: pathlib.Path) -> dict:
+    """{sheet name: digest of its cells} in workbook order, read from the zip without parsing cells."""
+    with zipfile.ZipFile(path) as zf:
+        rels = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+        targets = {r.get('Id'): r.get('Target') for r in rels}
+        kinds = {r.get('Type', '').rsplit('/', 1)[-1]: _part(r.get('Target')) for r in rels}
+        strings = []
+        if kinds.get('sharedStrings') in zf.namelist():
+            with zf.open(kinds['sharedStrings']) as fh:
+                strings = read_string_table(fh)
+        # a cell's style decides whether a number reads as a date
+        styles = hashlib.sha1(zf.read(kinds['styles'])).digest() if kinds.get('styles') in zf.namelist() else b''
+        out = {}
+        for sheet in ElementTree.fromstring(zf.read('xl/workbook.xml')).iter(_MAIN_NS + 'sheet'):
+            data = _sheet_data(zf.read(_part(targets[sheet.get(_REL_ID)])))
+            h = hashlib.sha1(styles)
+            h.update(data)
+            for i in sorted({int(v) for v in _SHARED_CELL.findall(data)}):
+                h.update(b'\0' + str(strings[i]).encode('utf-8'))
+            out[sheet.get('name')] = h.hexdigest()
+    return out
+
+
+def read_workbook_pairs(path: pathlib.Path, cache: bool = True) -> list:
+    """[(sheet name, pairs, reused)] for every sheet of `path`, reading only the group and name columns.
+
+    A sheet whose digest has cached pairs is not opened (reused=True); the workbook is opened only
+    when at least one sheet has to be read.
+    """
+    from .cache import load_content_df, save_content_df
+
+    digests = {}
+    if cache:
+        try:
+            digests = sheet_digests(path)
+        except Exception:
+            # an unusual package layout only disables reuse
+            logging.getLogger(__name__).debug("Brak skrótów arkuszy dla %s", path, exc_info=True)
+    out, wb = [], None
+    try:
+        if not digests:
+            wb = open_workbook(path)
+        for title in digests or wb.sheetnames:
+            digest = digests.get(title)
+            pairs = None
+            if digest is not None:
+                try:
+                    pairs = load_content_df(digest, PAIRS_TABLE)
+                except Exception:
+                    pairs = None
+            if pairs is not None:
+                out.append((title, pairs, True))
+                continue
+            if wb is None:
+                wb = open_workbook(path)
+            pairs = sheet_pairs(read_columns(wb[title], _select))
+            if digest is not None:
+                try:
+                    save_content_df(digest, PAIRS_TABLE, pairs)
+                except Exception:
+                    # the cache is an optimization only
+                    pass
+            out.append((title, pairs, False))
+    finally:
+        if wb is not None:
+            wb.close()
+    return out
+
+
+def read_table(path: pathlib.Path) -> pd.DataFrame:
+    """group,names table from Scalanie17.xlsx or from a CSV with group and names (or name) columns."""
+    path = pathlib.Path(path)
+    if path.suffix.lower() == '.csv':
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        name_col: Optional[str] = 'names' if 'names' in df.columns else ('name' if 'name' in df.columns else None)
+        if 'group' not in df.columns or name_col is None:
+            raise ValueError(f"Brak kolumn group/names w pliku: {path}")
+        return pd.DataFrame({'group': _text(df['group'].to_numpy()), 'names': _text(df[name_col].to_numpy())})
+    sheets = [pairs for _, pairs, _ in read_workbook_pairs(path)]
+    return merge_pairs(pd.concat(sheets, ignore_index=True) if sheets else empty_pairs())
+
+
+def display_map(table: pd.DataFrame) -> dict:
+    """Lower-cased group -> display name."""
+    return {str(g).strip().lower(): str(n).strip() for g, n in zip(table['group'], table['names'])}
@@ -0,0 +1,304 @@
+"""Vectorized load cube used by /devices and /availability.
+
+Availability and aggregated production are joined once per data snapshot into dense
+(device x week) arrays, where the week axis holds every valid (iso_year, week) pair found in
+the availability sheet and load comes from the groups app.resolver matched to each device.
+Month selections are then answered with per-week overlap weights
+instead of per-row DataFrame masks.
+
+Month selections are composed from per-month partial sums memoized on the cube (one cube per
+snapshot): prorated sums add up across months, full sums add up except for the week straddling
+the boundary of two selected adjacent months, which is subtracted once.
+
+The (group x week) production sums the device load is built from stay on the cube, so a what-if
+change of group load (aggregate_delta) touches only the devices matched to the changed groups.
+
+Arbitrary date ranges (range_sums) use per-device prefix sums built on first use: full sums over a
+contiguous weekly grid, prorated sums over working days with each week's value spread evenly over
+its working days. Any range then costs two lookups per device, whatever its length.
+"""
+import calendar as _calendar
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .business_calendar import get_calendar
+from .metrics import stage
+from .resolver import build_resolver
+
+
+class LoadCube:
+    """Dense (device, week) arrays of availability hours, availability row counts and matched load.
+
+    `load` holds the production load of the device's resolved groups for one availability row of that cell; rows that are
+    duplicated in the availability sheet count their load once per row, as the per-row loop did.
+    `group_load` holds the production sums per (resolver group, week) that `load` was built from.
+    """
+
+    def __init__(self, calendar, devices, week_years, week_numbers, week_index, hours, rows, load, resolver=None,
+                 group_load=None):
+        self.calendar = calendar
+        self.devices = list(devices)
+        self.resolver = resolver
+        self.week_years = week_years
+        self.week_numbers = week_numbers
+        self.week_index = week_index
+        self.week_starts = calendar.week_starts(week_index)
+        self.hours = hours
+        self.rows = rows
+        self.load = load
+        self.row_load = rows * load
+        n_groups = len(resolver.groups) if resolver is not None else 0
+        self.group_load = group_load if group_load is not None else np.zeros((n_groups, len(week_index)), dtype=float)
+        self._group_devices = None
+        self._week_pos = None
+        self._prefix = None
+        self._prefix_lock = threading.Lock()
+        self._months = OrderedDict()
+        self._months_lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return self.hours.shape
+
+    def cell_load(self, device_idx, years, weeks) -> np.ndarray:
+        """Matched load for each (device, year, week); 0 for weeks outside the axis.
+
+        `device_idx` is one device index or an array of them, one per (year, week).
+        """
+        pos = np.array([self.week_position(y, w) for y, w in zip(years, weeks)], dtype=np.int64)
+        out = np.zeros(len(pos), dtype=float)
+        ok = pos >= 0
+        dev = np.broadcast_to(np.asarray(device_idx, dtype=np.int64), pos.shape)
+        out[ok] = self.load[dev[ok], pos[ok]]
+        return out
+
+    def week_position(self, year, week) -> int:
+        """Position of (year, week) on the week axis, -1 when the availability sheet has no such week."""
+        if self._week_pos is None:
+            self._week_pos = {(int(y), int(w)): i for i, (y, w) in enumerate(zip(self.week_years, self.week_numbers))}
+        return self._week_pos.get((int(year), int(week)), -1)
+
+    def group_devices(self, group_idx: int) -> np.ndarray:
+        """Indices of the devices whose load includes resolver group `group_idx`."""
+        if self._group_devices is None:
+            d, g = self.resolver.pairs()
+            order = np.argsort(g, kind='stable')
+            bounds = np.searchsorted(g[order], np.arange(len(self.group_load) + 1))
+            self._group_devices = (d[order], bounds)
+        devices, bounds = self._group_devices
+        return devices[bounds[group_idx]:bounds[group_idx + 1]]
+
+    def aggregate_delta(self, deltas, month_ranges) -> tuple:
+        """Change of load_full / load_prorated per device when group loads change by `deltas`.
+
+        `deltas` is a list of (group_idx, week_pos, hours); weeks outside the axis carry no load,
+        as in build_load_cube. Returns (device indices, load_full delta, load_prorated delta) for
+        the devices whose sums change.
+        """
+        included, factor = self.week_weights(month_ranges)
+        dev, week, delta = [], [], []
+        for g, w, h in deltas:
+            if w < 0 or not h:
+                continue
+            d = self.group_devices(g)
+            dev.append(d)
+            week.append(np.full(len(d), w, dtype=np.int64))
+            # a cell counts its load once per availability row
+            delta.append(self.rows[d, w] * float(h))
+        if not dev:
+            empty = np.empty(0, dtype=float)
+            return np.empty(0, dtype=np.int64), empty, empty
+        dev, week, delta = np.concatenate(dev), np.concatenate(week), np.concatenate(delta)
+        uniq, inv = np.unique(dev, return_inverse=True)
+        d_full = np.bincount(inv, weights=delta * included[week], minlength=len(uniq))
+        d_prorated = np.bincount(inv, weights=delta * factor[week], minlength=len(uniq))
+        changed = (d_full != 0) | (d_prorated != 0)
+        return uniq[changed], d_full[changed], d_prorated[changed]
+
+    def week_weights(self, month_ranges) -> tuple:
+        """Return (included, factor) per week for the given list of (first_day, last_day) ranges.
+
+        `included` marks weeks overlapping any range; `factor` is the share of the week's working
+        days falling inside the ranges (summed over ranges, so repeated months count repeatedly).
+        """
+        cal = self.calendar
+        included = np.zeros(len(self.week_index), dtype=bool)
+        overlap_days = np.zeros(len(self.week_index), dtype=np.int64)
+        for first, last in month_ranges:
+            touches, overlap = cal.range_weights(self.week_index, first, last)
+            included |= touches
+            overlap_days += overlap
+        week_days = cal.week_workdays.ravel()[self.week_index]
+        factor = np.zeros(len(self.week_index), dtype=float)
+        ok = (week_days > 0) & (overlap_days > 0)
+        factor[ok] = overlap_days[ok] / week_days[ok]
+        return included, factor
+
+    def aggregate(self, month_ranges) -> dict:
+        """Sum full and prorated hours/load per device over weeks overlapping `month_ranges`."""
+        included, factor = self.week_weights(month_ranges)
+        inc = included.astype(float)
+        return {
+            'present': (self.rows @ included.astype(np.int64)) > 0,
+            'hours_full': self.hours @ inc,
+            'hours_prorated': self.hours @ factor,
+            'load_full': self.row_load @ inc,
+            'load_prorated': self.row_load @ factor,
+        }
+
+    def _prefix_sums(self) -> dict:
+        """Cumulative per-device arrays behind range_sums(), built once per cube.
+
+        They run over the weeks on the axis (and their working days) only, so gaps between the
+        weeks - e.g. one stray year in the sheet - cost nothing.
+        """
+        with self._prefix_lock:
+            if self._prefix is not None:
+                return self._prefix
+            n_dev = len(self.devices)
+            weekly = {}
+            for name, values in (('hours', self.hours), ('load', self.row_load), ('rows', self.rows)):
+                weekly[name] = np.concatenate([np.zeros((n_dev, 1)), np.cumsum(values, axis=1)], axis=1)
+
+            days = (self.week_starts[:, None] + np.arange(7) * np.timedelta64(1, 'D')).ravel()
+            busy = np.is_busday(days, holidays=self.calendar.holidays)
+            workdays = days[busy]
+            day_week = np.repeat(np.arange(len(self.week_starts)), 7)[busy]
+            week_days = self.calendar.week_workdays.ravel()[self.week_index]
+            daily = {}
+            for name, values in (('hours', self.hours), ('load', self.row_load)):
+                dense = values[:, day_week] / week_days[day_week]
+                daily[name] = np.concatenate([np.zeros((n_dev, 1)), np.cumsum(dense, axis=1)], axis=1)
+            self._prefix = {'workdays': workdays, 'weekly': weekly, 'daily': daily}
+            return self._prefix
+
+    def range_sums(self, first: date, last: date) -> dict:
+        """aggregate() for the inclusive span [first, last] from prefix sums (two lookups per device).
+
+        Full sums cover the weeks touching the span; prorated sums count each week's share of
+        working days inside it, as aggregate() does for a month.
+        """
+        p = self._prefix_sums()
+        first_d, last_d = np.datetime64(first, 'D'), np.datetime64(last, 'D')
+        # axis weeks are in date order: those starting in [first - 6 days, last] touch the span
+        gi = int(np.searchsorted(self.week_starts, first_d - np.timedelta64(6, 'D'), side='left'))
+        gj = max(gi, int(np.searchsorted(self.week_starts, last_d, side='right')))
+        di = int(np.searchsorted(p['workdays'], first_d, side='left'))
+        dj = max(di, int(np.searchsorted(p['workdays'], last_d, side='right')))
+        weekly, daily = p['weekly'], p['daily']
+        return {
+            'present': weekly['rows'][:, gj] - weekly['rows'][:, gi] > 0,
+            'hours_full': weekly['hours'][:, gj] - weekly['hours'][:, gi],
+            'hours_prorated': daily['hours'][:, dj] - daily['hours'][:, di],
+            'load_full': weekly['load'][:, gj] - weekly['load'][:, gi],
+            'load_prorated': daily['load'][:, dj] - daily['load'][:, di],
+        }
+
+    MONTH_CACHE_SIZE = 120
+
+    def month_partial(self, year: int, month: int) -> dict:
+        """aggregate() of one calendar month plus its included-week mask, memoized (LRU)."""
+        key = (int(year), int(month))
+        with self._months_lock:
+            hit = self._months.get(key)
+            if hit is not None:
+                self._months.move_to_end(key)
+                return hit
+        first = date(key[0], key[1], 1)
+        last = date(key[0], key[1], _calendar.monthrange(key[0], key[1])[1])
+        part = self.aggregate([(first, last)])
+        part['included'] = self.week_weights([(first, last)])[0]
+        with self._months_lock:
+            self._months[key] = part
+            while len(self._months) > self.MONTH_CACHE_SIZE:
+                self._months.popitem(last=False)
+        return part
+
+    def aggregate_months(self, months) -> dict:
+        """aggregate() for a list of (year, month), composed from cached per-month partials.
+
+        Repeated months count repeatedly in the prorated sums (as in aggregate()); full sums cover
+        the union of weeks, so a week shared by two adjacent selected months is subtracted once.
+        """
+        n_dev = len(self.devices)
+        out = {k: np.zeros(n_dev, dtype=float) for k in ('hours_full', 'hours_prorated', 'load_full', 'load_prorated')}
+        out['present'] = np.zeros(n_dev, dtype=bool)
+        distinct = sorted(set((int(y), int(m)) for y, m in months))
+        parts = {ym: self.month_partial(*ym) for ym in distinct}
+        for ym in months:
+            part = parts[(int(ym[0]), int(ym[1]))]
+            out['hours_prorated'] += part['hours_prorated']
+            out['load_prorated'] += part['load_prorated']
+        for ym in distinct:
+            part = parts[ym]
+            out['hours_full'] += part['hours_full']
+            out['load_full'] += part['load_full']
+            out['present'] |= part['present']
+            nxt = (ym[0] + ym[1] // 12, ym[1] % 12 + 1)
+            if nxt in parts:
+                shared = part['included'] & parts[nxt]['included']
+                if shared.any():
+                    out['hours_full'] -= self.hours[:, shared].sum(axis=1)
+                    out['load_full'] -= self.row_load[:, shared].sum(axis=1)
+        return out
+
+
+def build_load_cube(avail_df: pd.DataFrame, prod_df: pd.DataFrame, calendar=None, extra_groups=()) -> LoadCube:
+    """Join normalized availability (device/year/week/hours) with production (group/year/week/praca_tpz).
+
+    Devices are matched to groups once by a GroupResolver (see app.resolver), which the cube keeps
+    for the other endpoints; `extra_groups` adds group names that only appear elsewhere (part store).
+    """
+    av = avail_df[avail_df['device'].notna()]
+    dev_codes, devices = pd.factorize(av['device'], sort=True)
+    years = av['year'].to_numpy(dtype=np.int64)
+    weeks = av['week'].to_numpy(dtype=np.int64)
+
+    # week axis: distinct valid (year, week) pairs; rows with non-existent ISO weeks are dropped
+    pair_codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([years, weeks]), sort=True)
+    pair_years = np.asarray(pairs.get_level_values(0), dtype=np.int64)
+    pair_weeks = np.asarray(pairs.get_level_values(1), dtype=np.int64)
+    if calendar is None:
+        calendar = get_calendar(pair_years.min(), pair_years.max()) if len(pair_years) else get_calendar()
+    pair_cal_idx = calendar.week_index(pair_years, pair_weeks)
+    valid_pairs = pair_cal_idx >= 0
+    axis_pos = np.cumsum(valid_pairs) - 1
+    week_years = pair_years[valid_pairs]
+    week_numbers = pair_weeks[valid_pairs]
+    week_index = pair_cal_idx[valid_pairs]
+
+    keep = valid_pairs[pair_codes]
+    d_idx = dev_codes[keep]
+    w_idx = axis_pos[pair_codes[keep]]
+    n_dev, n_week = len(devices), len(week_index)
+    hours = np.zeros((n_dev, n_week), dtype=float)
+    rows = np.zeros((n_dev, n_week), dtype=np.int64)
+    np.add.at(hours, (d_idx, w_idx), av['hours'].to_numpy(dtype=float)[keep])
+    np.add.at(rows, (d_idx, w_idx), 1)
+
+    prod_groups = prod_df['group'].astype(str).to_numpy() if prod_df is not None and len(prod_df) else np.empty(0, dtype=object)
+    with stage('match.groups'):
+        resolver = build_resolver(devices, pd.unique(prod_groups), *extra_groups)
+
+    load = np.zeros((n_dev, n_week), dtype=float)
+    g_sum = np.zeros((len(resolver.groups), n_week), dtype=float)
+    if n_dev and n_week and len(prod_groups):
+        week_pos = pd.Series(np.arange(n_week), index=pd.MultiIndex.from_arrays([week_years, week_numbers]))
+        p_keys = pd.MultiIndex.from_arrays([
+            pd.to_numeric(prod_df['year'], errors='coerce').fillna(-1).astype(np.int64),
+            pd.to_numeric(prod_df['week'], errors='coerce').fillna(-1).astype(np.int64),
+        ])
+        p_week = week_pos.reindex(p_keys).to_numpy()
+        on_axis = ~np.isnan(p_week)
+        p_week = p_week[on_axis].astype(np.int64)
+        p_val = pd.to_numeric(prod_df['praca_tpz'], errors='coerce').fillna(0.0).to_numpy(dtype=float)[on_axis]
+        g_codes = pd.Index(resolver.groups).get_indexer(prod_groups[on_axis])
+        np.add.at(g_sum, (g_codes, p_week), p_val)
+        d, g = resolver.pairs()
+        np.add.at(load, d, g_sum[g])
+
+    return LoadCube(calendar, devices, week_years, week_numbers, week_index, hours, rows, load, resolver, g_sum)
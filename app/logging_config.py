@@ -1,29 +1,138 @@
+"""Logging setup: records go through a bounded queue to handlers running on a listener thread.
+
+Callers, the event loop included, only put a record on the queue. Formatting, console and
+rotating-file writes and rotation run on the QueueListener thread, so a slow log disk or share
+does not delay requests. When the queue is full, new records are dropped and counted
+(dropped_records()) instead of blocking.
+
+log_requests (app.main) writes one record per request to the ACCESS_LOGGER logger. The default
+format is a text line. With ACCESS_LOG_FORMAT=json the record becomes one JSON object per line
+carrying the per-request stage timings. ACCESS_LOG=0 turns the access log off.
+"""
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 
+ACCESS_LOGGER = 'app.access'
+DEFAULT_QUEUE_SIZE = 10000
+_FMT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_handler = None
+_listener = None
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def _queue_size() -> int:
+    try:
+        return max(1, int(os.environ.get('LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)))
+    except ValueError:
+        return DEFAULT_QUEUE_SIZE
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a record that does not fit the bounded queue is dropped and counted."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def prepare(self, record):
+        # the queue stays in this process, so the record is handed over as is and formatted on
+        # the listener thread (the stdlib version formats it here, on the caller's thread)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # the queue may be full at shutdown: wait for room instead of raising queue.Full
+        self.queue.put(self._sentinel)
+
+
+class LogFormatter(logging.Formatter):
+    """Text lines; access records as JSON objects when `json_access` is set."""
+
+    def __init__(self, fmt: str = _FMT, json_access: bool = False):
+        super().__init__(fmt)
+        self.json_access = json_access
+
+    def format(self, record):
+        access = getattr(record, 'access', None)
+        if access is None or not self.json_access:
+            return super().format(record)
+        entry = {'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')}
+        entry.update(access)
+        stages = entry.get('stages')
+        if stages:
+            entry['stages'] = {name: round(seconds * 1000, 3) for name, seconds in stages.items()}
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def build_pipeline(handlers, queue_size: int = DEFAULT_QUEUE_SIZE) -> tuple:
+    """(queue handler for loggers, started listener feeding `handlers`)."""
+    q = queue.Queue(maxsize=queue_size)
+    listener = _Listener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    return DroppingQueueHandler(q), listener
+
 
 def setup_logging(log_file: str | Path | None = None, level: int = logging.INFO):
-    """Configure root logger. If log_file is provided, enable rotating file handler.
+    """Configure the root logger once: console (and LOG_FILE / `log_file` rotating file) behind a queue.
 
     Keep this minimal so it works in CI and in packaged exe.
     """
+    global _handler, _listener
+    logging.getLogger(ACCESS_LOGGER).disabled = not _env_flag('ACCESS_LOG', '1')
     root = logging.getLogger()
     if root.handlers:
         return  # already configured
 
-    fmt = "%(asctime)s %(levelname)s %(name)s: %(message)s"
-    formatter = logging.Formatter(fmt)
-
+    formatter = LogFormatter(json_access=os.environ.get('ACCESS_LOG_FORMAT', 'text').strip().lower() == 'json')
     console = logging.StreamHandler()
     console.setFormatter(formatter)
-    root.addHandler(console)
+    handlers = [console]
 
+    log_file = log_file or os.environ.get('LOG_FILE')
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         fh = logging.handlers.RotatingFileHandler(str(log_path), maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8')
         fh.setFormatter(formatter)
-        root.addHandler(fh)
+        handlers.append(fh)
 
+    _handler, _listener = build_pipeline(handlers, _queue_size())
+    root.addHandler(_handler)
     root.setLevel(level)
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+def queue_depth() -> int:
+    return _handler.queue.qsize() if _handler is not None else 0
@@ -1,16 +1,33 @@
 from fastapi import FastAPI, HTTPException, Query, Body, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 import shutil
 from pydantic import BaseModel
-from typing import List, Optional
+from starlette.routing import Match
+from typing import Annotated, List, Optional
+import numpy as np
 import pandas as pd
 import os
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 import calendar
+import math
 import pathlib
+import threading
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from .business_calendar import get_calendar, reset_calendar, holidays_path
+from .concurrency import SingleFlight, run_blocking
+from .snapshot import DataSnapshot, SnapshotManager, signature_entry
+from .resolver import DepartmentIndex, device_key, row_index
+from .response_cache import ResponseCache, etag_matches, make_etag, query_key
+from .serialize import JSONBytes, check_fields, dumps, records
+from . import display_names, metrics, shared
+from .logging_config import ACCESS_LOGGER, dropped_records, queue_depth, setup_logging
+from .metrics import stage
+from .xlsx_reader import open_workbook, read_columns
 # initialize logging early
 try:
-    from .logging_config import setup_logging
     setup_logging()
 except Exception:
     # fail silently in environments where logging can't be configured
@@ -37,9 +54,11 @@ def _resolve_path_from_env(varname: str, default_path: pathlib.Path) -> pathlib.
 # Default files: prefer network share on NAS1 (can still be overridden via env vars)
 DEFAULT_DATA = pathlib.Path(r"\\nas1\PRODUKCJA\DostepnoscWTygodniach.xlsx")
 DEFAULT_PROD = pathlib.Path(r"\\nas1\PRODUKCJA\Raport_dane.xlsx")
+DEFAULT_SCALANIE = pathlib.Path(r"\\nas1\PRODUKCJA\Scalanie17.xlsx")
 
 DATA_FILE = _resolve_path_from_env('DATA_FILE_PATH', DEFAULT_DATA)
 PROD_FILE = _resolve_path_from_env('PROD_FILE_PATH', DEFAULT_PROD)
+SCALANIE_FILE = _resolve_path_from_env('SCALANIE_FILE_PATH', DEFAULT_SCALANIE)
 
 # Directory where users can upload local copies if they don't have UNC access
 ROOT = pathlib.Path(__file__).resolve().parent.parent
@@ -49,26 +68,162 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # Filenames for uploaded overrides
 UPLOADED_PROD_NAME = 'Raport_dane.xlsx'
 UPLOADED_DATA_NAME = 'DostepnoscWTygodniach.xlsx'
+# written by scripts/merge_scalanie17.py; read when Scalanie17.xlsx is not reachable
+SCALANIE_CSV = ROOT / 'scalanie_group_name.csv'
 
-app = FastAPI(title="Dostępność urządzeń")
+@asynccontextmanager
+async def lifespan(_app):
+    # start watching the source files and build the first snapshot in the background
+    snapshots.start()
+    warmup_task = asyncio.create_task(warm_up()) if _warmup_enabled() else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    snapshots.stop()
+
+
+app = FastAPI(title="Dostępność urządzeń", lifespan=lifespan)
+
+
+# GET endpoints whose JSON depends only on the snapshot and the query string
+_CACHED_PATHS = ('/devices', '/device_details')
+_CACHED_PREFIXES = ('/availability/', '/device_parts/')
+responses = ResponseCache()
+
+
+@app.middleware("http")
+async def conditional_get(request, call_next):
+    """ETag / If-None-Match and the rendered-body cache for the read-only JSON endpoints."""
+    path = request.url.path
+    if request.method != 'GET' or not (path in _CACHED_PATHS or path.startswith(_CACHED_PREFIXES)):
+        return await call_next(request)
+    snap = await snapshots.get_async()
+    etag = make_etag(snap.version, path, query_key(request.query_params.multi_items()))
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        responses.count_not_modified()
+        return Response(status_code=304, headers=headers)
+    hit = responses.get(etag)
+    if hit is not None:
+        body, media_type = hit
+        return Response(content=body, media_type=media_type, headers={**headers, 'X-Response-Cache': 'hit'})
+    # the handler reads the same snapshot the ETag was derived from
+    token = snapshots.pin(snap)
+    try:
+        response = await call_next(request)
+    finally:
+        snapshots.unpin(token)
+    if response.status_code != 200:
+        return response
+    if request.query_params.get('format') == 'ndjson':
+        # streamed bodies are passed through (ETag only) so they are never buffered whole
+        response.headers.update(headers)
+        return response
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    media_type = response.headers.get('content-type', 'application/json')
+    responses.put(etag, body, media_type)
+    return Response(content=body, media_type=media_type, headers={**headers, 'X-Response-Cache': 'miss'})
+
+
+# startup warm-up state reported by /health/ready
+_warmup = {'state': 'pending', 'error': None, 'started_at': None, 'finished_at': None, 'duration_ms': None}
+
+
+def _warmup_enabled() -> bool:
+    return os.environ.get('WARMUP', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def _default_views() -> list:
+    """(path, query items, handler, kwargs) of the views rendered ahead of the first user."""
+    today = date.today()
+    month = [f'{today.year:04d}-{today.month:02d}']
+    return [('/devices', [('month', m) for m in month], devices, {'month': month})]
+
+
+async def _prerender(snap, path: str, items: list, handler, kwargs: dict) -> None:
+    # same ETag key as conditional_get, so the first real request is a cache hit
+    etag = make_etag(snap.version, path, query_key(items))
+    token = snapshots.pin(snap)
+    try:
+        response = await handler(**kwargs)
+    finally:
+        snapshots.unpin(token)
+    responses.put(etag, response.body, response.headers.get('content-type', 'application/json'))
+
+
+async def warm_up() -> None:
+    """Build the first snapshot (both workbooks, all indexes) and pre-render the default views.
+
+    Retries every poll interval while the sources cannot be loaded (e.g. the share is offline).
+    """
+    log = logging.getLogger(__name__)
+    _warmup.update(state='running', started_at=time.time(), error=None)
+    while True:
+        try:
+            snap = await snapshots.refresh_async()
+            break
+        except Exception as exc:
+            _warmup['error'] = f'{type(exc).__name__}: {exc}'
+            log.warning('warm-up: loading data failed, retrying in %.0fs: %s', snapshots.poll_interval, _warmup['error'])
+            await asyncio.sleep(snapshots.poll_interval)
+    for path, items, handler, kwargs in _default_views():
+        try:
+            await _prerender(snap, path, items, handler, kwargs)
+        except Exception:
+            log.exception('warm-up: pre-rendering %s failed', path)
+    finished = time.time()
+    _warmup.update(state='ready', error=None, finished_at=finished,
+                   duration_ms=round((finished - _warmup['started_at']) * 1000, 1))
+    log.info('warm-up finished in %.1fms (snapshot %s)', _warmup['duration_ms'], snap.version)
 
 
 # Simple request logging middleware
 @app.middleware("http")
 async def log_requests(request, call_next):
-    import time
-    logger = __import__('logging').getLogger('uvicorn.access')
+    # own logger: uvicorn's access formatter expects its own 5-field records
+    logger = logging.getLogger(ACCESS_LOGGER)
     start = time.time()
+    stages, token = metrics.start_request()
     try:
         response = await call_next(request)
-    except Exception as exc:
+    except Exception:
         duration = (time.time() - start) * 1000
         logger.exception("%s %s -> exception after %.1fms", request.method, request.url.path, duration)
+        metrics.observe_request(request.method, _route_template(request), 500, duration / 1000)
         raise
+    finally:
+        metrics.end_request(token)
     duration = (time.time() - start) * 1000
-    logger.info("%s %s %s %.1fms", request.method, request.url.path, response.status_code, duration)
+    route = _route_template(request)
+    if logger.isEnabledFor(logging.INFO):
+        # `access` is rendered by LogFormatter on the logging thread (JSON with ACCESS_LOG_FORMAT=json)
+        access = {
+            'method': request.method, 'path': request.url.path, 'query': request.url.query, 'route': route,
+            'status': response.status_code, 'duration_ms': round(duration, 3), 'stages': stages,
+            'cache': response.headers.get('X-Response-Cache'),
+            'client': request.client.host if request.client else None,
+        }
+        logger.info("%s %s %s %.1fms", request.method, request.url.path, response.status_code, duration, extra={'access': access})
+    metrics.observe_request(request.method, route, response.status_code, duration / 1000)
+    if stages:
+        # per-stage breakdown for the browser's network panel
+        response.headers['Server-Timing'] = ', '.join(
+            f'{name.replace(".", "-")};dur={seconds * 1000:.1f}' for name, seconds in stages.items())
+    snap = snapshots.current
+    if snap is not None:
+        response.headers['X-Snapshot-Version'] = snap.version
+        response.headers['X-Snapshot-Age'] = f"{snap.age_seconds():.0f}"
     return response
 
+
+def _route_template(request) -> str:
+    # '/availability/{device_id}' rather than one series per device
+    route = request.scope.get('route')
+    if route is None:
+        # answered before routing (response cache hit, 304): the route it would have reached
+        route = next((r for r in app.router.routes if r.matches(request.scope)[0] == Match.FULL), None)
+    return getattr(route, 'path', None) or 'unmatched'
+
  
 
 class DevicePartLoad(BaseModel):
@@ -78,27 +233,23 @@ class DevicePartLoad(BaseModel):
     praca_tpz: float
     order_id: Optional[str] = None
 
+
+PART_FIELDS = check_fields(DevicePartLoad, ('part_number', 'week', 'year', 'praca_tpz', 'order_id'))
+
 @app.get('/device_parts/{device_id}', response_model=List[DevicePartLoad])
-async def device_parts(device_id: str, month: List[str] = Query(...)):
-    """Zwraca obciążenie maszyny po numerze części w wybranych miesiącach."""
+async def device_parts(device_id: str, month: List[str] = Query(...), format: str = Query('json', pattern='^(json|ndjson)$')):
+    """Zwraca obciążenie maszyny po numerze części w wybranych miesiącach.
+
+    `format=ndjson` strumieniuje wiersze (jeden obiekt JSON w linii) prosto z kolumn magazynu części.
+    """
     import traceback
     try:
-        prod_df = pd.read_excel(PROD_FILE, sheet_name='RaportProdukcja')
-        lc = {c.lower(): c for c in prod_df.columns}
-        # heuristics to find columns
-        group_col = next((lc[k] for k in lc if 'grupa' in k and 'zasob' in k), None) or next((lc[k] for k in lc if 'grupa' in k), None)
-        part_col = (next((lc[k] for k in lc if ('numer' in k and ('czesc' in k or 'czes' in k or 'czesci' in k)) or ('nr' in k and 'cz' in k)), None)
-                    or next((lc[k] for k in lc if 'numer' in k), None)
-                    or next((lc[k] for k in lc if 'part' in k), None))
-        week_col = next((lc[k] for k in lc if 'tyd' in k), None) or next((lc[k] for k in lc if 'week' in k), None)
-        year_col = next((lc[k] for k in lc if 'rok' in k or 'year' in k or 'rokmies' in k or 'rokmiesiac' in k), None)
-        praca_col = next((lc[k] for k in lc if 'praca' in k), None)
-        # try to find an "ID zlecenia" / order id column (optional)
-        order_col = (next((lc[k] for k in lc if 'id' in k and ('zlec' in k or 'zlecen' in k)), None)
-                     or next((lc[k] for k in lc if ('zlec' in k or 'zlecen' in k)), None))
-
-        if not all([group_col, part_col, week_col, year_col, praca_col]):
-            raise HTTPException(status_code=500, detail='Brak wymaganych kolumn w RaportProdukcja')
+        snap = await snapshots.get_async()
+        store = snap.parts
+        if store is None:
+            if isinstance(snap.parts_error, ValueError):
+                raise HTTPException(status_code=500, detail=str(snap.parts_error))
+            raise snap.parts_error
 
         # parse months
         month_ranges = []
@@ -111,88 +262,14 @@ async def device_parts(device_id: str, month: List[str] = Query(...)):
             mn = month_dt.month
             first = date(y, mn, 1)
             last = date(y, mn, calendar.monthrange(y, mn)[1])
-            month_ranges.append((y, mn, first, last))
-
-        # filter by device/group and months
-        device_series = prod_df[group_col].astype(str)
-        clean_device_id = device_id.lower().strip()
-        # exact match (case-insensitive)
-        device_mask = device_series.str.lower().str.strip() == clean_device_id
-        filtered = prod_df[device_mask].copy()
-        # fallback: group contains the device id (e.g. '10250_Frezarki')
-        if filtered.empty:
-            try:
-                filtered = prod_df[device_series.str.lower().str.contains(clean_device_id, na=False)].copy()
-            except Exception:
-                filtered = prod_df[device_series.str.contains(clean_device_id, na=False)].copy()
-        # fallback: digits-only match (e.g. group names like '10250_Frezarki')
-        if filtered.empty:
-            import re
-            digits = ''.join(re.findall(r"\d+", clean_device_id))
-            if digits:
-                filtered = prod_df[device_series.str.contains(digits, na=False)].copy()
-        results = []
-        def _parse_year(val):
-            try:
-                if pd.isna(val):
-                    return None
-            except Exception:
-                pass
-            # direct int
-            try:
-                return int(val)
-            except Exception:
-                pass
-            # string like '2025-09' or '2025-09-01'
-            try:
-                s = str(val)
-                m = s.strip().split('-')
-                if len(m) >= 1 and m[0].isdigit() and len(m[0]) == 4:
-                    return int(m[0])
-                # fallback: find first 4-digit group
-                import re
-                mm = re.search(r"(\d{4})", s)
-                if mm:
-                    return int(mm.group(1))
-            except Exception:
-                pass
-            return None
-
-        for _, row in filtered.iterrows():
-            try:
-                w = int(row[week_col])
-            except Exception:
-                continue
-            y = _parse_year(row[year_col])
-            if y is None:
-                continue
-            try:
-                praca = float(row[praca_col])
-            except Exception:
-                praca = 0.0
-            part = str(row[part_col])
-            # check week range overlap
-            try:
-                week_start, week_end = get_week_date_range(y, w)
-            except Exception:
-                continue
-            for (my, mm, mstart, mend) in month_ranges:
-                if week_end < mstart or week_start > mend:
-                    continue
-                # extract order id if available
-                ord_id = None
-                try:
-                    if order_col is not None:
-                        v = row[order_col]
-                        if pd.isna(v):
-                            ord_id = None
-                        else:
-                            ord_id = str(v)
-                except Exception:
-                    ord_id = None
-                results.append(DevicePartLoad(part_number=part, week=w, year=y, praca_tpz=praca, order_id=ord_id))
-                break
-        return results
+            month_ranges.append((first, last))
+
+        with stage('match'):
+            rows = store.rows_for(device_id, month_ranges, snap.resolver)
+        if format == 'ndjson':
+            return StreamingResponse(store.iter_ndjson(rows), media_type='application/x-ndjson')
+        with stage('serialize'):
+            return JSONBytes(dumps(_part_loads(store, rows)))
     except HTTPException:
         raise
     except Exception:
@@ -233,6 +310,13 @@ class AvailabilityResponse(BaseModel):
     monthly_load_prorated_sum: float = 0.0
 
 
+WEEKLY_FIELDS = check_fields(WeeklyAvailability, (
+    'week_number', 'iso_year', 'hours', 'start_date', 'end_date', 'prorated_hours', 'load_hours', 'prorated_load_hours'))
+AVAILABILITY_FIELDS = check_fields(AvailabilityResponse, (
+    'device_id', 'month', 'working_days_in_month', 'weekly', 'monthly_hours_sum', 'prorated',
+    'monthly_hours_full_sum', 'monthly_hours_prorated_sum', 'monthly_load_full_sum', 'monthly_load_prorated_sum'))
+
+
 class DeviceAggregate(BaseModel):
     device_id: str
     display_name: Optional[str] = None
@@ -245,36 +329,68 @@ class DeviceAggregate(BaseModel):
     shortage_prorated: float
 
 
+DEVICE_AGGREGATE_FIELDS = check_fields(DeviceAggregate, (
+    'device_id', 'display_name', 'department', 'monthly_hours_full_sum', 'monthly_hours_prorated_sum',
+    'monthly_load_full_sum', 'monthly_load_prorated_sum', 'shortage_full', 'shortage_prorated'))
+
+
 # module-level caches (no annotations)
 _cache_df = None
 _cache_mtime = None
-_prod_cache_df = None
-_prod_cache_mtime = None
-_group_map_cache = None
-_group_map_mtime = None
-
-
-def read_excel_cached(path: pathlib.Path, **kwargs):
-    """Attempt to load a DataFrame from app.cache, falling back to pandas.read_excel.
-    Cache key is based on file mtime+size.
-    """
+_workbook_tables = None
+_workbook_key = None
+_scalanie_cache = None
+_scalanie_key = None
+_cube_cache = None
+_cube_sources = None
+# shared empty production frame so a missing Raport_dane.xlsx does not force a cube rebuild per request
+_EMPTY_PROD_DF = pd.DataFrame(columns=['group', 'year', 'week', 'praca_tpz'])
+_cube_lock = threading.Lock()
+# deduplicates concurrent loads: per file version for parses, per loader for requests
+_flights = SingleFlight()
+
+
+def _cached_table(source: pathlib.Path, name: str, parse):
+    """Return normalized table `name` for `source` from the columnar cache, parsing and storing it on a miss."""
+    from .cache import load_df, save_df
     try:
-        from .cache import load_df, save_df
-        cached = load_df(path)
+        with stage('cache.read'):
+            cached = load_df(source, name)
         if cached is not None:
             return cached
     except Exception:
         pass
-    # fallback to pandas
-    df = pd.read_excel(path, **kwargs)
+    with stage(f'parse.{name}'):
+        df = parse()
     try:
-        from .cache import save_df
-        save_df(path, df)
+        save_df(source, name, df)
     except Exception:
+        # the cache is an optimization only
         pass
     return df
 
 
+def _parse_availability(source: pathlib.Path) -> pd.DataFrame:
+    df = pd.read_excel(source)
+    lc = {c.lower(): c for c in df.columns}
+    device_col = next((lc[k] for k in lc if k in ['device', 'urzadzenie', 'grupa zasobów', 'grupa_zasobow', 'grupa zasobow', 'resource', 'maszyna']), None)
+    if device_col is None:
+        for original in df.columns:
+            if original.lower().replace('ó', 'o').replace('_', ' ') == 'grupa zasobow':
+                device_col = original
+                break
+    week_col = next((lc[k] for k in lc if k in ['week', 'tydzien', 'nr_tyg', 'nr tyg', 'tydzien realizacji', 'tydzien_realizacji']), None)
+    year_col = next((lc[k] for k in lc if k in ['year', 'rok']), None)
+    hours_col = next((lc[k] for k in lc if k in ['hours', 'godziny', 'dostepnosc', 'dostepnosctygodniowa', 'available_hours', 'dostepnosc tygodniowa', 'dostepnosc_tygodniowa']), None)
+    if not all([device_col, week_col, year_col, hours_col]):
+        raise ValueError("Nie rozpoznano wymaganych kolumn (device/week/year/hours)")
+    df = df.rename(columns={device_col: 'device', week_col: 'week', year_col: 'year', hours_col: 'hours'})
+    df['week'] = pd.to_numeric(df['week'], errors='coerce').astype('Int64').fillna(0).astype(int)
+    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64').fillna(datetime.now().year).astype(int)
+    df['hours'] = pd.to_numeric(df['hours'], errors='coerce').fillna(0.0).astype(float)
+    return df[['device', 'week', 'year', 'hours']].reset_index(drop=True)
+
+
 def load_data(force: bool = False) -> pd.DataFrame:
     """Load availability data from DostepnoscWTygodniach.xlsx and normalize columns."""
     global _cache_df, _cache_mtime
@@ -285,148 +401,367 @@ def load_data(force: bool = False) -> pd.DataFrame:
         raise FileNotFoundError(f"Brak pliku: {source}")
     mtime = source.stat().st_mtime
     if force or _cache_df is None or _cache_mtime != mtime:
-        df = read_excel_cached(source)
-        lc = {c.lower(): c for c in df.columns}
-        device_col = next((lc[k] for k in lc if k in ['device', 'urzadzenie', 'grupa zasobów', 'grupa_zasobow', 'grupa zasobow', 'resource', 'maszyna']), None)
-        if device_col is None:
-            for original in df.columns:
-                if original.lower().replace('ó', 'o').replace('_', ' ') == 'grupa zasobow':
-                    device_col = original
-                    break
-        week_col = next((lc[k] for k in lc if k in ['week', 'tydzien', 'nr_tyg', 'nr tyg', 'tydzien realizacji', 'tydzien_realizacji']), None)
-        year_col = next((lc[k] for k in lc if k in ['year', 'rok']), None)
-        hours_col = next((lc[k] for k in lc if k in ['hours', 'godziny', 'dostepnosc', 'dostepnosctygodniowa', 'available_hours', 'dostepnosc tygodniowa', 'dostepnosc_tygodniowa']), None)
-        if not all([device_col, week_col, year_col, hours_col]):
-            raise ValueError("Nie rozpoznano wymaganych kolumn (device/week/year/hours)")
-        df = df.rename(columns={device_col: 'device', week_col: 'week', year_col: 'year', hours_col: 'hours'})
-        df['week'] = pd.to_numeric(df['week'], errors='coerce').astype('Int64').fillna(0).astype(int)
-        df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64').fillna(datetime.now().year).astype(int)
-        df['hours'] = pd.to_numeric(df['hours'], errors='coerce').fillna(0.0).astype(float)
-        _cache_df = df
+        # concurrent callers for the same file version share one parse
+        _cache_df = _flights.do(('availability', str(source), mtime),
+                               lambda: _cached_table(source, 'availability', lambda: _parse_availability(source)))
         _cache_mtime = mtime
     return _cache_df
 
 
-def load_production_data(force: bool = False) -> pd.DataFrame:
-    """Load and aggregate production data from sheet 'RaportProdukcja' into group/year/week sums."""
-    global _prod_cache_df, _prod_cache_mtime
-    # prefer uploaded production file if present
+def _production_source() -> pathlib.Path:
+    """Return the production workbook to read, preferring an uploaded override."""
     uploaded = UPLOAD_DIR / UPLOADED_PROD_NAME
     source = uploaded if uploaded.exists() else PROD_FILE
     if not source.exists():
         raise FileNotFoundError(f"Brak pliku produkcji: {source}")
-    mtime = source.stat().st_mtime
-    if force or _prod_cache_df is None or _prod_cache_mtime != mtime:
-        pdf = read_excel_cached(source, sheet_name='RaportProdukcja')
-        lc = {c.lower(): c for c in pdf.columns}
-        group_col = next((lc[k] for k in lc if 'grupa' in k and 'zasob' in k), None)
-        if group_col is None:
-            group_col = next((c for c in pdf.columns if 'grupa' in str(c).lower() and 'zasob' in str(c).lower()), None)
-        week_col = next((lc[k] for k in lc if 'tyd' in k and 'realiz' in k), None)
-        if week_col is None:
-            week_col = next((c for c in pdf.columns if 'tydzie' in str(c).lower() or 'tydzien' in str(c).lower()), None)
-        praca_col = next((lc[k] for k in lc if 'praca' in k and ('tpz' in k or '+' in k) or 'praca+tpz' in k), None)
-        if praca_col is None:
-            praca_col = next((c for c in pdf.columns if 'praca' in str(c).lower()), None)
-        rokmies_col = next((lc[k] for k in lc if 'rokmies' in k), None)
-        year_col = next((lc[k] for k in lc if k in ['year', 'rok']), None)
-        if group_col is None or week_col is None or praca_col is None:
-            raise ValueError('Nie rozpoznano kolumn produkcji (grupa/tydzien/praca)')
-        # try to infer year
-        if year_col is None:
-            if rokmies_col is not None:
-                pdf['year'] = pdf[rokmies_col].astype(str).str.slice(0, 4).astype(int)
-            else:
-                tr = next((c for c in pdf.columns if 'termin' in str(c).lower()), None)
-                if tr is not None:
-                    pdf['year'] = pd.to_datetime(pdf[tr], errors='coerce').dt.year.fillna(datetime.now().year).astype(int)
-                else:
-                    pdf['year'] = datetime.now().year
+    return source
+
+
+def find_production_columns(columns) -> dict:
+    """Locate the RaportProdukcja columns used for the production aggregate."""
+    columns = list(columns)
+    lc = {c.lower(): c for c in columns}
+    group_col = next((lc[k] for k in lc if 'grupa' in k and 'zasob' in k), None)
+    if group_col is None:
+        group_col = next((c for c in columns if 'grupa' in str(c).lower() and 'zasob' in str(c).lower()), None)
+    week_col = next((lc[k] for k in lc if 'tyd' in k and 'realiz' in k), None)
+    if week_col is None:
+        week_col = next((c for c in columns if 'tydzie' in str(c).lower() or 'tydzien' in str(c).lower()), None)
+    praca_col = next((lc[k] for k in lc if 'praca' in k and ('tpz' in k or '+' in k) or 'praca+tpz' in k), None)
+    if praca_col is None:
+        praca_col = next((c for c in columns if 'praca' in str(c).lower()), None)
+    return {
+        'group': group_col,
+        'week': week_col,
+        'praca': praca_col,
+        'rokmies': next((lc[k] for k in lc if 'rokmies' in k), None),
+        'year': next((lc[k] for k in lc if k in ['year', 'rok']), None),
+        'termin': next((c for c in columns if 'termin' in str(c).lower()), None),
+    }
+
+
+def _raport_columns(columns) -> list:
+    """RaportProdukcja columns read from disk: whatever the aggregate and the part store use."""
+    from .parts import find_part_columns
+    found = list(find_production_columns(columns).values()) + list(find_part_columns(columns).values())
+    return [c for c in found if c is not None]
+
+
+def _normalize_production(pdf: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate a raw RaportProdukcja frame into group/year/week sums of praca_tpz."""
+    # work on a copy: the same raw frame also feeds the part store
+    pdf = pdf.copy()
+    cols = find_production_columns(pdf.columns)
+    group_col, week_col, praca_col = cols['group'], cols['week'], cols['praca']
+    rokmies_col, year_col = cols['rokmies'], cols['year']
+    if group_col is None or week_col is None or praca_col is None:
+        raise ValueError('Nie rozpoznano kolumn produkcji (grupa/tydzien/praca)')
+    # try to infer year
+    if year_col is None:
+        if rokmies_col is not None:
+            pdf['year'] = pdf[rokmies_col].astype(str).str.slice(0, 4).astype(int)
         else:
-            pdf['year'] = pd.to_numeric(pdf[year_col], errors='coerce').fillna(datetime.now().year).astype(int)
+            tr = cols['termin']
+            if tr is not None:
+                pdf['year'] = pd.to_datetime(pdf[tr], errors='coerce').dt.year.fillna(datetime.now().year).astype(int)
+            else:
+                pdf['year'] = datetime.now().year
+    else:
+        pdf['year'] = pd.to_numeric(pdf[year_col], errors='coerce').fillna(datetime.now().year).astype(int)
 
-        pdf = pdf.rename(columns={group_col: 'group', week_col: 'week', praca_col: 'praca_tpz'})
-        pdf['group'] = pdf['group'].astype(str)
-        pdf['week'] = pd.to_numeric(pdf['week'], errors='coerce').fillna(0).astype(int)
-        pdf['praca_tpz'] = pd.to_numeric(pdf['praca_tpz'], errors='coerce').fillna(0.0)
-        agg = pdf.groupby(['group', 'year', 'week'], as_index=False)['praca_tpz'].sum()
-        _prod_cache_df = agg
-        _prod_cache_mtime = mtime
-    return _prod_cache_df
+    pdf = pdf.rename(columns={group_col: 'group', week_col: 'week', praca_col: 'praca_tpz'})
+    pdf['group'] = pdf['group'].astype(str)
+    pdf['week'] = pd.to_numeric(pdf['week'], errors='coerce').fillna(0).astype(int)
+    pdf['praca_tpz'] = pd.to_numeric(pdf['praca_tpz'], errors='coerce').fillna(0.0)
+    return pdf.groupby(['group', 'year', 'week'], as_index=False)['praca_tpz'].sum()
 
 
-def load_group_map(force: bool = False) -> dict:
-    """Load mapping of group -> department from sheet 'GrupaZasobow' in Raport_dane.xlsx."""
-    global _group_map_cache, _group_map_mtime
+_GROUP_SHEETS = ('GrupaZasobow', 'GrupaZasobów')
+
+
+def _empty_group_table() -> pd.DataFrame:
+    return pd.DataFrame({'group': pd.Series(dtype=object), 'department': pd.Series(dtype=object)})
+
+
+def _normalize_group_table(gm: pd.DataFrame) -> pd.DataFrame:
+    """GrupaZasobow sheet reduced to group/department columns (empty when they are not found)."""
+    lc = {c.lower(): c for c in gm.columns}
+    # find group column
+    group_col = next((lc[k] for k in lc if 'grupa' in k and 'zasob' in k), None)
+    if group_col is None:
+        group_col = next((c for c in gm.columns if 'grupa' in str(c).lower()), None)
+    # find department column
+    dept_col = next((lc[k] for k in lc if 'dzia' in k or 'dział' in k or 'department' in k), None)
+    if dept_col is None:
+        dept_col = next((c for c in gm.columns if 'dział' in str(c).lower() or 'dzial' in str(c).lower()), None)
+
+    if group_col is None or dept_col is None:
+        return _empty_group_table()
+
+    gm = gm.rename(columns={group_col: 'group', dept_col: 'department'})
+    gm['group'] = gm['group'].astype(str)
+    gm['department'] = gm['department'].astype(str)
+    return gm[['group', 'department']].reset_index(drop=True)
+
+
+def _read_group_table(wb) -> pd.DataFrame:
+    sheet = next((s for s in _GROUP_SHEETS if s in wb.sheetnames), None)
+    if sheet is None:
+        return _empty_group_table()
+    return _normalize_group_table(read_columns(wb[sheet]))
+
+
+def _build_table(raw, build, save):
+    """build(raw) and store the result in the cache; returns the exception instead of raising it."""
+    try:
+        if isinstance(raw, Exception):
+            raise raw
+        table = build(raw)
+    except Exception as exc:
+        return exc
+    try:
+        save(table)
+    except Exception:
+        # the cache is an optimization only
+        pass
+    return table
+
+
+def _ingest_production_workbook(source: pathlib.Path) -> dict:
+    """Derive every table the app reads from Raport_dane.xlsx, opening the workbook at most once.
+
+    Returns {'production': DataFrame, 'parts': PartStore, 'groups': DataFrame}; a table that could
+    not be built holds the exception instead, so one bad sheet does not hide the others. Tables
+    already in the columnar cache are mapped from there; on a miss the workbook is opened once,
+    RaportProdukcja is streamed with only the columns the tables use, and GrupaZasobow is read
+    from the same handle.
+    """
+    from .cache import load_columns, load_df, save_columns, save_df
+    from .parts import PartStore, build_part_store
+
+    tables = {}
+    try:
+        with stage('cache.read'):
+            tables['production'] = load_df(source, 'production')
+            parts = load_columns(source, 'parts')
+            tables['parts'] = PartStore(**parts) if parts is not None else None
+            tables['groups'] = load_df(source, 'group_map')
+    except Exception:
+        tables = {}
+    missing = [name for name in ('production', 'parts', 'groups') if tables.get(name) is None]
+    if not missing:
+        return tables
+
+    wb = open_workbook(source)
+    try:
+        raw = None
+        if 'production' in missing or 'parts' in missing:
+            try:
+                if 'RaportProdukcja' not in wb.sheetnames:
+                    raise ValueError("Worksheet named 'RaportProdukcja' not found")
+                with stage('parse.production'):
+                    raw = read_columns(wb['RaportProdukcja'], _raport_columns)
+            except Exception as exc:
+                raw = exc
+        if 'production' in missing:
+            with stage('build.production'):
+                tables['production'] = _build_table(raw, _normalize_production, lambda t: save_df(source, 'production', t))
+        if 'parts' in missing:
+            with stage('build.parts'):
+                tables['parts'] = _build_table(raw, build_part_store, lambda t: save_columns(source, 'parts', t.columns()))
+        if 'groups' in missing:
+            with stage('parse.group_map'):
+                tables['groups'] = _build_table(wb, _read_group_table, lambda t: save_df(source, 'group_map', t))
+    finally:
+        wb.close()
+    return tables
+
+
+def load_production_tables(force: bool = False) -> dict:
+    """Production aggregate, part store and group table from one version of the production workbook."""
+    global _workbook_tables, _workbook_key
+    source = _production_source()
+    key = (str(source), source.stat().st_mtime)
+    if force or _workbook_tables is None or _workbook_key != key:
+        _workbook_tables = _flights.do(('workbook',) + key, lambda: _ingest_production_workbook(source))
+        _workbook_key = key
+    return _workbook_tables
+
+
+def _table(tables: dict, name: str):
+    value = tables[name]
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+
+def load_production_data(force: bool = False) -> pd.DataFrame:
+    """Load and aggregate production data from sheet 'RaportProdukcja' into group/year/week sums."""
+    return _table(load_production_tables(force), 'production')
+
+
+def load_production_or_empty() -> pd.DataFrame:
+    """load_production_data(), or an empty frame when the production workbook is missing or unreadable."""
+    try:
+        return load_production_data()
+    except Exception:
+        return _EMPTY_PROD_DF
+
+
+def load_part_store(force: bool = False):
+    """Load the part-level production store (RaportProdukcja rows) for /device_parts."""
+    return _table(load_production_tables(force), 'parts')
+
+
+def _fallback_group_table() -> pd.DataFrame:
+    # an uploaded production file without GrupaZasobow keeps the departments from the NAS workbook
+    def read():
+        wb = open_workbook(PROD_FILE)
+        try:
+            return _read_group_table(wb)
+        finally:
+            wb.close()
     if not PROD_FILE.exists():
+        return _empty_group_table()
+    return _cached_table(PROD_FILE, 'group_map', read)
+
+
+def load_group_map(force: bool = False) -> dict:
+    """Load mapping of group -> department from sheet 'GrupaZasobow' of the production workbook."""
+    try:
+        gm = load_production_tables(force)['groups']
+    except Exception:
+        gm = None
+    if not isinstance(gm, pd.DataFrame):
+        gm = None
+    if (gm is None or gm.empty) and (UPLOAD_DIR / UPLOADED_PROD_NAME).exists():
+        try:
+            gm = _fallback_group_table()
+        except Exception:
+            gm = None
+    if gm is None:
+        return {}
+    return {str(g).strip().lower(): str(d).strip() for g, d in zip(gm['group'], gm['department'])}
+
+
+def get_load_cube(avail_df: pd.DataFrame, prod_df: pd.DataFrame, parts=None):
+    """Return the LoadCube for the given availability/production frames, rebuilding only when they change."""
+    global _cube_cache, _cube_sources
+    with _cube_lock:
+        stale = (_cube_cache is None or _cube_sources is None or _cube_sources[0] is not avail_df
+                 or _cube_sources[1] is not prod_df or _cube_sources[2] is not parts
+                 or _cube_cache.calendar is not get_calendar())
+        if stale:
+            from .engine import build_load_cube
+            # part-store groups join the resolver so /device_parts resolves against the same table
+            extra = (parts.groups,) if parts is not None else ()
+            with stage('build.cube'):
+                _cube_cache = build_load_cube(avail_df, prod_df, extra_groups=extra)
+            _cube_sources = (avail_df, prod_df, parts)
+        return _cube_cache
+
+
+def _scalanie_source() -> pathlib.Path:
+    """Scalanie17.xlsx, or the CSV written by scripts/merge_scalanie17.py when the workbook is unreachable."""
+    return SCALANIE_FILE if SCALANIE_FILE.exists() else SCALANIE_CSV
+
+
+def load_scalanie_map(force: bool = False) -> dict:
+    """Load group -> NazwaUrz. display names, parsed once per version of the source file."""
+    global _scalanie_cache, _scalanie_key
+    source = _scalanie_source()
+    try:
+        key = (str(source), source.stat().st_mtime)
+    except OSError:
         return {}
-    mtime = PROD_FILE.stat().st_mtime
-    if force or _group_map_cache is None or _group_map_mtime != mtime:
+    if force or _scalanie_cache is None or _scalanie_key != key:
         try:
-            gm = read_excel_cached(PROD_FILE, sheet_name='GrupaZasobow')
+            table = _flights.do(('scalanie',) + key,
+                                lambda: _cached_table(source, 'display_names', lambda: display_names.read_table(source)))
+            _scalanie_cache = display_names.display_map(table)
         except Exception:
-            # try alternative sheet name with diacritics
-            try:
-                gm = read_excel_cached(PROD_FILE, sheet_name='GrupaZasobów')
-            except Exception:
-                _group_map_cache = {}
-                _group_map_mtime = mtime
-                return _group_map_cache
-
-        lc = {c.lower(): c for c in gm.columns}
-        # find group column
-        group_col = next((lc[k] for k in lc if 'grupa' in k and 'zasob' in k), None)
-        if group_col is None:
-            group_col = next((c for c in gm.columns if 'grupa' in str(c).lower()), None)
-        # find department column
-        dept_col = next((lc[k] for k in lc if 'dzia' in k or 'dział' in k or 'department' in k), None)
-        if dept_col is None:
-            dept_col = next((c for c in gm.columns if 'dział' in str(c).lower() or 'dzial' in str(c).lower()), None)
-
-        if group_col is None or dept_col is None:
-            _group_map_cache = {}
-            _group_map_mtime = mtime
-            return _group_map_cache
-
-        gm = gm.rename(columns={group_col: 'group', dept_col: 'department'})
-        gm['group'] = gm['group'].astype(str)
-        gm['department'] = gm['department'].astype(str)
-        mapping = {str(r['group']).strip().lower(): str(r['department']).strip() for _, r in gm.iterrows()}
-        _group_map_cache = mapping
-        _group_map_mtime = mtime
-    return _group_map_cache
+            logging.getLogger(__name__).warning("Nie udało się wczytać nazw urządzeń z %s", source, exc_info=True)
+            _scalanie_cache = {}
+        _scalanie_key = key
+    return _scalanie_cache
+
+
+def _snapshot_sources() -> dict:
+    """Files whose changes trigger a snapshot rebuild (uploaded overrides take precedence)."""
+    uploaded_data = UPLOAD_DIR / UPLOADED_DATA_NAME
+    uploaded_prod = UPLOAD_DIR / UPLOADED_PROD_NAME
+    return {
+        'availability': uploaded_data if uploaded_data.exists() else DATA_FILE,
+        'production': uploaded_prod if uploaded_prod.exists() else PROD_FILE,
+        'group_map': PROD_FILE,
+        'scalanie': _scalanie_source(),
+        'holidays': holidays_path(),
+    }
+
+
+def build_snapshot(signature: tuple) -> DataSnapshot:
+    """Load every source and derive the structures the endpoints read."""
+    prev = snapshots.current
+    if prev is not None and signature_entry(prev.signature, 'holidays') != signature_entry(signature, 'holidays'):
+        reset_calendar()
+    df = load_data()
+    prod_df = load_production_or_empty()
+    try:
+        parts, parts_error = load_part_store(), None
+    except Exception as exc:
+        parts, parts_error = None, exc
+    cube = get_load_cube(df, prod_df, parts)
+    group_map = load_group_map()
+    if prev is not None and prev.group_map == group_map and prev.cube.devices == cube.devices:
+        # GrupaZasobow and the device list did not change: keep the department index
+        departments = prev.departments
+    else:
+        with stage('build.departments'):
+            departments = DepartmentIndex(group_map, cube.devices)
+    return DataSnapshot(
+        signature,
+        availability=df,
+        device_rows=row_index(df['device']),
+        production=prod_df,
+        group_map=group_map,
+        departments=departments,
+        scalanie_map=load_scalanie_map(),
+        parts=parts,
+        parts_error=parts_error,
+        cube=cube,
+        resolver=cube.resolver,
+    )
+
+
+# run_uvicorn.py --workers N: a loader process builds and publishes snapshots, workers attach to them
+_shared_root = shared.worker_root()
+if _shared_root is not None:
+    snapshots = SnapshotManager(
+        lambda: shared.pointer_sources(_shared_root),
+        lambda signature: shared.attach(_shared_root, signature, snapshots.current),
+        poll_interval=shared.poll_interval(),
+        recheck=shared.recheck_interval(),
+    )
+else:
+    snapshots = SnapshotManager(_snapshot_sources, build_snapshot)
 
 
 def get_week_date_range(year: int, week: int):
     """Return ISO week start (Mon) and end (Sun) dates."""
-    first_week_day = datetime.fromisocalendar(year, week, 1).date()
-    last_week_day = datetime.fromisocalendar(year, week, 7).date()
-    return first_week_day, last_week_day
+    return get_calendar().week_range(year, week)
 
 
 def business_days_between(start: date, end: date) -> int:
-    days = 0
-    d = start
-    while d <= end:
-        if d.weekday() < 5:
-            days += 1
-        d += timedelta(days=1)
-    return days
+    """Working days (Mon-Fri minus plant holidays) in the inclusive range [start, end]."""
+    return get_calendar().workdays_between(start, end)
 
 
 def working_days_in_month(year: int, month: int) -> int:
-    first = date(year, month, 1)
-    last_day = calendar.monthrange(year, month)[1]
-    last = date(year, month, last_day)
-    return business_days_between(first, last)
+    return get_calendar().working_days_in_month(year, month)
 
 
-@app.get('/availability/{device_id}', response_model=AvailabilityResponse)
-async def availability(device_id: str, month: List[str] = Query(...), prorate: bool = False):
-    """Compute availability for a device across one or more months (business days only).
-    Accepts multiple `month=YYYY-MM` query params and returns weekly records for any week overlapping the selected months.
-    """
-    # parse months into ranges
+def _parse_month_ranges(month: List[str]) -> list:
+    """`month=YYYY-MM` params as (first_day, last_day) ranges; 400 on a malformed month."""
     month_ranges = []
     for m in month:
         try:
@@ -438,98 +773,231 @@ async def availability(device_id: str, month: List[str] = Query(...), prorate: b
         first_month_day = date(y, mn, 1)
         last_month_day = date(y, mn, calendar.monthrange(y, mn)[1])
         month_ranges.append((first_month_day, last_month_day))
-
-    # match device by text equality (case-insensitive)
-    df = load_data()
-    device_df = df[df['device'].astype(str).str.lower() == device_id.lower()].copy()
-    if device_df.empty:
-        raise HTTPException(status_code=404, detail="Nie znaleziono urządzenia")
-
-    try:
-        prod_df = load_production_data()
-    except Exception:
-        prod_df = pd.DataFrame(columns=['group', 'year', 'week', 'praca_tpz'])
-
-    weekly_records = []
-    for _, row in device_df.iterrows():
-        w = int(row['week'])
-        y = int(row['year'])
-        try:
-            week_start, week_end = get_week_date_range(y, w)
-        except Exception:
-            # bad week number
-            continue
-        # check overlap with any selected month ranges
-        overlaps_any = False
-        total_overlap_days = 0
-        for (first_month_day, last_month_day) in month_ranges:
-            if week_end < first_month_day or week_start > last_month_day:
-                continue
-            overlaps_any = True
-            overlap_start = week_start if week_start > first_month_day else first_month_day
-            overlap_end = week_end if week_end < last_month_day else last_month_day
-            if overlap_start <= overlap_end:
-                total_overlap_days += business_days_between(overlap_start, overlap_end)
-        if not overlaps_any:
-            continue
-        hours = float(row['hours'])
-        working_days_week = business_days_between(week_start, week_end)
-        # prorated across total overlapping days
-        prorated_hours = hours * (total_overlap_days / working_days_week) if working_days_week > 0 else 0.0
-
-        # find production load by matching group name (Grupa zasobów)
-        grp = str(row.get('device') or row.get('Grupa zasobów') or row.get('grupa zasobów') or '').strip()
-        g_lower = grp.lower()
-        # exact match first
-        prod_row = prod_df[(prod_df['group'].astype(str).str.lower() == g_lower) & (prod_df['year'] == y) & (prod_df['week'] == w)]
-        # fallback: group contains the device/group substring
-        if prod_row.empty:
-            prod_row = prod_df[(prod_df['group'].astype(str).str.lower().str.contains(g_lower, na=False)) & (prod_df['year'] == y) & (prod_df['week'] == w)]
-        load_hours = float(prod_row['praca_tpz'].sum()) if not prod_row.empty else 0.0
-        prorated_load = load_hours * (total_overlap_days / working_days_week) if working_days_week > 0 else 0.0
-
-        weekly_records.append({
-            'week_number': w,
-            'iso_year': y,
-            'hours': hours,
-            'start_date': week_start,
-            'end_date': week_end,
-            'prorated_hours': prorated_hours,
-            'load_hours': load_hours,
-            'prorated_load_hours': prorated_load,
-        })
-
-    if not weekly_records:
+    return month_ranges
+
+
+def _parse_span(month: List[str], from_: Optional[date], to: Optional[date]) -> Optional[tuple]:
+    """(first, last) of a `from=`/`to=` query, None for a `month=` query; 400 unless exactly one form is given."""
+    if from_ is None and to is None and month:
+        return None
+    if month or from_ is None or to is None:
+        raise HTTPException(status_code=400, detail="Podaj parametr month=YYYY-MM albo zakres from=YYYY-MM-DD i to=YYYY-MM-DD")
+    if from_ > to:
+        raise HTTPException(status_code=400, detail="Data from nie może być późniejsza niż to")
+    return from_, to
+
+
+def _weekly_rows(snap, rows_df: pd.DataFrame, month_ranges) -> dict:
+    """Per-row load, month overlap and week dates for availability rows of any number of devices."""
+    # production load per row comes from the cube, using the snapshot's device -> group resolution
+    dev_idx = np.array([snap.resolver.device_index.get(device_key(d), -1) for d in rows_df['device']], dtype=np.int64)
+    years = rows_df['year'].to_numpy()
+    weeks = rows_df['week'].to_numpy()
+    row_loads = np.zeros(len(rows_df), dtype=float)
+    known = dev_idx >= 0
+    if known.any():
+        row_loads[known] = snap.cube.cell_load(dev_idx[known], years[known], weeks[known])
+
+    # week dates and working-day overlaps come from the calendar table
+    cal = get_calendar(int(rows_df['year'].min()), int(rows_df['year'].max()))
+    week_idx = cal.week_index(years, weeks)
+    valid = week_idx >= 0
+    safe_idx = np.where(valid, week_idx, 0)
+    touches = np.zeros(len(rows_df), dtype=bool)
+    overlap_days = np.zeros(len(rows_df), dtype=np.int64)
+    for (first_month_day, last_month_day) in month_ranges:
+        t, o = cal.range_weights(safe_idx, first_month_day, last_month_day)
+        touches |= t & valid
+        overlap_days += np.where(valid, o, 0)
+    return {
+        'load': row_loads,
+        'touches': touches,
+        'overlap_days': overlap_days,
+        'week_starts': cal.week_starts(week_idx),
+        'week_days': cal.week_workdays.ravel()[safe_idx],
+    }
+
+
+def _availability_response(device_id: str, month: List[str], month_ranges, prorate: bool,
+                           device_df: pd.DataFrame, weekly: dict, positions) -> dict:
+    """AvailabilityResponse (as a dict) for one device; `positions` index its rows in the `weekly` arrays."""
+    positions = np.asarray(positions, dtype=np.int64)
+    # skip bad week numbers and weeks outside the selected months
+    keep = weekly['touches'][positions]
+    if not keep.any():
         raise HTTPException(status_code=404, detail="Brak danych tygodniowych w wybranych miesiącach")
+    pos = positions[keep]
+    hours = device_df['hours'].to_numpy(dtype=float)[keep]
+    load = weekly['load'][pos]
+    working_days_week = weekly['week_days'][pos]
+    has_days = working_days_week > 0
+    # prorated across total overlapping days
+    factor = weekly['overlap_days'][pos] / np.where(has_days, working_days_week, 1)
+    prorated_hours = np.where(has_days, hours * factor, 0.0)
+    prorated_load = np.where(has_days, load * factor, 0.0)
+    week_starts = weekly['week_starts'][pos]
+
+    hours_l = hours.tolist()
+    prorated_hours_l = prorated_hours.tolist()
+    load_l = load.tolist()
+    prorated_load_l = prorated_load.tolist()
+    weekly_records = records(
+        WEEKLY_FIELDS,
+        device_df['week'].to_numpy(dtype=np.int64)[keep].tolist(),
+        device_df['year'].to_numpy(dtype=np.int64)[keep].tolist(),
+        hours_l,
+        week_starts.tolist(),
+        (week_starts + np.timedelta64(6, 'D')).tolist(),
+        prorated_hours_l,
+        load_l,
+        prorated_load_l,
+    )
 
     # compute both full and prorated monthly sums
-    monthly_hours_full = sum(r['hours'] for r in weekly_records)
-    monthly_hours_pr = sum((r.get('prorated_hours') or 0.0) for r in weekly_records)
-    monthly_load_full = sum((r.get('load_hours') or 0.0) for r in weekly_records)
-    monthly_load_pr = sum((r.get('prorated_load_hours') or 0.0) for r in weekly_records)
+    monthly_hours_full = sum(hours_l)
+    monthly_hours_pr = sum(prorated_hours_l)
+    monthly_load_full = sum(load_l)
+    monthly_load_pr = sum(prorated_load_l)
 
     # preserve existing primary field behavior for backward compatibility
     monthly_hours = monthly_hours_pr if prorate else monthly_hours_full
-    monthly_load = monthly_load_pr if prorate else monthly_load_full
 
     # compute total working days across selected months
     total_working_days = 0
     for (mstart, mend) in month_ranges:
         total_working_days += business_days_between(mstart, mend)
 
-    resp = AvailabilityResponse(
-        device_id=device_id,
-        month=','.join(month),
-        working_days_in_month=total_working_days,
-        weekly=[WeeklyAvailability(**r) for r in weekly_records],
-        monthly_hours_sum=monthly_hours,
-        prorated=bool(prorate),
-        monthly_hours_full_sum=monthly_hours_full,
-        monthly_hours_prorated_sum=monthly_hours_pr,
-        monthly_load_full_sum=monthly_load_full,
-        monthly_load_prorated_sum=monthly_load_pr,
+    return dict(zip(AVAILABILITY_FIELDS, (
+        device_id,
+        ','.join(month),
+        total_working_days,
+        weekly_records,
+        monthly_hours,
+        bool(prorate),
+        monthly_hours_full,
+        monthly_hours_pr,
+        monthly_load_full,
+        monthly_load_pr,
+    )))
+
+
+def _part_loads(store, rows) -> list:
+    """DevicePartLoad dicts for part store rows."""
+    return records(
+        PART_FIELDS,
+        store.part_number[rows].tolist(),
+        store.week[rows].tolist(),
+        store.year[rows].tolist(),
+        store.praca_tpz[rows].tolist(),
+        store.order_id[rows].tolist(),
     )
-    return resp
+
+
+@app.get('/availability/{device_id}', response_model=AvailabilityResponse)
+async def availability(device_id: str, month: List[str] = Query([]), prorate: bool = False,
+                       from_: Annotated[Optional[date], Query(alias='from')] = None, to: Optional[date] = None):
+    """Compute availability for a device across one or more months (business days only).
+    Accepts multiple `month=YYYY-MM` query params and returns weekly records for any week overlapping the selected months.
+    `from=YYYY-MM-DD&to=YYYY-MM-DD` selects any inclusive date range instead (`month` is then "from..to").
+    """
+    span = _parse_span(month, from_, to)
+    if span is not None:
+        month_ranges = [span]
+        month = [f'{span[0].isoformat()}..{span[1].isoformat()}']
+    else:
+        month_ranges = _parse_month_ranges(month)
+
+    # match device by its key (stripped, case-insensitive), rows indexed once per snapshot
+    snap = await snapshots.get_async()
+    with stage('match'):
+        pos = snap.device_rows.get(device_key(device_id))
+        if pos is None:
+            raise HTTPException(status_code=404, detail="Nie znaleziono urządzenia")
+        device_df = snap.availability.iloc[pos]
+
+    with stage('aggregate'):
+        weekly = _weekly_rows(snap, device_df, month_ranges)
+        body = _availability_response(device_id, month, month_ranges, prorate, device_df, weekly, np.arange(len(device_df)))
+    with stage('serialize'):
+        return JSONBytes(dumps(body))
+
+
+class DeviceDetail(BaseModel):
+    device_id: str
+    availability: Optional[AvailabilityResponse] = None
+    # 404 detail of /availability for this device (unknown device, no weeks in the months)
+    error: Optional[str] = None
+    parts: List[DevicePartLoad] = []
+    parts_error: Optional[str] = None
+
+
+class DeviceDetailsResponse(BaseModel):
+    month: str
+    devices: List[DeviceDetail]
+
+
+DEVICE_DETAIL_FIELDS = check_fields(DeviceDetail, ('device_id', 'availability', 'error', 'parts', 'parts_error'))
+
+
+@app.get('/device_details', response_model=DeviceDetailsResponse)
+async def device_details(
+    month: List[str] = Query(...),
+    device: List[str] = Query([]),
+    top: int = Query(0, ge=0, le=200),
+    prorate: bool = False,
+):
+    """Szczegóły wielu urządzeń naraz: tygodniowa dostępność, obciążenie i części.
+
+    Odpowiada /availability i /device_parts dla każdego urządzenia z `device=...`, plus `top=N`
+    urządzeń z największym niedoborem (jak w /devices) - do wstępnego pobrania w UI.
+    """
+    month_ranges = _parse_month_ranges(month)
+    snap = await snapshots.get_async()
+
+    wanted = list(dict.fromkeys(device))
+    if top:
+        cube = snap.cube
+        with stage('aggregate'):
+            agg = cube.aggregate_months([(r[0].year, r[0].month) for r in month_ranges])
+        present = np.flatnonzero(agg['present'])
+        shortage = agg['hours_prorated'][present] - agg['load_prorated'][present]
+        # same order as /devices: most negative prorated shortage first
+        order = present[np.argsort(shortage, kind='stable')][:top]
+        seen = {device_key(d) for d in wanted}
+        wanted += [str(cube.devices[i]) for i in order if device_key(cube.devices[i]) not in seen]
+
+    # the availability rows of every requested device, in one frame
+    with stage('match'):
+        device_rows = {k: snap.device_rows[k] for k in dict.fromkeys(map(device_key, wanted)) if k in snap.device_rows}
+        selected = np.sort(np.concatenate(list(device_rows.values()))) if device_rows else np.arange(0)
+        rows_df = snap.availability.iloc[selected]
+    with stage('aggregate'):
+        weekly = _weekly_rows(snap, rows_df, month_ranges) if len(rows_df) else None
+    positions = {k: np.searchsorted(selected, rows) for k, rows in device_rows.items()}
+
+    store = snap.parts
+    parts_error = None
+    if store is None:
+        parts_error = str(snap.parts_error)
+
+    results = []
+    for device_id in wanted:
+        detail = dict.fromkeys(DEVICE_DETAIL_FIELDS)
+        detail.update(device_id=device_id, parts=[], parts_error=parts_error)
+        pos = positions.get(device_key(device_id))
+        if pos is None:
+            detail['error'] = "Nie znaleziono urządzenia"
+        else:
+            try:
+                detail['availability'] = _availability_response(
+                    device_id, month, month_ranges, prorate, rows_df.iloc[pos], weekly, pos)
+            except HTTPException as exc:
+                detail['error'] = exc.detail
+        if store is not None:
+            detail['parts'] = _part_loads(store, store.rows_for(device_id, month_ranges, snap.resolver))
+        results.append(detail)
+    with stage('serialize'):
+        return JSONBytes(dumps({'month': ','.join(month), 'devices': results}))
 
 
 @app.get('/', response_class=HTMLResponse)
@@ -697,6 +1165,8 @@ async def simple_ui():
                 const tbody = document.querySelector('#devicesTable tbody');
                 // if no months selected, clear table and return
                 if(months.length===0){ tbody.innerHTML=''; return; }
+                // the data may have changed since the last load: drop prefetched details
+                detailsCache = new Map();
                 // show spinner row while loading devices
                 tbody.innerHTML='';
                 const spinnerRow = document.createElement('tr');
@@ -768,8 +1238,6 @@ async def simple_ui():
                         const inp=document.createElement('input'); inp.id='deviceInput'; inp.type='hidden'; inp.value=d.device_id; document.body.appendChild(inp);
                         const monthsSel = Array.from(document.querySelectorAll('.month-checkbox:checked')).map(i=>i.value);
                         if(monthsSel.length===0) return;
-                        loadDeviceDetails(d.device_id, monthsSel, showPr);
-
                         // Usuń inne rozwinięte tabele
                         document.querySelectorAll('.parts-row').forEach(e=>e.remove());
                         // insert spinner row immediately
@@ -783,11 +1251,12 @@ async def simple_ui():
                         tr.parentNode.insertBefore(spinnerRow, tr.nextSibling);
                         if(chev) chev.classList.add('open');
 
-                        const partsUrl = `/device_parts/${encodeURIComponent(d.device_id)}?` + monthsSel.map(m=>'month='+encodeURIComponent(m)).join('&');
                         try{
-                            const partsResp = await fetch(partsUrl);
-                            if(!partsResp.ok){ throw new Error('Błąd ładowania części'); }
-                            const parts = await partsResp.json();
+                            // availability, load and parts come from one /device_details call (prefetched for the top rows)
+                            const detail = await fetchDeviceDetail(d.device_id, monthsSel);
+                            showDeviceDetails(detail);
+                            if(detail.parts_error){ throw new Error(detail.parts_error); }
+                            const parts = detail.parts || [];
                             // remove spinner row
                             spinnerRow.remove();
                             // ensure chronological order: sort by year then week (ascending)
@@ -856,13 +1325,41 @@ async def simple_ui():
                 });
                 document.getElementById('sum_full').textContent = sumAvail.toFixed(1);
                 document.getElementById('load_full').textContent = sumLoad.toFixed(1);
+                prefetchDeviceDetails(displayed.slice(0, PREFETCH_TOP).map(d=>d.device_id), months);
             }
 
-            async function loadDeviceDetails(device, months, showPr){
-                const url = `/availability/${encodeURIComponent(device)}?` + months.map(m=>'month='+encodeURIComponent(m)).join('&');
-                const r = await fetch(url);
-                if(!r.ok){ alert('Błąd ładowania szczegółów'); return }
-                const data = await r.json();
+            // drill-down cache: device details per month selection, filled by one batch request
+            const PREFETCH_TOP = 10;
+            let detailsCache = new Map();
+            let detailsMonths = '';
+            function detailsUrl(devices, months){
+                return '/device_details?' + devices.map(d=>'device='+encodeURIComponent(d)).concat(months.map(m=>'month='+encodeURIComponent(m))).join('&');
+            }
+            function useDetailsMonths(months){
+                const key = months.join(',');
+                if(key !== detailsMonths){ detailsCache = new Map(); detailsMonths = key; }
+            }
+            function prefetchDeviceDetails(devices, months){
+                useDetailsMonths(months);
+                const missing = devices.filter(d=>!detailsCache.has(d));
+                if(missing.length===0) return;
+                const req = fetch(detailsUrl(missing, months)).then(r=>{ if(!r.ok) throw new Error('Błąd ładowania szczegółów'); return r.json(); });
+                missing.forEach(d=>{
+                    const p = req.then(j=>j.devices.find(x=>x.device_id===d));
+                    // a failed prefetch is retried on click
+                    p.catch(()=>{ if(detailsCache.get(d)===p) detailsCache.delete(d); });
+                    detailsCache.set(d, p);
+                });
+            }
+            async function fetchDeviceDetail(device, months){
+                useDetailsMonths(months);
+                if(!detailsCache.has(device)) prefetchDeviceDetails([device], months);
+                return await detailsCache.get(device);
+            }
+
+            function showDeviceDetails(detail){
+                if(!detail.availability){ alert(detail.error || 'Błąd ładowania szczegółów'); return }
+                const data = detail.availability;
                 // sort weeks by year/week
                 const weeks = (data.weekly || []).slice().sort((a,b)=> (a.iso_year - b.iso_year) || (a.week_number - b.week_number));
                 const labels = weeks.map(w=> w.iso_year + '-' + String(w.week_number).padStart(2,'0'));
@@ -995,6 +1492,8 @@ async def handle_upload(prodfile: UploadFile = File(None), datafile: UploadFile
         except Exception as e:
             errors.append(f'datafile: {e}')
 
+    # pick up the new files before the dashboard reloads
+    await _refresh_after_upload()
     # If user posted via browser form, redirect back to root
     if errors:
         return JSONResponse(status_code=500, content={"saved": saved, "errors": errors})
@@ -1023,131 +1522,271 @@ async def clear_uploads():
                 errors.append(f'{p2.name}: {e}')
     except Exception as e:
         return JSONResponse(status_code=500, content={"errors": [str(e)]})
+    await _refresh_after_upload()
     return JSONResponse(status_code=200, content={"removed": removed, "errors": errors})
 
 
+async def _refresh_after_upload():
+    if _shared_root is not None:
+        # the loader process owns the sources: ask it to rebuild and wait for the new version
+        await run_blocking(shared.request_refresh, _shared_root)
+    try:
+        await snapshots.refresh_async()
+    except Exception:
+        # no usable snapshot yet; the next request reports the error
+        pass
+
+
+@app.get('/device_groups/{device_id}')
+async def device_groups(device_id: str):
+    """Grupy zasobów przypisane urządzeniu i reguła dopasowania (exact / contains / digits)."""
+    snap = await snapshots.get_async()
+    codes, rule = snap.resolver.resolve(device_id)
+    return {'device_id': device_id, 'rule': rule, 'groups': [snap.resolver.groups[c] for c in codes]}
+
+
+@app.get('/health/live')
+async def health_live():
+    """Proces działa i obsługuje zapytania (bez sprawdzania danych)."""
+    return {'status': 'live'}
+
+
+@app.get('/health/ready')
+async def health_ready():
+    """200 gdy dane są wczytane, indeksy zbudowane i domyślny widok przygotowany; inaczej 503."""
+    snap = snapshots.current
+    if not _warmup_enabled():
+        state = 'ready' if snap is not None else 'disabled'
+        return {'status': state, 'version': snap.version if snap else None, 'warmup': {'state': 'disabled'}}
+    if _warmup['state'] == 'ready' and snap is not None:
+        return {'status': 'ready', 'version': snap.version, 'warmup': _warmup}
+    return JSONResponse(status_code=503, content={'status': _warmup['state'], 'version': None, 'warmup': _warmup})
+
+
+@metrics.REGISTRY.collector
+def _metric_families() -> list:
+    """Snapshot sizes, cache counters and warm-up state, read at scrape time."""
+    from .cache import stats
+    snap = snapshots.current
+    families = [
+        ('snapshot_builds_total', 'counter', 'Snapshots built or attached by this process.', [({}, snapshots.builds)]),
+        ('warmup_ready', 'gauge', '1 once the startup warm-up finished.', [({}, int(_warmup['state'] == 'ready'))]),
+    ]
+    if snap is not None:
+        parts = snap.parts
+        families += [
+            ('snapshot_info', 'gauge', 'Version of the snapshot being served.', [({'version': snap.version}, 1)]),
+            ('snapshot_age_seconds', 'gauge', 'Seconds since the served snapshot was built.', [({}, round(snap.age_seconds(), 1))]),
+            ('snapshot_rows', 'gauge', 'Rows and entries held by the served snapshot.', [
+                ({'table': 'availability'}, len(snap.availability)),
+                ({'table': 'parts'}, len(parts) if parts is not None else 0),
+                ({'table': 'devices'}, len(snap.cube.devices)),
+                ({'table': 'groups'}, len(snap.resolver.groups)),
+                ({'table': 'weeks'}, snap.cube.shape[1]),
+            ]),
+        ]
+    table = stats()
+    cached = responses.stats()
+    families += [
+        ('table_cache_events_total', 'counter', 'Columnar table cache events.',
+         [({'event': k}, table[k]) for k in ('hits', 'misses', 'writes', 'write_errors', 'evictions')]),
+        ('table_cache_bytes', 'gauge', 'Size of the columnar table cache on disk.', [({}, table['bytes'])]),
+        ('response_cache_events_total', 'counter', 'Rendered response cache events.',
+         [({'event': k}, cached[k]) for k in ('hits', 'misses', 'not_modified', 'evictions')]),
+        ('response_cache_bytes', 'gauge', 'Size of the rendered response cache.', [({}, cached['bytes'])]),
+        ('response_cache_entries', 'gauge', 'Entries in the rendered response cache.', [({}, cached['entries'])]),
+        ('log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full.', [({}, dropped_records())]),
+        ('log_queue_depth', 'gauge', 'Log records waiting for the logging thread.', [({}, queue_depth())]),
+    ]
+    return families
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Liczniki, czasy etapów i histogramy opóźnień w formacie tekstowym Prometheusa."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.get('/snapshot')
+async def snapshot_status():
+    """Wersja i wiek aktualnego zestawu danych, stan obserwatora plików i liczniki cache."""
+    from .cache import stats
+    return {**snapshots.status(), 'cache': stats(), 'responses': responses.stats()}
+
+
 
 @app.get('/devices', response_model=List[DeviceAggregate])
-async def devices(month: List[str] = Query(...)):
-    """Aggregate devices for given month(s): accepts multiple `month=YYYY-MM` query params and sums across them."""
-    # parse months into (first_day, last_day) ranges
-    month_ranges = []
+async def devices(month: List[str] = Query([]), from_: Annotated[Optional[date], Query(alias='from')] = None,
+                  to: Optional[date] = None):
+    """Aggregate devices for given month(s): accepts multiple `month=YYYY-MM` query params and sums across them.
+    `from=YYYY-MM-DD&to=YYYY-MM-DD` aggregates any inclusive date range instead.
+    """
+    span = _parse_span(month, from_, to)
+    # parse months into (year, month) pairs
+    months = []
     for m in month:
         try:
             month_dt = datetime.strptime(m, '%Y-%m')
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Parametr month musi mieć format YYYY-MM: {m}")
-        y = month_dt.year
-        mn = month_dt.month
-        first = date(y, mn, 1)
-        last = date(y, mn, calendar.monthrange(y, mn)[1])
-        month_ranges.append((first, last))
+        months.append((month_dt.year, month_dt.month))
+
+    snap = await snapshots.get_async()
+    departments = snap.departments
+    scalanie_map = snap.scalanie_map
+    cube = snap.cube
+    # months: composed from per-month partial sums cached on the snapshot's cube; ranges: prefix sums
+    with stage('aggregate'):
+        agg = cube.range_sums(*span) if span is not None else cube.aggregate_months(months)
+
+    idx = np.flatnonzero(agg['present'])
+    full_hours = agg['hours_full'][idx]
+    pr_hours = agg['hours_prorated'][idx]
+    full_load = agg['load_full'][idx]
+    pr_load = agg['load_prorated'][idx]
+    shortage_pr = pr_hours - pr_load
+    # sort by shortage_prorated (most negative first)
+    order = np.argsort(shortage_pr, kind='stable')
+    with stage('serialize'):
+        device_ids = [str(cube.devices[i]) for i in idx[order]]
+        body = records(
+            DEVICE_AGGREGATE_FIELDS,
+            device_ids,
+            # display name from scalanie map (empty if not found)
+            [scalanie_map.get(d.strip().lower(), '') for d in device_ids],
+            # department: exact group key, else the first key containing the device (precomputed)
+            [departments.get(d) for d in device_ids],
+            full_hours[order].tolist(),
+            pr_hours[order].tolist(),
+            full_load[order].tolist(),
+            pr_load[order].tolist(),
+            (full_hours - full_load)[order].tolist(),
+            shortage_pr[order].tolist(),
+        )
+        return JSONBytes(dumps(body))
+
+
+class LoadMove(BaseModel):
+    group: str
+    year: int
+    week: int
+    # target; each defaults to the source value
+    to_group: Optional[str] = None
+    to_year: Optional[int] = None
+    to_week: Optional[int] = None
+    # hours to move: given, else the order's praca_tpz in the source week, else the whole group-week load
+    order_id: Optional[str] = None
+    hours: Optional[float] = None
 
-    df = load_data()
-    try:
-        prod_df = load_production_data()
-    except Exception:
-        prod_df = pd.DataFrame(columns=['group', 'year', 'week', 'praca_tpz'])
-    group_map = load_group_map()
-    # try load scalanie map (group -> NazwaUrz.) produced by scripts/merge_scalanie17.py
-    scalanie_file = pathlib.Path(__file__).resolve().parent.parent / 'scalanie_group_name.csv'
-    scalanie_map = {}
-    if scalanie_file.exists():
-        try:
-            sm_df = pd.read_csv(scalanie_file, dtype=str)
-            if 'group' in sm_df.columns and 'name' in sm_df.columns:
-                scalanie_map = {str(r['group']).strip().lower(): (str(r['name']).strip() or '') for _, r in sm_df.iterrows()}
-        except Exception:
-            scalanie_map = {}
 
-    results = []
-    # group by device (preserve display name if present)
-    for device, g in df.groupby('device'):
-        weekly_records = []
-        for _, row in g.iterrows():
-            w = int(row['week'])
-            y = int(row['year'])
-            try:
-                week_start, week_end = get_week_date_range(y, w)
-            except Exception:
-                continue
-            # skip weeks that don't overlap any selected month ranges
-            overlaps_any = False
-            overlap_days_total = 0
-            overlap_days_by_range = []
-            for (first_month_day, last_month_day) in month_ranges:
-                if week_end < first_month_day or week_start > last_month_day:
-                    overlap_days_by_range.append(0)
-                    continue
-                overlaps_any = True
-                overlap_start = week_start if week_start > first_month_day else first_month_day
-                overlap_end = week_end if week_end < last_month_day else last_month_day
-                od = business_days_between(overlap_start, overlap_end) if overlap_start <= overlap_end else 0
-                overlap_days_by_range.append(od)
-                overlap_days_total += od
-            if not overlaps_any:
-                continue
-            hours = float(row['hours'])
-            working_days_week = business_days_between(week_start, week_end)
-            # prorate for this week across all selected months proportionally to overlap days
-            prorated_hours = 0.0
-            prorated_load = 0.0
-            # compute full hours for week as-is
-
-            grp = str(row.get('device') or row.get('Grupa zasobów') or row.get('grupa zasobów') or '').strip()
-            g_lower = grp.lower()
-            prod_row = prod_df[(prod_df['group'].astype(str).str.lower() == g_lower) & (prod_df['year'] == y) & (prod_df['week'] == w)]
-            if prod_row.empty:
-                prod_row = prod_df[(prod_df['group'].astype(str).str.lower().str.contains(g_lower, na=False)) & (prod_df['year'] == y) & (prod_df['week'] == w)]
-            load_hours = float(prod_row['praca_tpz'].sum()) if not prod_row.empty else 0.0
-            # If the week overlaps multiple selected months, prorate by total overlapping business days
-            total_overlap_days = overlap_days_total
-            if working_days_week > 0 and total_overlap_days > 0:
-                prorated_hours = hours * (total_overlap_days / working_days_week)
-                prorated_load = load_hours * (total_overlap_days / working_days_week)
-
-            weekly_records.append({
-                'hours': hours,
-                'prorated_hours': prorated_hours,
-                'load_hours': load_hours,
-                'prorated_load_hours': prorated_load,
-            })
-
-        if not weekly_records:
-            continue
-
-        full_hours = sum(r['hours'] for r in weekly_records)
-        pr_hours = sum(r['prorated_hours'] for r in weekly_records)
-        full_load = sum(r['load_hours'] for r in weekly_records)
-        pr_load = sum(r['prorated_load_hours'] for r in weekly_records)
-
-        # determine department by exact or contains match against group_map keys
-        dept = None
-        try_key = str(device).strip().lower()
-        if try_key in group_map:
-            dept = group_map.get(try_key)
+class WhatIfRequest(BaseModel):
+    month: List[str]
+    moves: List[LoadMove]
+
+
+class WhatIfDevice(DeviceAggregate):
+    shortage_full_before: float
+    shortage_prorated_before: float
+
+
+class WhatIfResponse(BaseModel):
+    month: str
+    moves: List[LoadMove]
+    devices: List[WhatIfDevice]
+
+
+WHAT_IF_FIELDS = check_fields(WhatIfDevice, DEVICE_AGGREGATE_FIELDS + ('shortage_full_before', 'shortage_prorated_before'))
+
+
+def _move_group(resolver, name: str) -> int:
+    g = resolver.find_group(name)
+    if g < 0:
+        raise HTTPException(status_code=400, detail=f"Nieznana grupa zasobów: {name}")
+    return g
+
+
+def _move_week(cube, year: int, week: int) -> int:
+    # checked against the cube's own week axis: request input never reaches the shared calendar
+    pos = cube.week_position(year, week)
+    if pos < 0:
+        raise HTTPException(status_code=422, detail=f"Tydzień spoza zakresu danych: {year}-{week}")
+    return pos
+
+
+def _order_hours(store, group: str, order_id: str, year: int, week: int) -> float:
+    rows = store.group_rows.get(group) if store is not None else None
+    if rows is not None:
+        hit = rows[(store.order_id[rows] == order_id) & (store.year[rows] == year) & (store.week[rows] == week)]
+        if len(hit):
+            return float(store.praca_tpz[hit].sum())
+    raise HTTPException(status_code=400, detail=f"Brak zlecenia {order_id} w grupie {group}, tydzień {year}-{week}")
+
+
+def _move_deltas(snap, moves: List[LoadMove]) -> tuple:
+    """(moves with every field resolved, [(group_idx, week_pos, hours)]) for the cube."""
+    cube, resolver = snap.cube, snap.resolver
+    applied, deltas = [], []
+    for move in moves:
+        src = _move_group(resolver, move.group)
+        dst = _move_group(resolver, move.to_group) if move.to_group is not None else src
+        to_year = move.year if move.to_year is None else move.to_year
+        to_week = move.week if move.to_week is None else move.to_week
+        src_pos = _move_week(cube, move.year, move.week)
+        dst_pos = _move_week(cube, to_year, to_week)
+        if move.hours is not None:
+            if not math.isfinite(move.hours) or move.hours <= 0:
+                raise HTTPException(status_code=400, detail="Liczba godzin musi być dodatnia")
+            hours = float(move.hours)
+        elif move.order_id is not None:
+            hours = _order_hours(snap.parts, resolver.groups[src], move.order_id, move.year, move.week)
         else:
-            # fallback: find any mapping key that contains device substring
-            for k,v in group_map.items():
-                if try_key and try_key in k:
-                    dept = v
-                    break
-
-        # determine display name from scalanie map (leave empty if not found)
-        dkey = str(device).strip().lower()
-        disp_name = scalanie_map.get(dkey, '')
-        results.append(DeviceAggregate(
-            device_id=str(device),
-            display_name=disp_name,
-            department=dept,
-            monthly_hours_full_sum=full_hours,
-            monthly_hours_prorated_sum=pr_hours,
-            monthly_load_full_sum=full_load,
-            monthly_load_prorated_sum=pr_load,
-            shortage_full=full_hours - full_load,
-            shortage_prorated=pr_hours - pr_load,
-        ))
-
-    # sort by shortage_prorated desc
-    results_sorted = sorted(results, key=lambda x: x.shortage_prorated)
-    return results_sorted
+            hours = float(cube.group_load[src, src_pos])
+        deltas.append((src, src_pos, -hours))
+        deltas.append((dst, dst_pos, hours))
+        applied.append(move.model_copy(update={
+            'group': resolver.groups[src], 'to_group': resolver.groups[dst], 'to_year': to_year, 'to_week': to_week,
+            'hours': hours}).model_dump())
+    return applied, deltas
+
+
+@app.post('/what_if', response_model=WhatIfResponse)
+async def what_if(req: WhatIfRequest = Body(...)):
+    """Symulacja przesunięcia obciążenia między tygodniami lub grupami zasobów bez zmiany plików.
+
+    Przesunięcia są nakładane jako różnice na sumy (grupa, rok, tydzień) bieżących danych; zwracane
+    są tylko urządzenia, których sumy w wybranych miesiącach się zmieniają (jak w /devices, z
+    niedoborem przed zmianą). Obciążenie w tygodniu bez wiersza dostępności urządzenia nie jest
+    liczone, tak jak w /devices. Tydzień spoza tygodni danych (pliku dostępności) daje 422.
+    """
+    month_ranges = _parse_month_ranges(req.month)
+    snap = await snapshots.get_async()
+    cube = snap.cube
+    with stage('match'):
+        moves, deltas = _move_deltas(snap, req.moves)
+    with stage('aggregate'):
+        agg = cube.aggregate_months([(r[0].year, r[0].month) for r in month_ranges])
+        idx, d_full, d_prorated = cube.aggregate_delta(deltas, month_ranges)
+    full_hours = agg['hours_full'][idx]
+    pr_hours = agg['hours_prorated'][idx]
+    full_load = agg['load_full'][idx] + d_full
+    pr_load = agg['load_prorated'][idx] + d_prorated
+    shortage_pr = pr_hours - pr_load
+    # same order as /devices: most negative prorated shortage first
+    order = np.argsort(shortage_pr, kind='stable')
+    with stage('serialize'):
+        device_ids = [str(cube.devices[i]) for i in idx[order]]
+        rows = records(
+            WHAT_IF_FIELDS,
+            device_ids,
+            [snap.scalanie_map.get(d.strip().lower(), '') for d in device_ids],
+            [snap.departments.get(d) for d in device_ids],
+            full_hours[order].tolist(),
+            pr_hours[order].tolist(),
+            full_load[order].tolist(),
+            pr_load[order].tolist(),
+            (full_hours - full_load)[order].tolist(),
+            shortage_pr[order].tolist(),
+            (full_hours - agg['load_full'][idx])[order].tolist(),
+            (pr_hours - agg['load_prorated'][idx])[order].tolist(),
+        )
+        return JSONBytes(dumps({'month': ','.join(req.month), 'moves': moves, 'devices': rows}))
@@ -0,0 +1,211 @@
+"""In-process timers, counters and histograms exposed at /metrics in Prometheus text format.
+
+``stage(name)`` times one named step (NAS stat, cache read, Excel parse, group matching,
+aggregation, JSON encoding) into the ``stage_seconds`` histogram and, when a request is being
+handled, into that request's stage dict (see ``start_request``), so a slow request can be broken
+down. Request latency per route template goes to ``http_request_duration_seconds``. Values that
+already exist elsewhere (cache counters, snapshot sizes) are not tracked on the hot path: collector
+callbacks read them when /metrics is scraped.
+
+An observation is a bisect and a locked increment, cheap enough to leave on. The registry is per
+process: with ``run_uvicorn.py --workers N`` every worker reports its own requests.
+"""
+import bisect
+import contextlib
+import contextvars
+import functools
+import math
+import threading
+import time
+
+PREFIX = 'obciazenie_'
+# seconds; stages range from a dict lookup to a multi-minute Excel parse
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(v) -> str:
+    if isinstance(v, bool):
+        return '1' if v else '0'
+    if isinstance(v, float):
+        if math.isnan(v):
+            return 'NaN'
+        if math.isinf(v):
+            return '+Inf' if v > 0 else '-Inf'
+        return repr(v)
+    return str(v)
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, k)} {_number(v)}' for k, v in items]
+
+
+class Histogram:
+    """Bucketed observations (cumulative on output) plus sum and count per label combination."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts, the last slot is +Inf; then sum and count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *labels):
+        """(sum, count) observed for `labels`, or None."""
+        with self._lock:
+            series = self._series.get(labels)
+            return None if series is None else (series[1], series[2])
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        out = []
+        for labels, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                running += n
+                le = 'le="+Inf"' if bound == math.inf else f'le="{_number(float(bound))}"'
+                out.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}')
+            out.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+            out.append(f'{self.name}_count{_labels(self.labelnames, labels)} {count}')
+        return out
+
+
+class Registry:
+    """Metrics plus collector callbacks evaluated at scrape time.
+
+    A collector returns ``[(name, kind, help, [(labels dict, value), ...]), ...]``; names get PREFIX.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        metric = Counter(PREFIX + name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(PREFIX + name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register `fn` (usable as a decorator)."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines += [f'# HELP {m.name} {m.help}', f'# TYPE {m.name} {m.kind}']
+            lines += m.samples()
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception:
+                # a broken collector must not take the whole endpoint down
+                continue
+            for name, kind, help, values in families:
+                name = PREFIX + name
+                lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+                for labels, value in values:
+                    if value is None:
+                        continue
+                    lines.append(f'{name}{_labels(labels.keys(), labels.values())} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('stage_seconds', 'Duration of named processing stages.', ('stage',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template.', ('method', 'route', 'status'))
+ERRORS = REGISTRY.counter('stage_errors_total', 'Stages that ended with an exception.', ('stage',))
+
+# stage durations of the request being handled (a dict shared by the tasks/threads of that request)
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        ERRORS.inc(name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def timed(name: str):
+    """Decorator form of stage()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def start_request():
+    """Collect stage durations for the current request; returns (stages dict, token for end_request)."""
+    stages = {}
+    return stages, _request_stages.set(stages)
+
+
+def end_request(token) -> None:
+    _request_stages.reset(token)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    REQUEST_SECONDS.observe(seconds, method, route, str(status))
@@ -0,0 +1,189 @@
+"""Part-level production store for /device_parts.
+
+The RaportProdukcja sheet is normalized once per file version into flat NumPy columns
+(group, part number, order id, year, week, praca_tpz, week start/end) with a row index per
+resource group, so a request only slices the rows of the matched groups.
+"""
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from .business_calendar import get_calendar
+from .resolver import GroupResolver
+
+
+def _parse_year(val):
+    """Parse a year from an int/float, a 'YYYY-MM[-DD]' string or any text holding a 4-digit year."""
+    try:
+        if pd.isna(val):
+            return None
+    except Exception:
+        pass
+    # direct int
+    try:
+        return int(val)
+    except Exception:
+        pass
+    # string like '2025-09' or '2025-09-01'
+    try:
+        s = str(val)
+        m = s.strip().split('-')
+        if len(m) >= 1 and m[0].isdigit() and len(m[0]) == 4:
+            return int(m[0])
+        # fallback: find first 4-digit group
+        mm = re.search(r"(\d{4})", s)
+        if mm:
+            return int(mm.group(1))
+    except Exception:
+        pass
+    return None
+
+
+def _parse_week(val):
+    try:
+        return int(val)
+    except Exception:
+        return None
+
+
+def _map_unique(series: pd.Series, fn) -> np.ndarray:
+    """Apply a scalar parser once per distinct value; returns float64 with NaN for unparsable values."""
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+    parsed = np.array([np.nan if (r := fn(u)) is None else float(r) for u in uniques] + [np.nan], dtype=float)
+    return parsed[codes]
+
+
+def find_part_columns(columns) -> dict:
+    """Locate RaportProdukcja columns used by /device_parts (same heuristics as before)."""
+    lc = {str(c).lower(): c for c in columns}
+    group_col = next((lc[k] for k in lc if 'grupa' in k and 'zasob' in k), None) or next((lc[k] for k in lc if 'grupa' in k), None)
+    part_col = (next((lc[k] for k in lc if ('numer' in k and ('czesc' in k or 'czes' in k or 'czesci' in k)) or ('nr' in k and 'cz' in k)), None)
+                or next((lc[k] for k in lc if 'numer' in k), None)
+                or next((lc[k] for k in lc if 'part' in k), None))
+    week_col = next((lc[k] for k in lc if 'tyd' in k), None) or next((lc[k] for k in lc if 'week' in k), None)
+    year_col = next((lc[k] for k in lc if 'rok' in k or 'year' in k or 'rokmies' in k or 'rokmiesiac' in k), None)
+    praca_col = next((lc[k] for k in lc if 'praca' in k), None)
+    # optional "ID zlecenia" / order id column
+    order_col = (next((lc[k] for k in lc if 'id' in k and ('zlec' in k or 'zlecen' in k)), None)
+                 or next((lc[k] for k in lc if ('zlec' in k or 'zlecen' in k)), None))
+    return {'group': group_col, 'part': part_col, 'week': week_col, 'year': year_col, 'praca': praca_col, 'order': order_col}
+
+
+# rows per chunk of the streamed (NDJSON) /device_parts response
+NDJSON_CHUNK_ROWS = 2000
+
+
+class PartStore:
+    """Normalized part rows plus a row index per distinct resource group."""
+
+    FIELDS = ('group', 'part_number', 'order_id', 'year', 'week', 'praca_tpz', 'week_start', 'week_end')
+
+    def __init__(self, group, part_number, order_id, year, week, praca_tpz, week_start, week_end):
+        self.group = group
+        self.part_number = part_number
+        self.order_id = order_id
+        self.year = year
+        self.week = week
+        self.praca_tpz = praca_tpz
+        self.week_start = week_start
+        self.week_end = week_end
+        codes, uniques = pd.factorize(group)
+        self.groups = [str(g) for g in uniques]
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        self.group_rows = {g: order[bounds[i]:bounds[i + 1]] for i, g in enumerate(self.groups)}
+        self._resolver = None
+
+    def __len__(self):
+        return len(self.group)
+
+    def columns(self) -> dict:
+        """Flat column arrays accepted by the constructor (used by the columnar cache)."""
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+    def match_groups(self, device_id: str) -> list:
+        """Resolve a device id to groups: exact (case-insensitive), then substring, then digits-only substring."""
+        if self._resolver is None:
+            self._resolver = GroupResolver([], self.groups)
+        return self._resolver.groups_for(device_id)
+
+    def rows_for(self, device_id: str, month_ranges, resolver=None) -> np.ndarray:
+        """Row positions (in sheet order) of the device's parts whose ISO week overlaps any month range.
+
+        `resolver` is the snapshot's GroupResolver; without it the store resolves against its own groups.
+        """
+        if resolver is not None:
+            groups = [g for g in resolver.groups_for(device_id) if g in self.group_rows]
+        else:
+            groups = self.match_groups(device_id)
+        if not groups or not month_ranges:
+            return np.empty(0, dtype=np.int64)
+        rows = np.sort(np.concatenate([self.group_rows[g] for g in groups]))
+        ws = self.week_start[rows]
+        we = self.week_end[rows]
+        hit = np.zeros(len(rows), dtype=bool)
+        for first, last in month_ranges:
+            hit |= (we >= np.datetime64(first, 'D')) & (ws <= np.datetime64(last, 'D'))
+        return rows[hit]
+
+    def iter_ndjson(self, rows, chunk_rows: int = NDJSON_CHUNK_ROWS):
+        """Encode `rows` as NDJSON (one DevicePartLoad object per line), `chunk_rows` lines per bytes chunk.
+
+        Rows are read from the columns chunk by chunk, so memory stays bounded by the chunk size.
+        """
+        for lo in range(0, len(rows), chunk_rows):
+            chunk = rows[lo:lo + chunk_rows]
+            lines = [
+                json.dumps({'part_number': p, 'week': w, 'year': y, 'praca_tpz': v, 'order_id': o},
+                           ensure_ascii=False, separators=(',', ':'))
+                for p, w, y, v, o in zip(
+                    self.part_number[chunk].tolist(),
+                    self.week[chunk].tolist(),
+                    self.year[chunk].tolist(),
+                    self.praca_tpz[chunk].tolist(),
+                    self.order_id[chunk].tolist(),
+                )
+            ]
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def build_part_store(prod_df: pd.DataFrame) -> PartStore:
+    """Normalize a raw RaportProdukcja frame; rows without a usable year/week are dropped."""
+    cols = find_part_columns(prod_df.columns)
+    if not all([cols['group'], cols['part'], cols['week'], cols['year'], cols['praca']]):
+        raise ValueError('Brak wymaganych kolumn w RaportProdukcja')
+
+    week = _map_unique(prod_df[cols['week']], _parse_week)
+    year = _map_unique(prod_df[cols['year']], _parse_year)
+    ok = ~np.isnan(week) & ~np.isnan(year)
+    week = week[ok].astype(np.int64)
+    year = year[ok].astype(np.int64)
+
+    # resolve week dates from the calendar table; non-existent ISO weeks are dropped
+    cal = get_calendar(year.min(), year.max()) if len(year) else get_calendar()
+    week_start = cal.week_starts(cal.week_index(year, week))
+    valid = ~np.isnat(week_start)
+    rows = np.flatnonzero(ok)[valid]
+
+    def _strings(col):
+        return np.array([str(v) for v in prod_df[col].astype(object).to_numpy()[rows]], dtype=object)
+
+    if cols['order'] is not None:
+        raw = prod_df[cols['order']].astype(object).to_numpy()[rows]
+        order_id = np.array([None if pd.isna(v) else str(v) for v in raw], dtype=object)
+    else:
+        order_id = np.full(len(rows), None, dtype=object)
+
+    praca = pd.to_numeric(prod_df[cols['praca']], errors='coerce').fillna(0.0).to_numpy(dtype=float)[rows]
+    return PartStore(
+        group=_strings(cols['group']),
+        part_number=_strings(cols['part']),
+        order_id=order_id,
+        year=year[valid],
+        week=week[valid],
+        praca_tpz=praca,
+        week_start=week_start[valid],
+        week_end=week_start[valid] + np.timedelta64(6, 'D'),
+    )
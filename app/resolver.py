@@ -0,0 +1,200 @@
+"""Device -> production group resolution, computed once per data snapshot.
+
+Every availability device is matched against the distinct production groups with one rule,
+applied in order until it yields a group:
+
+1. ``exact``    - group equals the device id (case-insensitive, stripped),
+2. ``contains`` - group contains the device id,
+3. ``digits``   - group contains the digits of the device id.
+
+The result is stored as integer codes (device -> array of group codes) together with the rule
+that matched, so /devices, /availability and /device_parts all use the same groups.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+RULES = ('exact', 'contains', 'digits')
+
+
+def device_key(device) -> str:
+    return str(device).strip().lower()
+
+
+def row_index(devices) -> dict:
+    """device_key -> ascending positions of the rows with that device (built once per snapshot)."""
+    codes, uniques = pd.factorize(pd.Series(devices, copy=False), use_na_sentinel=False)
+    if not len(uniques):
+        return {}
+    keys, key_codes = np.unique([device_key(u) for u in uniques], return_inverse=True)
+    row_keys = key_codes[codes]
+    order = np.argsort(row_keys, kind='stable')
+    bounds = np.flatnonzero(np.diff(row_keys[order])) + 1
+    return dict(zip(keys.tolist(), np.split(order, bounds)))
+
+
+def _digits(key: str) -> str:
+    return ''.join(re.findall(r"\d+", key))
+
+
+def _match_pairs(device_keys: list, group_keys: list, contains: bool) -> tuple:
+    """Return (device_idx, group_idx) pairs where the group key equals/contains the device key."""
+    dev_idx = []
+    grp_idx = []
+    if not contains:
+        by_key = {}
+        for gi, g in enumerate(group_keys):
+            by_key.setdefault(g, []).append(gi)
+        for di, k in enumerate(device_keys):
+            for gi in by_key.get(k, ()):
+                dev_idx.append(di)
+                grp_idx.append(gi)
+    else:
+        # scan one joined haystack per device instead of one Python comparison per group
+        haystack = '\x00'.join(group_keys)
+        offsets = np.cumsum([0] + [len(g) + 1 for g in group_keys])
+        for di, k in enumerate(device_keys):
+            if k is None:
+                continue
+            if not k:
+                hits = range(len(group_keys))
+            else:
+                found = set()
+                pos = haystack.find(k)
+                while pos != -1:
+                    found.add(int(np.searchsorted(offsets, pos, side='right')) - 1)
+                    pos = haystack.find(k, pos + 1)
+                hits = sorted(found)
+            for gi in hits:
+                dev_idx.append(di)
+                grp_idx.append(gi)
+    return np.asarray(dev_idx, dtype=np.int64), np.asarray(grp_idx, dtype=np.int64)
+
+
+class GroupResolver:
+    """Resolved device -> group codes plus the rule that matched each device."""
+
+    def __init__(self, devices, groups):
+        keys = self._index(devices, groups)
+        self.device_groups, self.rules = self._resolve(keys)
+
+    @classmethod
+    def from_resolved(cls, devices, groups, device_groups, rules):
+        """Resolver with already computed device -> group codes (a published snapshot)."""
+        self = cls.__new__(cls)
+        self._index(devices, groups)
+        self.device_groups = list(device_groups)
+        self.rules = list(rules)
+        return self
+
+    def _index(self, devices, groups) -> list:
+        self.devices = [str(d) for d in devices]
+        self.groups = [str(g) for g in groups]
+        self.group_index = {g: i for i, g in enumerate(self.groups)}
+        self._group_keys = [device_key(g) for g in self.groups]
+        self._group_lower = [g.lower() for g in self.groups]
+        self._lower_index = {}
+        for j, g in enumerate(self._group_lower):
+            self._lower_index.setdefault(g.strip(), j)
+        keys = [device_key(d) for d in self.devices]
+        self.device_index = {}
+        for i, k in enumerate(keys):
+            self.device_index.setdefault(k, i)
+        return keys
+
+    def _resolve(self, keys: list) -> tuple:
+        n = len(keys)
+        found = [None] * n
+        rules = [None] * n
+        pending = list(range(n))
+        steps = (
+            ('exact', self._group_keys, lambda k: k, False),
+            ('contains', self._group_lower, lambda k: k, True),
+            ('digits', self.groups, lambda k: _digits(k) or None, True),
+        )
+        for rule, group_keys, transform, contains in steps:
+            if not pending:
+                break
+            d, g = _match_pairs([transform(keys[i]) for i in pending], group_keys, contains)
+            # pairs come out grouped by device
+            hit, starts = np.unique(d, return_index=True)
+            for di, lo, hi in zip(hit, starts, list(starts[1:]) + [len(d)]):
+                idx = pending[di]
+                found[idx] = g[lo:hi]
+                rules[idx] = rule
+            pending = [i for i in pending if found[i] is None]
+        empty = np.empty(0, dtype=np.int64)
+        return [empty if f is None else f for f in found], rules
+
+    def pairs(self) -> tuple:
+        """(device_idx, group_idx) arrays over all resolved devices."""
+        if not self.device_groups:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        d = np.repeat(np.arange(len(self.devices)), [len(g) for g in self.device_groups])
+        g = np.concatenate(self.device_groups) if len(d) else np.empty(0, dtype=np.int64)
+        return d, g
+
+    def resolve(self, device_id) -> tuple:
+        """(group codes, rule) for a device id; ids outside the availability sheet are matched on the fly."""
+        i = self.device_index.get(device_key(device_id))
+        if i is not None:
+            return self.device_groups[i], self.rules[i]
+        groups, rules = self._resolve([device_key(device_id)])
+        return groups[0], rules[0]
+
+    def find_group(self, name) -> int:
+        """Index of group `name` (exact, else case-insensitive), -1 when unknown."""
+        name = str(name).strip()
+        i = self.group_index.get(name)
+        if i is not None:
+            return i
+        return self._lower_index.get(name.lower(), -1)
+
+    def groups_for(self, device_id) -> list:
+        codes, _ = self.resolve(device_id)
+        return [self.groups[c] for c in codes]
+
+
+def build_resolver(devices, *group_lists) -> GroupResolver:
+    """Resolver over the union of the given group name lists (order of first appearance)."""
+    groups = {}
+    for names in group_lists:
+        for g in names:
+            groups.setdefault(str(g), None)
+    return GroupResolver(devices, list(groups))
+
+
+class DepartmentIndex:
+    """Device -> department from the GrupaZasobow map (group key -> department).
+
+    A device takes the department of the group equal to its key, otherwise of the first group
+    (in sheet order) whose key contains it. Built once per group map, so a lookup is a dict get.
+    """
+
+    def __init__(self, group_map: dict, devices):
+        self.group_map = group_map
+        keys = list(group_map)
+        dev_keys = list(dict.fromkeys(device_key(d) for d in devices))
+        self._by_key = {}
+        pending = []
+        for k in dev_keys:
+            if k in group_map:
+                self._by_key[k] = group_map[k]
+            elif k:
+                pending.append(k)
+        d, g = _match_pairs(pending, keys, contains=True)
+        # pairs are ordered by device, then by group position: keep the first group per device
+        first, starts = np.unique(d, return_index=True)
+        for di, gi in zip(first, g[starts]):
+            self._by_key[pending[di]] = group_map[keys[gi]]
+
+    def get(self, device):
+        key = device_key(device)
+        if key in self._by_key:
+            return self._by_key[key]
+        if key in self.group_map:
+            return self.group_map[key]
+        if key:
+            return next((v for k, v in self.group_map.items() if key in k), None)
+        return None
@@ -0,0 +1,103 @@
+"""Versioned response cache and ETags for the read-only JSON endpoints.
+
+A response is identified by (snapshot version, path, query items in request order): the same
+query against the same data always renders the same JSON. The items are not sorted or stripped,
+because the handlers echo them (the `month` string, the order of `device=...`, raw ids). The ETag is a hash of that key, so a client that
+sends it back in If-None-Match gets 304 without any work, and rendered bodies are kept in a
+bounded in-process LRU so a repeat view costs a dict lookup.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# bump when a cached endpoint changes its response shape, so clients do not keep stale bodies
+RESPONSE_FORMAT = 2
+
+
+def _max_bytes() -> int:
+    try:
+        return max(0, int(float(os.environ.get('RESPONSE_CACHE_MB', '64')) * 1024 * 1024))
+    except ValueError:
+        return 64 * 1024 * 1024
+
+
+def query_key(items) -> tuple:
+    """Query parameters as a tuple, as sent: reordered or padded values render different bodies."""
+    return tuple((str(k), str(v)) for k, v in items)
+
+
+def make_etag(version: str, path: str, query: tuple) -> str:
+    key = repr((RESPONSE_FORMAT, version, path, query)).encode('utf-8')
+    return '"' + hashlib.sha1(key).hexdigest()[:24] + '"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """True when an If-None-Match header value matches `etag` (weak comparison, '*' included)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Bounded LRU of rendered response bodies keyed by ETag."""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = _max_bytes() if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, etag: str):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry
+
+    def put(self, etag: str, body: bytes, media_type: str) -> None:
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[etag] = (body, media_type)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,36 @@
+"""Direct JSON encoding for the list endpoints.
+
+The response models in app.main (DeviceAggregate, AvailabilityResponse, DevicePartLoad, ...)
+describe the wire format, but building one model per row and letting FastAPI validate it
+again costs more than the computation. The endpoints build plain dicts and lists from the
+column arrays, and encode them with pydantic-core's serializer. That is the same Rust encoder
+``model_dump_json`` uses, so number, date and NaN formatting are unchanged. The field list of
+every encoded object is checked against its model at import time (check_fields), so a model
+change that the encoder does not follow fails at startup.
+"""
+import pydantic_core
+from fastapi.responses import Response
+
+
+def check_fields(model, fields) -> tuple:
+    """Return `fields` as a tuple; TypeError unless it equals the model's fields, in order."""
+    fields = tuple(fields)
+    expected = tuple(model.model_fields)
+    if fields != expected:
+        raise TypeError(f'{model.__name__}: pola kodera {fields} różnią się od pól modelu {expected}')
+    return fields
+
+
+def records(fields: tuple, *columns) -> list:
+    """One dict per row from column lists given in `fields` order."""
+    return [dict(zip(fields, values)) for values in zip(*columns)]
+
+
+def dumps(value) -> bytes:
+    # NaN/inf become null, as in model_dump_json()
+    return pydantic_core.to_json(value, inf_nan_mode='null')
+
+
+class JSONBytes(Response):
+    """Response for a body that is already encoded JSON."""
+    media_type = 'application/json'
@@ -0,0 +1,271 @@
+"""One data snapshot shared by several uvicorn worker processes.
+
+In the multi-worker run mode (``run_uvicorn.py --workers N``) a single loader process builds
+snapshots as usual and publishes every new version below SHARED_SNAPSHOT_DIR::
+
+    <root>/<version>/<table>/       column tables in the app.cache format (.npy + meta.json)
+    <root>/<version>/manifest.json  shapes, lookup maps, source signature
+    <root>/current.json             the live version, replaced atomically
+
+Workers (SNAPSHOT_ROLE=worker) never open the Excel files: their SnapshotManager watches
+current.json and attaches to the version it names. Numeric columns (load cube matrices,
+availability rows, part numbers and dates) are memory-mapped read-only, so the page cache holds
+one copy for all workers; only string dictionaries and the small lookup maps are per process.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .business_calendar import get_calendar, reset_calendar
+from .cache import read_table, write_table
+from .engine import LoadCube
+from .metrics import timed
+from .parts import PartStore
+from .resolver import DepartmentIndex, GroupResolver, row_index
+from .snapshot import DataSnapshot, signature_entry
+
+logger = logging.getLogger(__name__)
+
+CURRENT = 'current.json'
+MANIFEST = 'manifest.json'
+REFRESH_MARKER = 'refresh-request'
+REFRESH_DONE = 'refresh-done'
+# published versions kept on disk: the live one and the one workers may still be swapping from
+KEEP_VERSIONS = 2
+
+
+def shared_root() -> Optional[Path]:
+    v = os.environ.get('SHARED_SNAPSHOT_DIR')
+    return Path(v) if v else None
+
+
+def worker_root() -> Optional[Path]:
+    """Directory to attach to when this process runs as a worker, else None."""
+    if os.environ.get('SNAPSHOT_ROLE', '').strip().lower() != 'worker':
+        return None
+    return shared_root()
+
+
+def poll_interval() -> float:
+    try:
+        return max(0.2, float(os.environ.get('SHARED_POLL_SECONDS', '2')))
+    except ValueError:
+        return 2.0
+
+
+def recheck_interval() -> float:
+    """Max age of a worker's pointer check before a request re-stats it (a local file, so cheap)."""
+    try:
+        return max(0.0, float(os.environ.get('SHARED_RECHECK_SECONDS', '0.25')))
+    except ValueError:
+        return 0.25
+
+
+def pointer_sources(root: Path) -> dict:
+    """Snapshot sources of a worker: only the pointer file."""
+    return {'shared': root / CURRENT}
+
+
+def _write_json(path: Path, value) -> None:
+    tmp = path.with_name(f'{path.name}.tmp-{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(value, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def _tables(snap) -> dict:
+    cube = snap.cube
+    resolver = snap.resolver
+    groups = resolver.device_groups
+    tables = {
+        'availability': {c: snap.availability[c].to_numpy() for c in snap.availability.columns},
+        'devices': {
+            'device': np.asarray(cube.devices, dtype=object),
+            'group_count': np.asarray([len(g) for g in groups], dtype=np.int64),
+            'rule': np.asarray(resolver.rules, dtype=object),
+        },
+        'weeks': {'year': cube.week_years, 'week': cube.week_numbers},
+        'cells': {'hours': cube.hours.ravel(), 'rows': cube.rows.ravel(), 'load': cube.load.ravel()},
+        'groups': {'group': np.asarray(resolver.groups, dtype=object)},
+        'group_cells': {'load': cube.group_load.ravel()},
+        'group_codes': {'code': np.concatenate(groups) if groups else np.empty(0, dtype=np.int64)},
+    }
+    if snap.parts is not None:
+        tables['parts'] = snap.parts.columns()
+    return tables
+
+
+@timed('snapshot.publish')
+def publish(snap, root: Path) -> Path:
+    """Write `snap` under `root` (once per version) and point current.json at it."""
+    root.mkdir(parents=True, exist_ok=True)
+    target = root / snap.version
+    if not (target / MANIFEST).exists():
+        tmp = root / f'{snap.version}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        try:
+            for name, columns in _tables(snap).items():
+                write_table(tmp / name, columns, {'table': name})
+            err = snap.parts_error
+            _write_json(tmp / MANIFEST, {
+                'version': snap.version,
+                'built_at': snap.built_at,
+                'signature': [list(e) for e in snap.signature],
+                'cube_shape': list(snap.cube.shape),
+                'group_map': snap.group_map,
+                'scalanie_map': snap.scalanie_map,
+                'parts_error': None if err is None else {'type': type(err).__name__, 'message': str(err)},
+            })
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp, target)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    _write_json(root / CURRENT, {'version': snap.version, 'published_at': time.time()})
+    _prune(root, snap.version)
+    logger.info('snapshot %s published to %s', snap.version, target)
+    return target
+
+
+def _prune(root: Path, live: str) -> None:
+    versions = []
+    for p in root.iterdir():
+        if p.is_dir() and (p / MANIFEST).exists() and p.name != live:
+            versions.append((p.stat().st_mtime, p))
+    for _, p in sorted(versions, reverse=True)[KEEP_VERSIONS - 1:]:
+        # Windows refuses to delete files a worker still maps; the next publish retries
+        shutil.rmtree(p, ignore_errors=True)
+
+
+@timed('snapshot.attach')
+def attach(root: Path, signature: tuple, prev=None) -> DataSnapshot:
+    """Snapshot backed by the version current.json names; `signature` is that of the pointer file."""
+    pointer = _read_json(root / CURRENT)
+    base = root / pointer['version']
+    manifest = _read_json(base / MANIFEST)
+    tables = {p.name: read_table(p) for p in base.iterdir() if p.is_dir()}
+
+    source_sig = tuple(tuple(e) for e in manifest['signature'])
+    if prev is not None and signature_entry(prev.source_signature, 'holidays') != signature_entry(source_sig, 'holidays'):
+        reset_calendar()
+
+    dev = tables['devices']
+    devices = dev['device'].tolist()
+    counts = np.asarray(dev['group_count'])
+    device_groups = np.split(tables['group_codes']['code'], np.cumsum(counts)[:-1]) if len(counts) else []
+    resolver = GroupResolver.from_resolved(devices, tables['groups']['group'].tolist(), device_groups, dev['rule'].tolist())
+
+    weeks = tables['weeks']
+    week_years, week_numbers = weeks['year'], weeks['week']
+    # calendar positions depend on this process's calendar range, so they are recomputed
+    calendar = get_calendar(int(week_years.min()), int(week_years.max())) if len(week_years) else get_calendar()
+    shape = tuple(manifest['cube_shape'])
+    cells = tables['cells']
+    # versions published before group loads were shared have no group_cells table
+    group_cells = tables.get('group_cells')
+    cube = LoadCube(
+        calendar, devices, week_years, week_numbers, calendar.week_index(week_years, week_numbers),
+        cells['hours'].reshape(shape), cells['rows'].reshape(shape), cells['load'].reshape(shape), resolver,
+        None if group_cells is None else group_cells['load'].reshape(len(resolver.groups), shape[1]),
+    )
+
+    parts, parts_error = None, None
+    if 'parts' in tables:
+        parts = PartStore(**tables['parts'])
+    else:
+        err = manifest['parts_error'] or {'type': 'ValueError', 'message': 'Brak danych części'}
+        parts_error = (ValueError if err['type'] == 'ValueError' else RuntimeError)(err['message'])
+
+    group_map = manifest['group_map']
+    if prev is not None and prev.group_map == group_map and prev.cube.devices == devices:
+        departments = prev.departments
+    else:
+        departments = DepartmentIndex(group_map, devices)
+    availability = pd.DataFrame(tables['availability'], copy=False)
+    return DataSnapshot(
+        signature,
+        version=manifest['version'],
+        built_at=manifest['built_at'],
+        source_signature=source_sig,
+        availability=availability,
+        device_rows=row_index(availability['device']),
+        production=None,
+        group_map=group_map,
+        departments=departments,
+        scalanie_map=manifest['scalanie_map'],
+        parts=parts,
+        parts_error=parts_error,
+        cube=cube,
+        resolver=resolver,
+    )
+
+
+def _mtime(path: Path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def run_publisher(manager, root: Path, stop: threading.Event = None) -> None:
+    """Loader loop: rebuild with `manager` when sources change and publish every new version."""
+    stop = stop or threading.Event()
+    root.mkdir(parents=True, exist_ok=True)
+    marker = root / REFRESH_MARKER
+    seen = _mtime(marker)
+    published = None
+    while not stop.is_set():
+        token = None
+        m = _mtime(marker)
+        if m != seen:
+            seen = m
+            token = marker.read_text(encoding='utf-8')
+        try:
+            snap = manager.refresh()
+            if snap.version != published:
+                publish(snap, root)
+                published = snap.version
+        except Exception:
+            logger.exception('snapshot publish failed')
+        if token is not None:
+            (root / REFRESH_DONE).write_text(token, encoding='utf-8')
+        # sleep one poll interval, waking early when a worker asks (after an upload)
+        deadline = time.time() + manager.poll_interval
+        while not stop.is_set() and time.time() < deadline and _mtime(marker) == seen:
+            stop.wait(0.5)
+
+
+def loader_main(root: str) -> None:
+    """Entry point of the loader process started by run_uvicorn.py."""
+    from .main import snapshots
+    run_publisher(snapshots, Path(root))
+
+
+def request_refresh(root: Path, timeout: float = 60.0) -> bool:
+    """Ask the loader to check its sources now; True once it has (and published any change)."""
+    token = f'{os.getpid()}-{threading.get_ident()}-{time.time_ns()}'
+    (root / REFRESH_MARKER).write_text(token, encoding='utf-8')
+    done = root / REFRESH_DONE
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if done.read_text(encoding='utf-8') == token:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
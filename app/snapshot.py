@@ -0,0 +1,212 @@
+"""Data snapshots with background refresh (stale-while-revalidate).
+
+A DataSnapshot bundles everything the endpoints read (normalized frames, part store, load cube,
+lookup maps) for one combination of source file versions. SnapshotManager keeps the last good
+snapshot and polls the source files from a daemon thread; when a file changes it rebuilds in the
+background and swaps the new snapshot in with a single reference assignment. Requests never
+stat the NAS themselves: they are served from the current snapshot, and only the very first
+request (before any snapshot exists) waits for a build.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from .concurrency import SingleFlight
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+def _poll_interval() -> float:
+    try:
+        return max(1.0, float(os.environ.get('SNAPSHOT_POLL_SECONDS', '15')))
+    except ValueError:
+        return 15.0
+
+
+def file_signature(paths: dict) -> tuple:
+    """(name, path, mtime_ns, size) per source; missing files get None for mtime/size."""
+    sig = []
+    for name, path in sorted(paths.items()):
+        if path is None:
+            sig.append((name, None, None, None))
+            continue
+        try:
+            st = os.stat(path)
+            sig.append((name, str(path), st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((name, str(path), None, None))
+    return tuple(sig)
+
+
+def signature_entry(signature: tuple, name: str):
+    """(mtime_ns, size) recorded for source `name`, or None when it is not part of the signature."""
+    for n, _, mtime, size in signature:
+        if n == name:
+            return mtime, size
+    return None
+
+
+def signature_version(signature: tuple) -> str:
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()[:12]
+
+
+class DataSnapshot:
+    """Immutable bundle of derived data for one set of source file versions."""
+
+    def __init__(self, signature: tuple, **parts):
+        self.signature = signature
+        self.version = signature_version(signature)
+        self.built_at = time.time()
+        self.__dict__.update(parts)
+
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+
+class SnapshotManager:
+    """Serve the last good snapshot; detect source changes and rebuild in the background."""
+
+    def __init__(self, sources_fn, build_fn, poll_interval: float = None, recheck: float = None):
+        self._sources_fn = sources_fn
+        self._build_fn = build_fn
+        self.poll_interval = poll_interval or _poll_interval()
+        # for cheap local sources (the shared snapshot pointer): re-stat them on get() when the
+        # last check is older than `recheck` seconds, instead of waiting for the watcher
+        self.recheck = recheck
+        self._current = None
+        # a request can pin one snapshot so everything it reads (and its ETag) uses one version
+        self._pinned = contextvars.ContextVar(f'pinned_snapshot_{id(self)}', default=None)
+        self._flights = SingleFlight()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.last_check = None
+        self.last_error = None
+        self.last_error_at = None
+        self.builds = 0
+
+    @property
+    def current(self):
+        return self._current
+
+    def signature(self) -> tuple:
+        with stage('sources.stat'):
+            return file_signature(self._sources_fn())
+
+    def _build(self, signature: tuple):
+        def run():
+            started = time.time()
+            with stage('snapshot.build'):
+                snap = self._build_fn(signature)
+            self._current = snap
+            self.builds += 1
+            self.last_error = None
+            logger.info('snapshot %s built in %.1fms', snap.version, (time.time() - started) * 1000)
+            return snap
+        return self._flights.do(('snapshot', signature), run)
+
+    def refresh(self, force: bool = False):
+        """Rebuild when the sources changed (or always with `force`); keeps the old snapshot on failure."""
+        signature = self.signature()
+        self.last_check = time.time()
+        cur = self._current
+        if not force and cur is not None and cur.signature == signature:
+            return cur
+        try:
+            return self._build(signature)
+        except Exception as exc:
+            self.last_error = f'{type(exc).__name__}: {exc}'
+            self.last_error_at = time.time()
+            if cur is None:
+                raise
+            logger.warning('snapshot refresh failed, serving %s: %s', cur.version, self.last_error)
+            return cur
+
+    def pin(self, snap):
+        """Make get()/get_async() in the current context return `snap`; returns a token for unpin()."""
+        return self._pinned.set(snap)
+
+    def unpin(self, token) -> None:
+        self._pinned.reset(token)
+
+    def get(self):
+        """Return the current (or pinned) snapshot, building the first one synchronously."""
+        self.start()
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return pinned
+        cur = self._current
+        if cur is not None and not self._recheck_due():
+            return cur
+        return self.refresh()
+
+    async def get_async(self):
+        self.start()
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return pinned
+        cur = self._current
+        if cur is not None and not self._recheck_due():
+            return cur
+        return await self._flights.do_async(('first',), self.refresh)
+
+    def _recheck_due(self) -> bool:
+        return self.recheck is not None and time.time() - (self.last_check or 0) >= self.recheck
+
+    async def refresh_async(self, force: bool = False):
+        return await self._flights.do_async(('refresh', force), lambda: self.refresh(force=force))
+
+    def request_refresh(self):
+        """Wake the watcher so it checks the sources now instead of at the next poll."""
+        self._wake.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='snapshot-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _watch(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self._current is None:
+                # nothing served yet; the first request builds synchronously
+                continue
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('snapshot watcher error')
+
+    def status(self) -> dict:
+        cur = self._current
+        return {
+            'version': cur.version if cur else None,
+            'built_at': cur.built_at if cur else None,
+            'age_seconds': round(cur.age_seconds(), 3) if cur else None,
+            'sources': [
+                {'name': name, 'path': path, 'mtime_ns': mtime, 'size': size}
+                for name, path, mtime, size in (cur.signature if cur else ())
+            ],
+            'last_check': self.last_check,
+            'last_error': self.last_error,
+            'last_error_at': self.last_error_at,
+            'builds': self.builds,
+            'poll_interval': self.poll_interval,
+            'watcher_alive': bool(self._thread and self._thread.is_alive()),
+        }
@@ -0,0 +1,134 @@
+"""Streaming, column-projected worksheet reader.
+
+pd.read_excel converts every cell of a sheet and builds every column before we pick the four or
+five we use. read_columns() streams rows with openpyxl ``read_only`` / ``iter_rows(values_only=True)``,
+resolves the wanted columns from the header row and converts only those, ``CHUNK_ROWS`` rows at
+a time. Each chunk of a column is typed as soon as it is read (numbers -> int64/float64, dates ->
+datetime64), so only text is held as Python objects. Cell conversion and type inference follow
+pandas' openpyxl reader (integral floats become ints, error cells and empty cells become NaN,
+trailing blank rows are dropped), so the result matches ``pd.read_excel(...)[columns]``.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+CHUNK_ROWS = 20000
+_ERRORS = frozenset(ERROR_CODES)
+# the strings pandas' parsers read as NaN by default
+_NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+})
+_NUMBERS = frozenset({int, float})
+
+
+def open_workbook(path):
+    """Open a workbook for streaming reads; close it with ``wb.close()``."""
+    return load_workbook(path, read_only=True, data_only=True, keep_links=False)
+
+
+def _convert(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str) and value in _ERRORS:
+        return np.nan
+    return value
+
+
+def _typed(values: list) -> np.ndarray:
+    """One chunk of a column as int64/float64 or datetime64 when all its cells allow it, else object.
+
+    Digit-only text stays object: whether it turns numeric depends on the whole column.
+    """
+    values = [np.nan if isinstance(v, str) and v in _NA_STRINGS else v for v in values]
+    kinds = set(map(type, values))
+    if kinds <= _NUMBERS:
+        return pd.to_numeric(pd.Series(values, dtype=object)).to_numpy()
+    col = np.empty(len(values), dtype=object)
+    col[:] = values
+    if kinds == {datetime} or (kinds == {datetime, float} and all(v != v for v in values if type(v) is float)):
+        return pd.Series(col).infer_objects().to_numpy()
+    return col
+
+
+def _chunk(rows: list, width: int) -> list:
+    """Transpose a block of projected rows into one typed array per column."""
+    return [_typed([r[j] for r in rows]) for j in range(width)]
+
+
+def _objects(values: np.ndarray) -> np.ndarray:
+    """Undo _typed: the cell values of a chunk as an object array."""
+    if values.dtype == object:
+        return values
+    out = values.astype(object)
+    if values.dtype.kind == 'M':
+        out[np.isnat(values)] = np.nan
+    elif values.dtype.kind == 'f':
+        # cells never hold integral floats (_convert made them ints), so integral means int
+        integral = np.flatnonzero(np.isfinite(values) & (values == np.floor(values)))
+        out[integral] = [int(v) for v in values[integral]]
+    return out
+
+
+def _infer(values: np.ndarray) -> pd.Series:
+    """Type a whole column the way pandas' TextParser does for read_excel."""
+    s = pd.Series(values, dtype=object)
+    s = s.where(~s.isin(_NA_STRINGS), np.nan)
+    if not s.map(type).eq(bool).any():
+        try:
+            # all-numeric (including numeric text) becomes int64/float64
+            return pd.to_numeric(s)
+        except (ValueError, TypeError):
+            pass
+    return s.infer_objects()
+
+
+def _column(parts: list) -> pd.Series:
+    """Join the typed chunks of one column; mixed chunks are typed again as a whole column."""
+    kinds = {p.dtype.kind for p in parts}
+    if parts and (kinds <= {'i', 'f'} or kinds == {'M'}):
+        return pd.Series(np.concatenate(parts))
+    return _infer(np.concatenate([_objects(p) for p in parts]) if parts else np.empty(0, dtype=object))
+
+
+def read_columns(ws, select=None, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Read the columns of worksheet `ws` chosen by `select(header_names)` (all when None)."""
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    # let pandas name the columns (dedup 'x.1', 'Unnamed: n') exactly as read_excel would
+    header = [_convert(v) for v in header]
+    while header and header[-1] == '':
+        header.pop()
+    names = list(TextParser([header], header=0).read().columns)
+    wanted = set(select(names) if select is not None else names)
+    index = [i for i, n in enumerate(names) if n in wanted]
+    names = [names[i] for i in index]
+
+    # chunks are typed as they are read; a column whose chunks disagree (text in some) is typed
+    # again as a whole at the end, exactly as pandas would
+    chunks, buf, blank = [], [], 0
+    for row in rows:
+        if row.count(None) == len(row):
+            # blank rows count only if data follows them
+            blank += 1
+            continue
+        if blank:
+            buf.extend([[''] * len(index)] * blank)
+            blank = 0
+        width = len(row)
+        buf.append([_convert(row[i]) if i < width else '' for i in index])
+        if len(buf) >= chunk_rows:
+            chunks.append(_chunk(buf, len(index)))
+            buf = []
+    if buf:
+        chunks.append(_chunk(buf, len(index)))
+    data = {name: _column([c[j] for c in chunks]) for j, name in enumerate(names)}
+    return pd.DataFrame(data, columns=names)
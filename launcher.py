@@ -6,6 +6,9 @@ from __future__ import annotations
 import os
 import pathlib
 import sys
+import threading
+import time
+import urllib.request
 import uvicorn
 import logging
 
@@ -18,17 +21,31 @@ os.environ.setdefault("DATA_FILE_PATH", str(ROOT / "DostepnoscWTygodniach.xlsx")
 os.environ.setdefault("SCALANIE_FILE_PATH", str(ROOT / "Scalanie17.xlsx"))
 
 
-def ensure_scalanie_csv():
-    # Wygeneruj plik scalanie_group_name.csv jeśli brak
-    target = ROOT / "scalanie_group_name.csv"
-    if target.exists():
-        return
-    try:
-        from scripts import merge_scalanie17
+def wait_until_ready(port: int, timeout: float = 600.0) -> bool:
+    """Poll /health/ready until the data is loaded and the default view is warm."""
+    url = f"http://127.0.0.1:{port}/health/ready"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                if resp.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
 
-        merge_scalanie17.main()
-    except Exception:
-        logging.getLogger(__name__).exception("Nie udało się wygenerować scalanie_group_name.csv")
+
+def announce_when_ready(port: int):
+    logger = logging.getLogger(__name__)
+    if wait_until_ready(port):
+        logger.info("[launcher] Dane wczytane - aplikacja gotowa: http://127.0.0.1:%s/", port)
+        if os.environ.get("OPEN_BROWSER", "0") == "1":
+            import webbrowser
+
+            webbrowser.open(f"http://127.0.0.1:{port}/")
+    else:
+        logger.warning("[launcher] Aplikacja nie zgłosiła gotowości (/health/ready) - sprawdź dostęp do plików")
 
 
 def main():
@@ -40,8 +57,6 @@ def main():
     except Exception:
         pass
 
-    ensure_scalanie_csv()
-
     try:
         from app.main import app
     except Exception:
@@ -60,7 +75,10 @@ def main():
     logger.info("[launcher] DATA_FILE_PATH=%s", data)
     logger.info("[launcher] Start na porcie %s", port)
 
-    uvicorn.run(app, host="127.0.0.1", port=port)
+    # the server warms up in the background; report (and optionally open the UI) once it is ready
+    threading.Thread(target=announce_when_ready, args=(port,), name="ready-check", daemon=True).start()
+    # uvicorn logs through the queued root handler; the app writes its own access line
+    uvicorn.run(app, host="127.0.0.1", port=port, log_config=None, access_log=False)
 
 
 if __name__ == "__main__":
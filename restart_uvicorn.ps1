@@ -4,5 +4,9 @@ if($procs){
 }
 $p = Start-Process -FilePath 'python' -ArgumentList '"C:\Users\jmichalak\Desktop\Projekt Obciążenie nowa wersja\run_uvicorn.py"' -WindowStyle Hidden -PassThru
 Write-Output "Started PID:$($p.Id)"
-Start-Sleep -Seconds 1
-Try { Invoke-RestMethod -Uri 'http://127.0.0.1:8000/' -Method GET -TimeoutSec 5 | Out-Null; Write-Output 'UP' } Catch { Write-Output ('DOWN: '+$_.Exception.Message) }
+# wait until the data is loaded and the default view is warm (/health/ready), up to 10 minutes
+$ready = $false
+for($i = 0; $i -lt 600; $i++){
+    Try { Invoke-RestMethod -Uri 'http://127.0.0.1:8000/health/ready' -Method GET -TimeoutSec 5 | Out-Null; $ready = $true; break } Catch { Start-Sleep -Seconds 1 }
+}
+if($ready){ Write-Output 'UP' } else { Try { Invoke-RestMethod -Uri 'http://127.0.0.1:8000/health/live' -Method GET -TimeoutSec 5 | Out-Null; Write-Output 'UP (dane niegotowe)' } Catch { Write-Output ('DOWN: '+$_.Exception.Message) } }
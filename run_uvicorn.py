@@ -1,7 +1,23 @@
+"""Start the API with uvicorn.
+
+    python run_uvicorn.py                 development: one process, auto-reload
+    python run_uvicorn.py --workers 4     production: one loader process builds the data
+                                          snapshot, 4 workers share it read-only (app/shared.py)
+"""
+import argparse
+import importlib.util
+import multiprocessing
 import os
 import sys
+import time
+from pathlib import Path
+
 import uvicorn
-import importlib.util
+
+ROOT = Path(__file__).resolve().parent
+# uvicorn's loggers propagate to the queued root handler (app/logging_config.py) instead of
+# writing to the console on the event loop; the app logs its own access line with timings
+LOGGING = {'log_config': None, 'access_log': False}
 
 
 def load_app_module():
@@ -15,56 +31,88 @@ def load_app_module():
     try:
         import app.main as m
         return m
-    import os
-    import sys
-    import uvicorn
-    import importlib.util
-
-
-    def load_app_module():
-        """Locate and load the application's main module.
-
-        Tries (in order):
-        - import app.main
-        - import main
-        - load app/main.py or main.py from this script's directory
-        """
-        try:
-            import app.main as m
-            return m
-        except Exception:
-            pass
-
-        try:
-            import main as m
-            return m
-        except Exception:
-            pass
-
-        try:
-            if getattr(sys, 'frozen', False):
-                base = os.path.dirname(sys.executable)
-            else:
-                base = os.path.dirname(__file__)
-
-            candidates = [os.path.join(base, 'app', 'main.py'), os.path.join(base, 'main.py')]
-            for p in candidates:
-                if os.path.exists(p):
-                    spec = importlib.util.spec_from_file_location('main_from_path', p)
-                    mod = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(mod)
-                    return mod
-        except Exception:
-            pass
-
-        raise ImportError('Could not locate app.main or main module')
-
-
-    if __name__ == '__main__':
-        mod = load_app_module()
-        asgi_app = getattr(mod, 'app', None)
-        if asgi_app is None:
-            uvicorn.run('app.main:app', host='127.0.0.1', port=8000, log_level='info', reload=True)
+    except Exception:
+        pass
+
+    try:
+        import main as m
+        return m
+    except Exception:
+        pass
+
+    try:
+        if getattr(sys, 'frozen', False):
+            base = os.path.dirname(sys.executable)
         else:
-            uvicorn.run(asgi_app, host='127.0.0.1', port=8000, log_level='info', reload=True)
+            base = os.path.dirname(__file__)
+
+        candidates = [os.path.join(base, 'app', 'main.py'), os.path.join(base, 'main.py')]
+        for p in candidates:
+            if os.path.exists(p):
+                spec = importlib.util.spec_from_file_location('main_from_path', p)
+                mod = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(mod)
+                return mod
+    except Exception:
+        pass
+
+    raise ImportError('Could not locate app.main or main module')
+
+
+def run_dev(host: str, port: int):
+    # reload needs the import string; a frozen exe (or a layout without the app package) runs the module object
+    if not getattr(sys, 'frozen', False) and importlib.util.find_spec('app.main') is not None:
+        uvicorn.run('app.main:app', host=host, port=port, log_level='info', reload=True, **LOGGING)
+        return
+    mod = load_app_module()
+    uvicorn.run(mod.app, host=host, port=port, log_level='info', **LOGGING)
+
+
+def run_workers(host: str, port: int, workers: int, wait_seconds: float):
+    from app import shared
+
+    root = Path(os.environ.get('SHARED_SNAPSHOT_DIR') or ROOT / '.snapshot')
+    os.environ['SHARED_SNAPSHOT_DIR'] = str(root)
+    os.environ.pop('SNAPSHOT_ROLE', None)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / shared.CURRENT).unlink(missing_ok=True)
+
+    loader = multiprocessing.Process(target=shared.loader_main, args=(str(root),), name='snapshot-loader', daemon=True)
+    loader.start()
+    # workers attach to a published snapshot, so wait for the first one
+    deadline = time.time() + wait_seconds
+    while not (root / shared.CURRENT).exists():
+        if not loader.is_alive():
+            sys.exit('Proces ładujący dane zakończył się przed opublikowaniem danych')
+        if time.time() > deadline:
+            print('Brak opublikowanych danych po %.0fs - start workerów mimo to' % wait_seconds, file=sys.stderr)
+            break
+        time.sleep(0.5)
+
+    os.environ['SNAPSHOT_ROLE'] = 'worker'
     try:
+        uvicorn.run('app.main:app', host=host, port=port, log_level='info', workers=workers, **LOGGING)
+    finally:
+        loader.terminate()
+
+
+def main(argv=None):
+    # the loader process of --workers mode must not re-run main() in a frozen exe
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '1')))
+    parser.add_argument('--wait', type=float, default=300.0, help='max seconds to wait for the first snapshot')
+    args = parser.parse_args(argv)
+    sys.path.insert(0, str(ROOT))
+    from app.logging_config import setup_logging
+    setup_logging()
+    if args.workers > 1:
+        run_workers(args.host, args.port, args.workers, args.wait)
+    else:
+        run_dev(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""Benchmark data loading and the core endpoints in-process.
+
+Generates synthetic workbooks (scripts/generate_synthetic_data.py) or uses existing ones, then
+measures through the ASGI app, without a server or network in between:
+
+- cold load:   snapshot build from the workbooks with an empty table cache,
+- cached load: the same build again with the columnar cache filled (a restart),
+- /devices, /availability/{id} and /device_parts/{id}: the first request of every query on the
+  fresh snapshot, then p50/p95/p99 with the response cache cleared before each request (render)
+  and with it warm (cached),
+- peak memory: process peak RSS and, with --tracemalloc, the Python heap peak of the cold load.
+
+The report is JSON; --baseline compares it with an earlier report and exits with 1 when a timing
+got slower than --threshold (relative) and by more than 1 ms.
+
+    python -m scripts.benchmark --groups 500 --rows 200000 --out bench.json
+    python -m scripts.benchmark --data bench_data --baseline bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from typing import Optional
+from urllib.parse import urlencode
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# bump when the report layout changes
+REPORT_FORMAT = 1
+# timing differences below this are noise, whatever the ratio
+NOISE_MS = 1.0
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, None where it cannot be read."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        psapi = ctypes.WinDLL("psapi")
+        if not psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+        return int(counters.PeakWorkingSetSize)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def _mb(n) -> Optional[float]:
+    return None if n is None else round(n / (1024 * 1024), 1)
+
+
+def summarize(samples_ms: list) -> dict:
+    """count/mean/p50/p95/p99/max of latencies in milliseconds."""
+    if not samples_ms:
+        return {"count": 0}
+    a = np.asarray(samples_ms, dtype=float)
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {
+        "count": len(a),
+        "mean": round(float(a.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(a.max()), 3),
+    }
+
+
+async def asgi_get(app, path: str, query: str = "") -> tuple:
+    """GET `path` from an ASGI app in-process; returns (status, headers, body)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode("utf-8"), "root_path": "",
+        "query_string": query.encode("utf-8"), "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 50000), "server": ("benchmark", 80),
+    }
+    done = asyncio.Event()
+    received = False
+    status, headers, chunks = None, {}, []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # middleware listening for a disconnect waits until the response is complete
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers.update((k.decode("latin-1").lower(), v.decode("latin-1")) for k, v in message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return status, headers, b"".join(chunks)
+
+
+@contextlib.contextmanager
+def _patched(module, **values):
+    saved = {k: getattr(module, k) for k in values}
+    for k, v in values.items():
+        setattr(module, k, v)
+    try:
+        yield module
+    finally:
+        for k, v in saved.items():
+            setattr(module, k, v)
+
+
+def _reset_loaders(main) -> None:
+    # per-file parse results kept by app.main between snapshot builds
+    for name in ("_cache_df", "_cache_mtime", "_workbook_tables", "_workbook_key", "_scalanie_cache", "_scalanie_key", "_cube_cache", "_cube_sources"):
+        setattr(main, name, None)
+
+
+def _months(snap, limit: int) -> list:
+    """The first `limit` months (YYYY-MM) with availability rows."""
+    weeks = snap.availability[["year", "week"]].drop_duplicates()
+    months = set()
+    for y, w in zip(weeks["year"].tolist(), weeks["week"].tolist()):
+        try:
+            thursday = date.fromisocalendar(int(y), int(w), 4)
+        except ValueError:
+            continue
+        months.add(f"{thursday.year:04d}-{thursday.month:02d}")
+    return sorted(months)[:limit]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+async def _measure(app, responses, queries: list, iterations: int) -> dict:
+    """first request per query, then `iterations` requests cycling over the queries per cache mode."""
+    result = {"queries": len(queries), "errors": 0}
+
+    async def timed(path, query):
+        t0 = time.perf_counter()
+        status, _, _ = await asgi_get(app, path, query)
+        ms = (time.perf_counter() - t0) * 1000
+        if status != 200:
+            result["errors"] += 1
+        return ms
+
+    first = []
+    for path, query in queries:
+        responses.clear()
+        first.append(await timed(path, query))
+    result["first"] = summarize(first)
+    render = []
+    for i in range(iterations):
+        responses.clear()
+        render.append(await timed(*queries[i % len(queries)]))
+    result["render"] = summarize(render)
+    for path, query in queries:
+        await timed(path, query)
+    cached = [await timed(*queries[i % len(queries)]) for i in range(iterations)]
+    result["cached"] = summarize(cached)
+    return result
+
+
+def run(data_file, prod_file, iterations: int = 100, devices: int = 8, months: int = 3, trace: bool = False) -> dict:
+    """Measure load and endpoint latency for the given workbooks; returns the report dict."""
+    from app import cache as table_cache
+    from app import main
+    from app.response_cache import ResponseCache
+    from app.snapshot import SnapshotManager
+
+    data_file, prod_file = pathlib.Path(data_file), pathlib.Path(prod_file)
+    report = {
+        "format": REPORT_FORMAT,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": {},
+        "data": {
+            "data_file": str(data_file), "prod_file": str(prod_file),
+            "data_file_mb": _mb(data_file.stat().st_size), "prod_file_mb": _mb(prod_file.stat().st_size),
+        },
+        "settings": {"iterations": iterations, "devices": devices, "months": months},
+    }
+    for name in ("numpy", "pandas", "openpyxl", "fastapi", "pydantic"):
+        try:
+            report["packages"][name] = __import__(name).__version__
+        except Exception:
+            report["packages"][name] = None
+    memory = {"rss_start_mb": _mb(peak_rss_bytes())}
+
+    # per-request access logging would dominate the console, not the timings
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        tmp = pathlib.Path(tmp)
+        (tmp / "cache").mkdir()
+        (tmp / "uploaded").mkdir()
+        responses = ResponseCache()
+        snapshots = SnapshotManager(main._snapshot_sources, main.build_snapshot, poll_interval=3600)
+        with _patched(table_cache, CACHE_DIR=tmp / "cache"), _patched(
+                main, DATA_FILE=data_file, PROD_FILE=prod_file, UPLOAD_DIR=tmp / "uploaded",
+                snapshots=snapshots, responses=responses):
+            _reset_loaders(main)
+            try:
+                if trace:
+                    tracemalloc.start()
+                t0 = time.perf_counter()
+                snap = snapshots.refresh(force=True)
+                cold_ms = (time.perf_counter() - t0) * 1000
+                if trace:
+                    memory["tracemalloc_peak_mb"] = _mb(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                memory["peak_rss_after_load_mb"] = _mb(peak_rss_bytes())
+
+                _reset_loaders(main)
+                t0 = time.perf_counter()
+                snap = snapshots.refresh(force=True)
+                cached_ms = (time.perf_counter() - t0) * 1000
+                report["load"] = {"cold_ms": round(cold_ms, 1), "cached_ms": round(cached_ms, 1)}
+                report["data"].update({
+                    "devices": len(snap.cube.devices),
+                    "availability_rows": len(snap.availability),
+                    "part_rows": len(snap.parts) if snap.parts is not None else 0,
+                    "production_groups": len(snap.resolver.groups),
+                })
+
+                month_list = _months(snap, months)
+                report["settings"]["month_list"] = month_list
+                report["endpoints"] = asyncio.run(_endpoints(main.app, responses, month_list, devices, iterations))
+            finally:
+                _reset_loaders(main)
+    memory["peak_rss_mb"] = _mb(peak_rss_bytes())
+    report["memory"] = memory
+    return report
+
+
+async def _endpoints(app, responses, month_list: list, devices: int, iterations: int) -> dict:
+    if not month_list:
+        raise ValueError("Brak miesięcy z danymi dostępności")
+    device_queries = [("/devices", urlencode({"month": m})) for m in month_list]
+    if len(month_list) > 1:
+        device_queries.append(("/devices", urlencode([("month", m) for m in month_list])))
+    out = {"devices": await _measure(app, responses, device_queries, iterations)}
+
+    # the most loaded devices: the largest /availability and /device_parts responses
+    _, _, body = await asgi_get(app, "/devices", urlencode([("month", m) for m in month_list]))
+    rows = sorted(json.loads(body), key=lambda r: r["monthly_load_full_sum"] or 0, reverse=True)
+    ids = [r["device_id"] for r in rows[:devices]]
+    for name in ("availability", "device_parts"):
+        queries = [(f"/{name}/{d}", urlencode({"month": m})) for d in ids for m in month_list]
+        out[name] = await _measure(app, responses, queries, iterations) if queries else {"queries": 0}
+    return out
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.2) -> tuple:
+    """(lines, regressions): every timing against the baseline.
+
+    Load times and p50/p95 count as regressions when they exceed both limits; p99 of a few
+    hundred requests is too noisy to gate on and is only listed.
+    """
+    pairs = [(f"load.{k}", report.get("load", {}).get(k), baseline.get("load", {}).get(k)) for k in ("cold_ms", "cached_ms")]
+    for name, modes in report.get("endpoints", {}).items():
+        for mode in ("first", "render", "cached"):
+            for stat in ("p50", "p95", "p99"):
+                old = baseline.get("endpoints", {}).get(name, {}).get(mode, {}).get(stat)
+                pairs.append((f"{name}.{mode}.{stat}", modes.get(mode, {}).get(stat), old))
+    lines, regressions = [], []
+    for key, new, old in pairs:
+        if new is None or old is None:
+            continue
+        ratio = new / old if old else float("inf")
+        line = f"{key:32s} {old:10.2f} -> {new:10.2f} ms ({ratio:5.2f}x)"
+        lines.append(line)
+        if not key.endswith(".p99") and new - old > NOISE_MS and ratio > 1 + threshold:
+            regressions.append(line)
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="directory with DostepnoscWTygodniach.xlsx and Raport_dane.xlsx (default: generate)")
+    parser.add_argument("--groups", type=int, default=200, help="generated resource groups")
+    parser.add_argument("--rows", type=int, default=100000, help="generated RaportProdukcja rows")
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=100, help="requests per endpoint and cache mode")
+    parser.add_argument("--devices", type=int, default=8, help="devices queried on /availability and /device_parts")
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace Python heap peak of the cold load (slower)")
+    parser.add_argument("--out", default="benchmark_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown vs --baseline")
+    args = parser.parse_args(argv)
+
+    from scripts import generate_synthetic_data as gen
+
+    with tempfile.TemporaryDirectory(prefix="bench-data-") as tmp:
+        generated = None
+        data_dir = pathlib.Path(args.data) if args.data else pathlib.Path(tmp)
+        if not args.data:
+            generated = gen.generate(data_dir, args.groups, args.rows, args.weeks, seed=args.seed)
+        report = run(data_dir / gen.DATA_NAME, data_dir / gen.PROD_NAME, args.iterations, args.devices, args.months, args.tracemalloc)
+    if generated is not None:
+        report["generated"] = {k: v for k, v in generated.items() if k not in ("data_file", "prod_file")}
+
+    out = pathlib.Path(args.out)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"load: cold {report['load']['cold_ms']:.0f} ms, cached {report['load']['cached_ms']:.0f} ms; "
+          f"peak RSS {report['memory']['peak_rss_mb']} MB")
+    for name, r in report["endpoints"].items():
+        for mode in ("first", "render", "cached"):
+            s = r.get(mode, {})
+            if s.get("count"):
+                print(f"{name:14s} {mode:7s} p50 {s['p50']:8.2f}  p95 {s['p95']:8.2f}  p99 {s['p99']:8.2f} ms")
+    print(f"raport: {out}")
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+        lines, regressions = compare(report, baseline, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"Regresje ({len(regressions)}):\n" + "\n".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
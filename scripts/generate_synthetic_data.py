@@ -0,0 +1,262 @@
+"""Generate synthetic DostepnoscWTygodniach.xlsx and Raport_dane.xlsx at a chosen scale.
+
+The files have the same sheets and column headers as the real ones, so the app reads them
+unchanged (DATA_FILE_PATH / PROD_FILE_PATH):
+
+- DostepnoscWTygodniach.xlsx: one row per device and ISO week (a few weeks left out),
+- Raport_dane.xlsx: RaportProdukcja (part operations), GrupaZasobow (group -> department) and a
+  small DaneAPS sheet.
+
+Production rows are skewed towards a minority of devices (as in the real report) and their
+'Grupa zasobów' values mix exact device ids, names containing the id (``10011_Frezarki``) and
+groups without any device, so every resolver rule is exercised. Output is deterministic per seed.
+The sheets are written as plain SpreadsheetML (shared strings, one date style), which is
+~20x faster than openpyxl's write-only mode at a million rows and reads back the same.
+
+    python -m scripts.generate_synthetic_data --groups 500 --rows 200000 --out bench_data
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import pathlib
+import zipfile
+from datetime import date, datetime, timedelta
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+DATA_NAME = "DostepnoscWTygodniach.xlsx"
+PROD_NAME = "Raport_dane.xlsx"
+
+AVAILABILITY_HEADER = ("Grupa zasobów", "DostepnoscTygodniowa", "YearWeek", "Year", "Week", "MonthNumber", "MonthName")
+PRODUCTION_HEADER = ("Numer części", "Produkt", "Termin realizacji", "Nr op.", "Ilość pozostała", "Praca + TPZ",
+                     "Grupa zasobów", "Tydzień realizacji", "RokMiesiąc", "ID zlecenia")
+GROUP_HEADER = ("Grupa zasobów", "Dział")
+
+MONTH_NAMES = ("styczeń", "luty", "marzec", "kwiecień", "maj", "czerwiec",
+               "lipiec", "sierpień", "wrzesień", "październik", "listopad", "grudzień")
+# weekly availability levels (hours) and how often they occur
+HOURS = (0.0, 7.5, 30.0, 37.5, 40.0, 75.0, 80.0, 112.5, 120.0)
+HOURS_P = (0.05, 0.03, 0.07, 0.35, 0.1, 0.25, 0.05, 0.07, 0.03)
+GROUP_SUFFIXES = ("_Frezarki", "_Tokarki", " CNC", "-2")
+PRODUCTS = ("Korpus", "Pokrywa", "Wałek", "Tuleja", "Kołnierz", "Wspornik", "Obudowa", "Płyta")
+
+
+_EPOCH = datetime(1899, 12, 30)
+_PACKAGE = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        '{sheets}</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+_COLUMNS = [chr(ord("A") + i) for i in range(26)]
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def write_xlsx(path: pathlib.Path, sheets: list) -> None:
+    """Write `sheets` = [(name, header, rows)] as an .xlsx; up to 26 columns of str, int, float, datetime or None."""
+    strings = {}
+
+    def cell(v, ref: str) -> str:
+        # empty cells are left out, so every cell carries its reference
+        if v is None:
+            return ""
+        if isinstance(v, str):
+            return f'<c r="{ref}" t="s"><v>{strings.setdefault(v, len(strings))}</v></c>'
+        if isinstance(v, datetime):
+            return f'<c r="{ref}" s="1"><v>{(v - _EPOCH) / timedelta(days=1)!r}</v></c>'
+        return f'<c r="{ref}"><v>{v!r}</v></c>'
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, (_, header, rows) in enumerate(sheets, 1):
+            with zf.open(f"xl/worksheets/sheet{i}.xml", "w") as fh:
+                fh.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><worksheet {_NS}><sheetData>'.encode("utf-8"))
+                buf = []
+                for r, row in enumerate(itertools.chain([header], rows), 1):
+                    buf.append(f'<row r="{r}">{"".join(cell(v, f"{c}{r}") for c, v in zip(_COLUMNS, row))}</row>')
+                    if len(buf) >= 5000:
+                        fh.write("".join(buf).encode("utf-8"))
+                        buf = []
+                fh.write(("".join(buf) + "</sheetData></worksheet>").encode("utf-8"))
+        shared = "".join(f'<si><t xml:space="preserve">{escape(s)}</t></si>' for s in strings)
+        zf.writestr("xl/sharedStrings.xml", f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    f'<sst {_NS} count="{len(strings)}" uniqueCount="{len(strings)}">{shared}</sst>')
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(sheets) + 1))
+        zf.writestr("[Content_Types].xml", _PACKAGE["[Content_Types].xml"].format(sheets=overrides))
+        zf.writestr("_rels/.rels", _PACKAGE["_rels/.rels"])
+        zf.writestr("xl/styles.xml", _PACKAGE["xl/styles.xml"])
+        zf.writestr("xl/workbook.xml", f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><workbook {_NS} {_NS_R}><sheets>' + "".join(
+            f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, (name, _, _) in enumerate(sheets, 1)) + "</sheets></workbook>")
+        rels = "".join(
+            f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(sheets) + 1))
+        n = len(sheets)
+        rels += (f'<Relationship Id="rId{n + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+                 f'<Relationship Id="rId{n + 2}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>')
+        zf.writestr("xl/_rels/workbook.xml.rels", '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>')
+
+
+def device_ids(groups: int) -> list:
+    """`groups` distinct 5-digit resource group ids (10011, 10012, ...)."""
+    return [str(10011 + i) for i in range(groups)]
+
+
+def iso_weeks(start: date, weeks: int) -> list:
+    """(year, week, monday) of `weeks` consecutive ISO weeks from the one containing `start`."""
+    monday = start - timedelta(days=start.weekday())
+    out = []
+    for i in range(weeks):
+        d = monday + timedelta(weeks=i)
+        y, w, _ = d.isocalendar()
+        out.append((y, w, d))
+    return out
+
+
+def _week_month(monday: date) -> tuple:
+    # ISO convention: a week belongs to the month of its Thursday
+    thursday = monday + timedelta(days=3)
+    return thursday.year, thursday.month
+
+
+def availability_rows(devices: list, weeks: list, rng: np.random.Generator) -> list:
+    """Rows of the availability sheet: one per device and week, ~3% of the weeks left out."""
+    hours = rng.choice(HOURS, size=(len(devices), len(weeks)), p=HOURS_P)
+    present = rng.random((len(devices), len(weeks))) > 0.03
+    rows = []
+    for di, device in enumerate(devices):
+        for wi, (y, w, monday) in enumerate(weeks):
+            if present[di, wi]:
+                _, month = _week_month(monday)
+                rows.append((device, float(hours[di, wi]), f"{y}-{w:02d}", y, w, month, MONTH_NAMES[month - 1]))
+    return rows
+
+
+def production_groups(devices: list, rng: np.random.Generator) -> tuple:
+    """(group names, device index of each group or -1): exact ids, names containing an id, unmatched groups."""
+    names, owner = [], []
+    for i, device in enumerate(devices):
+        names.append(device)
+        owner.append(i)
+        if rng.random() < 0.25:
+            names.append(device + GROUP_SUFFIXES[int(rng.integers(len(GROUP_SUFFIXES)))])
+            owner.append(i)
+    for i in range(max(1, len(devices) // 20)):
+        names.append(f"ZEW{i:04d}")
+        owner.append(-1)
+    return names, np.asarray(owner)
+
+
+def production_sheets(devices: list, weeks: list, rows: int, rng: np.random.Generator) -> tuple:
+    """(sheets of Raport_dane.xlsx for write_xlsx, counts of what they contain)."""
+    names, owner = production_groups(devices, rng)
+    # Zipf-like popularity: a few groups carry most of the operations
+    weights = rng.permutation(1.0 / np.arange(1, len(names) + 1) ** 0.8)
+    group = rng.choice(len(names), size=rows, p=weights / weights.sum())
+    week = rng.integers(0, len(weeks), size=rows)
+    parts = max(10, rows // 20)
+    part = rng.integers(0, parts, size=rows)
+    op = rng.integers(1, 60, size=rows) * 5
+    qty = rng.integers(1, 500, size=rows)
+    work = np.round(rng.gamma(1.5, 4.0, size=rows), 2)
+    order = 3000000 + rng.integers(0, max(1000, rows // 3), size=rows)
+    empty_work = rng.random(rows) < 0.01
+
+    week_cells = []
+    for y, w, monday in weeks:
+        ym = _week_month(monday)
+        week_cells.append((datetime.combine(monday + timedelta(days=4), datetime.min.time()), w, f"{ym[0]}-{ym[1]:02d}"))
+    part_names = [f"QE{p:06d}" for p in range(parts)]
+
+    def production():
+        for g, wi, p, o, q, h, missing, z in zip(group.tolist(), week.tolist(), part.tolist(), op.tolist(),
+                                                qty.tolist(), work.tolist(), empty_work.tolist(), order.tolist()):
+            termin, w, ym = week_cells[wi]
+            yield (part_names[p], PRODUCTS[p % len(PRODUCTS)], termin, o, q, None if missing else h, names[g], w, ym, z)
+
+    departments = max(1, len(devices) // 25)
+    group_rows = [(name, f"Dział {(dev if dev >= 0 else len(name)) % departments + 1}") for name, dev in zip(names, owner.tolist())]
+    sheets = [
+        ("RaportProdukcja", PRODUCTION_HEADER, production()),
+        ("GrupaZasobow", GROUP_HEADER, group_rows),
+        ("DaneAPS", ("Zasób", "Tydzień", "Obciążenie"), [(d, weeks[0][1], 0.0) for d in devices[:10]]),
+    ]
+    return sheets, {"production_rows": rows, "production_groups": len(names), "parts": parts}
+
+
+def generate(out_dir, groups: int = 50, rows: int = 10000, weeks: int = 52, start: date = None, seed: int = 1) -> dict:
+    """Write both workbooks into `out_dir`; returns their paths and what they contain."""
+    if groups < 1 or rows < 0 or weeks < 1:
+        raise ValueError("groups i weeks muszą być dodatnie, rows nieujemne")
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    devices = device_ids(groups)
+    week_list = iso_weeks(start or date(date.today().year, 1, 1), weeks)
+    data_path, prod_path = out / DATA_NAME, out / PROD_NAME
+    info = {
+        "data_file": str(data_path),
+        "prod_file": str(prod_path),
+        "groups": groups,
+        "weeks": weeks,
+        "first_week": f"{week_list[0][0]}-{week_list[0][1]:02d}",
+        "seed": seed,
+    }
+    avail = availability_rows(devices, week_list, rng)
+    write_xlsx(data_path, [("Arkusz1", AVAILABILITY_HEADER, avail)])
+    info["availability_rows"] = len(avail)
+    sheets, counts = production_sheets(devices, week_list, rows, rng)
+    write_xlsx(prod_path, sheets)
+    info.update(counts)
+    logging.getLogger(__name__).info("Wygenerowano dane testowe: %s", info)
+    return info
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="bench_data", help="output directory")
+    parser.add_argument("--groups", type=int, default=50, help="resource groups (devices), e.g. 50-5000")
+    parser.add_argument("--rows", type=int, default=10000, help="RaportProdukcja rows, e.g. 10k-2M")
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="first week (YYYY-MM-DD), default 1 Jan this year")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    info = generate(args.out, args.groups, args.rows, args.weeks, args.start, args.seed)
+    for k, v in info.items():
+        print(f"{k}: {v}")
+    return info
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -4,7 +4,8 @@ set DIST_DIR=%~dp0dist\ObciazenieApp
 if exist "%DIST_DIR%\ObciazenieApp.exe" (
   cd /d "%DIST_DIR%"
   start "" "ObciazenieApp.exe"
-  timeout /t 2 >nul
+  rem wait until the data is loaded and the default view is warm (max 10 min)
+  powershell -NoProfile -Command "for($i=0;$i -lt 600;$i++){ try { Invoke-RestMethod -Uri 'http://127.0.0.1:8000/health/ready' -TimeoutSec 5 | Out-Null; break } catch { Start-Sleep -Seconds 1 } }"
   start "" "http://127.0.0.1:8000/"
 ) else (
   echo Error: "%DIST_DIR%\ObciazenieApp.exe" not found.
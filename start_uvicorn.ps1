@@ -1,4 +1,8 @@
 $p = Start-Process -FilePath 'C:\Users\jmichalak\AppData\Local\Microsoft\WindowsApps\python3.11.exe' -ArgumentList '-m','uvicorn','app.main:app','--host','127.0.0.1','--port','8000' -WorkingDirectory 'C:\Users\jmichalak\Desktop\Projekt Obciążenie nowa wersja' -WindowStyle Hidden -PassThru
 Write-Output "PID:$($p.Id)"
-Start-Sleep -Seconds 1
-Try { Invoke-RestMethod -Uri 'http://127.0.0.1:8000/' -Method GET -TimeoutSec 5 } Catch { Write-Output "ERR:" + $_.Exception.Message }
+# wait until the data is loaded and the default view is warm (/health/ready), up to 10 minutes
+$ready = $false
+for($i = 0; $i -lt 600; $i++){
+    Try { Invoke-RestMethod -Uri 'http://127.0.0.1:8000/health/ready' -Method GET -TimeoutSec 5 | Out-Null; $ready = $true; break } Catch { Start-Sleep -Seconds 1 }
+}
+if($ready){ Write-Output 'READY' } else { Write-Output 'NOT READY: sprawdz /health/ready' }
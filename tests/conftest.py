@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from app import main
+from app.engine import build_load_cube
+from app.parts import build_part_store
+from app.resolver import DepartmentIndex, row_index
+from app.snapshot import DataSnapshot
+
+
+@pytest.fixture
+def small_snapshot():
+    """A three-device snapshot built from in-memory frames (no Excel files)."""
+    avail = pd.DataFrame({
+        "device": ["A1", "A1", "B2", "B2", "C3"],
+        "year": [2025, 2025, 2025, 2025, 2025],
+        "week": [36, 40, 36, 40, 36],
+        "hours": [40.0, 40.0, 20.0, 20.0, 30.0],
+    })
+    prod = pd.DataFrame({
+        "group": ["A1", "B2", "B2"],
+        "year": [2025, 2025, 2025],
+        "week": [36, 36, 40],
+        "praca_tpz": [10.0, 30.0, 15.0],
+    })
+    parts = build_part_store(pd.DataFrame({
+        "Numer części": ["P1", "P2", "P3"],
+        "Grupa zasobów": ["A1", "B2", "B2"],
+        "Tydzień realizacji": [36, 36, 40],
+        "RokMiesiąc": ["2025-09", "2025-09", "2025-09"],
+        "Praca + TPZ": [10.0, 30.0, 15.0],
+    }))
+    cube = build_load_cube(avail, prod)
+    group_map = {"b2": "Frezowanie"}
+    return DataSnapshot(
+        (("availability", "avail.xlsx", 1, 1),),
+        availability=avail,
+        device_rows=row_index(avail["device"]),
+        production=prod,
+        group_map=group_map,
+        departments=DepartmentIndex(group_map, cube.devices),
+        scalanie_map={"a1": "Frezarka"},
+        parts=parts,
+        parts_error=None,
+        cube=cube,
+        resolver=cube.resolver,
+    )
+
+
+@pytest.fixture
+def snap(small_snapshot):
+    """small_snapshot pinned as the one the endpoints serve."""
+    token = main.snapshots.pin(small_snapshot)
+    yield small_snapshot
+    main.snapshots.unpin(token)
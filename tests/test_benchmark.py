@@ -0,0 +1,44 @@
+import pandas as pd
+
+from app import main
+from app.xlsx_reader import open_workbook, read_columns
+from scripts import benchmark
+from scripts import generate_synthetic_data as gen
+
+
+def test_generated_workbooks_read_like_the_real_ones(tmp_path):
+    info = gen.generate(tmp_path, groups=6, rows=400, weeks=6, seed=3)
+    avail = main._parse_availability(tmp_path / gen.DATA_NAME)
+    assert len(avail) == info["availability_rows"] > 0
+    assert avail["device"].nunique() == 6
+    wb = open_workbook(tmp_path / gen.PROD_NAME)
+    try:
+        raw = read_columns(wb["RaportProdukcja"], main._raport_columns)
+        groups = main._read_group_table(wb)
+    finally:
+        wb.close()
+    assert len(raw) == 400
+    assert pd.api.types.is_datetime64_any_dtype(raw["Termin realizacji"])
+    assert set(raw["Grupa zasobów"].astype(str)) <= set(groups["group"])
+    assert main._normalize_production(raw)["praca_tpz"].sum() > 0
+    # same seed, same files
+    again = gen.generate(tmp_path / "again", groups=6, rows=400, weeks=6, seed=3)
+    assert again["availability_rows"] == info["availability_rows"]
+
+
+def test_benchmark_report_and_baseline_comparison(tmp_path):
+    gen.generate(tmp_path, groups=5, rows=300, weeks=10, seed=1)
+    snapshots, data_file = main.snapshots, main.DATA_FILE
+    report = benchmark.run(tmp_path / gen.DATA_NAME, tmp_path / gen.PROD_NAME, iterations=4, devices=2, months=2)
+    # the app's globals are restored afterwards
+    assert main.snapshots is snapshots and main.DATA_FILE == data_file
+    assert report["data"]["devices"] == 5 and report["load"]["cold_ms"] > 0
+    for name in ("devices", "availability", "device_parts"):
+        r = report["endpoints"][name]
+        assert r["errors"] == 0
+        assert r["render"]["count"] == 4 and r["render"]["p50"] <= r["render"]["p99"]
+
+    slower = {"load": {"cold_ms": report["load"]["cold_ms"] * 3 + 10, "cached_ms": report["load"]["cached_ms"]}}
+    lines, regressions = benchmark.compare(slower, report)
+    assert [r.split()[0] for r in regressions] == ["load.cold_ms"]
+    assert len(lines) == 2
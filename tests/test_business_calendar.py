@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.business_calendar import BusinessCalendar, load_holidays
+
+
+def brute_workdays(start, end, holidays=()):
+    n = 0
+    d = start
+    while d <= end:
+        if d.weekday() < 5 and d not in holidays:
+            n += 1
+        d += timedelta(days=1)
+    return n
+
+
+def test_week_table_matches_isocalendar():
+    cal = BusinessCalendar(2019, 2027)
+    for y in range(2019, 2028):
+        for w in range(1, 54):
+            try:
+                expected = (date.fromisocalendar(y, w, 1), date.fromisocalendar(y, w, 7))
+            except ValueError:
+                assert cal.week_index([y], [w])[0] == -1
+                with pytest.raises(ValueError):
+                    cal.week_range(y, w)
+                continue
+            assert cal.week_range(y, w) == expected
+
+
+def test_workdays_and_month_overlap_with_holidays():
+    holidays = {date(2025, 11, 11), date(2025, 12, 25), date(2025, 12, 26)}
+    cal = BusinessCalendar(2025, 2026, holidays)
+    assert cal.working_days_in_month(2025, 11) == brute_workdays(date(2025, 11, 1), date(2025, 11, 30), holidays)
+    assert cal.workdays_between(date(2025, 12, 20), date(2026, 1, 5)) == brute_workdays(date(2025, 12, 20), date(2026, 1, 5), holidays)
+    # ISO week 1 of 2026 (Dec 29 - Jan 4) is split between December and January
+    idx = cal.week_index([2026], [1])
+    touch_dec, days_dec = cal.range_weights(idx, date(2025, 12, 1), date(2025, 12, 31))
+    touch_jan, days_jan = cal.range_weights(idx, date(2026, 1, 1), date(2026, 1, 31))
+    assert touch_dec[0] and touch_jan[0]
+    assert (days_dec[0], days_jan[0]) == (3, 2)
+    # a partial span falls back to the cumulative array
+    touch, days = cal.range_weights(idx, date(2025, 12, 31), date(2026, 1, 1))
+    assert touch[0] and days[0] == 2
+
+
+def test_out_of_range_spans_fall_back_to_busday_count():
+    cal = BusinessCalendar(2025, 2025)
+    assert cal.workdays_between(date(2030, 1, 1), date(2030, 1, 31)) == brute_workdays(date(2030, 1, 1), date(2030, 1, 31))
+    assert cal.working_days_in_month(2030, 2) == brute_workdays(date(2030, 2, 1), date(2030, 2, 28))
+    assert int(cal.workdays(np.datetime64('2025-03-10'), np.datetime64('2025-03-01'))) == 0
+
+
+def test_load_holidays_skips_comments_and_junk(tmp_path):
+    f = tmp_path / "holidays.txt"
+    f.write_text("# plant holidays\n2025-12-24 Wigilia\n2025-12-25,Boze Narodzenie\nnot-a-date\n\n", encoding="utf-8")
+    assert load_holidays(f) == [date(2025, 12, 24), date(2025, 12, 25)]
+    assert load_holidays(tmp_path / "missing.txt") == []
@@ -0,0 +1,98 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from app import cache
+
+
+def source_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    src = tmp_path / "Raport_dane.xlsx"
+    src.write_bytes(b"workbook")
+    return src
+
+
+def test_round_trip_maps_numeric_and_encodes_strings(tmp_path, monkeypatch):
+    src = source_file(tmp_path, monkeypatch)
+    df = pd.DataFrame({
+        "group": ["KOM. 01", None, "KOM. 01", "PIŁA 2"],
+        "year": np.array([2025, 2025, 2026, 2026], dtype=np.int64),
+        "praca_tpz": [1.5, 0.0, np.nan, 2.25],
+        "start": np.array(["2025-09-01", "2025-09-08", "2025-12-29", "2026-01-05"], dtype="datetime64[D]"),
+        "mixed": pd.Series(["a", 7, None, "a"], dtype=object),
+    })
+    cache.save_df(src, "production", df)
+    out = cache.load_df(src, "production")
+    assert list(out.columns) == list(df.columns)
+    assert out["group"].tolist()[0] == "KOM. 01" and pd.isna(out["group"][1])
+    assert out["mixed"].tolist()[:2] == ["a", 7]
+    np.testing.assert_array_equal(out["praca_tpz"].to_numpy(), df["praca_tpz"].to_numpy())
+    np.testing.assert_array_equal(out["start"].to_numpy(), df["start"].to_numpy())
+    # numeric columns are served straight from the mapped file
+    cols = cache.load_columns(src, "production")
+    assert isinstance(cols["year"], np.memmap) and not cols["year"].flags.writeable
+    # the dictionary holds each distinct string once
+    meta = json.loads(next(cache.CACHE_DIR.glob("*/meta.json")).read_text(encoding="utf-8"))
+    assert next(c for c in meta["columns"] if c["name"] == "group")["values"] == ["KOM. 01", "PIŁA 2"]
+
+
+def test_tables_are_keyed_by_name_and_file_version(tmp_path, monkeypatch):
+    src = source_file(tmp_path, monkeypatch)
+    cache.save_df(src, "production", pd.DataFrame({"x": [1, 2]}))
+    assert cache.load_df(src, "group_map") is None
+    src.write_bytes(b"a newer, longer workbook")
+    assert cache.load_df(src, "production") is None
+
+
+def test_unfinished_or_corrupt_tables_are_ignored(tmp_path, monkeypatch):
+    src = source_file(tmp_path, monkeypatch)
+    cache.save_columns(src, "parts", {"week": np.arange(5)})
+    table = next(p for p in cache.CACHE_DIR.iterdir() if p.is_dir())
+    (table / "c0.npy").write_bytes(b"garbage")
+    assert cache.load_columns(src, "parts") is None
+    assert not table.exists()
+
+
+def test_fingerprint_ignores_touch(tmp_path, monkeypatch):
+    src = source_file(tmp_path, monkeypatch)
+    cache.save_df(src, "production", pd.DataFrame({"x": [1, 2]}))
+    st = src.stat()
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    assert cache.load_df(src, "production") is not None
+    monkeypatch.setenv("CACHE_FINGERPRINT", "0")
+    assert cache.load_df(src, "production") is None
+
+
+def test_same_size_edit_in_the_middle_of_a_csv_changes_the_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    src = tmp_path / "Scalanie17.csv"
+    body = "10011;Frezarka\n" * 20000
+    src.write_text(body, encoding="utf-8")
+    cache.save_df(src, "display_names", pd.DataFrame({"x": [1]}))
+    st = src.stat()
+    middle = len(body) // 2
+    src.write_text(body[:middle] + "X" + body[middle + 1:], encoding="utf-8")
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert src.stat().st_size == st.st_size
+    cache._fingerprints.clear()
+    assert cache.load_df(src, "display_names") is None
+
+
+def test_sweep_evicts_least_recently_used(tmp_path, monkeypatch):
+    src = source_file(tmp_path, monkeypatch)
+    for i, name in enumerate(["a", "b", "c"]):
+        cache.save_columns(src, name, {"x": np.arange(1000)})
+        os.utime(cache._table_dir(src, name) / "meta.json", (1000 + i, 1000 + i))
+    cache.load_columns(src, "a")  # a becomes the most recently used
+    (cache.CACHE_DIR / "old.pkl").write_bytes(b"legacy")
+    before = cache.stats()
+    table_size = cache._dir_size(cache._table_dir(src, "a"))
+    cache.sweep(max_bytes=2 * table_size)
+    assert cache.load_columns(src, "b") is None
+    assert cache.load_columns(src, "a") is not None and cache.load_columns(src, "c") is not None
+    assert not (cache.CACHE_DIR / "old.pkl").exists()
+    after = cache.stats()
+    assert after["evictions"] == before["evictions"] + 1
+    assert after["entries"] == 2 and after["bytes"] <= 2 * table_size
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.concurrency import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def slow_load():
+        calls.append(1)
+        gate.wait(2)
+        return "df"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", slow_load))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["df"] * 5
+    assert len(calls) == 1
+    assert not flights.in_flight("k")
+
+
+def test_async_waiters_share_result_and_errors():
+    flights = SingleFlight()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    def broken():
+        raise FileNotFoundError("nas down")
+
+    async def run():
+        ok = await asyncio.gather(*[flights.do_async("a", slow_load) for _ in range(4)])
+        errs = await asyncio.gather(*[flights.do_async("b", broken) for _ in range(3)], return_exceptions=True)
+        return ok, errs
+
+    ok, errs = asyncio.run(run())
+    assert ok == [1, 1, 1, 1]
+    assert all(isinstance(e, FileNotFoundError) for e in errs)
+    # a later call runs again instead of reusing the finished one
+    assert flights.do("a", slow_load) == 2
+
+
+def test_leader_exception_propagates_to_caller():
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do("x", lambda: (_ for _ in ()).throw(ValueError("bad sheet")))
+    assert not flights.in_flight("x")
@@ -0,0 +1,62 @@
+import asyncio
+import json
+from datetime import date
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+
+from app import main
+
+
+def call(endpoint, *args, **kwargs):
+    return json.loads(asyncio.run(endpoint(*args, **kwargs)).body)
+
+
+def test_batch_matches_single_device_endpoints(snap):
+    month = ["2025-09"]
+    got = call(main.device_details, month=month, device=["a1", "B2"], top=0, prorate=False)
+    assert [d["device_id"] for d in got["devices"]] == ["a1", "B2"]
+    for detail in got["devices"]:
+        assert detail["availability"] == call(main.availability, detail["device_id"], month=month, prorate=False)
+        assert detail["parts"] == call(main.device_parts, detail["device_id"], month=month)
+    assert got["devices"][1]["availability"]["monthly_load_full_sum"] == 45.0
+    main.DeviceDetailsResponse.model_validate(got)
+
+
+def test_top_adds_largest_shortage_and_reports_missing_devices(snap):
+    got = call(main.device_details, month=["2025-09"], device=["nope", "b2"], top=2, prorate=False)
+    # prorated shortage: B2 -8h, C3 +30h, A1 +46h; B2 is already requested (case-insensitively)
+    assert [d["device_id"] for d in got["devices"]] == ["nope", "b2", "C3"]
+    assert got["devices"][0]["error"] == "Nie znaleziono urządzenia" and got["devices"][0]["availability"] is None
+    with pytest.raises(HTTPException):
+        asyncio.run(main.device_details(month=["2025-9x"], device=[], top=0, prorate=False))
+
+
+def test_endpoints_emit_their_response_models(snap):
+    for endpoint, model, args in [
+        (main.devices, List[main.DeviceAggregate], {"month": ["2025-09", "2025-10"]}),
+        (main.availability, main.AvailabilityResponse, {"device_id": "B2", "month": ["2025-09"], "prorate": True}),
+        (main.device_parts, List[main.DevicePartLoad], {"device_id": "B2", "month": ["2025-09"]}),
+    ]:
+        body = asyncio.run(endpoint(**args)).body
+        adapter = TypeAdapter(model)
+        # validating and re-encoding through the model gives the same bytes
+        assert adapter.dump_json(adapter.validate_json(body)) == body
+
+
+def test_date_range_matches_whole_month(snap):
+    by_month = call(main.devices, month=["2025-09"])
+    by_range = call(main.devices, month=[], from_=date(2025, 9, 1), to=date(2025, 9, 30))
+    assert [d["device_id"] for d in by_range] == [d["device_id"] for d in by_month]
+    for a, b in zip(by_range, by_month):
+        assert a["shortage_prorated"] == pytest.approx(b["shortage_prorated"])
+    got = call(main.availability, "B2", month=[], prorate=False, from_=date(2025, 9, 1), to=date(2025, 9, 30))
+    assert got["month"] == "2025-09-01..2025-09-30"
+    assert got["weekly"] == call(main.availability, "B2", month=["2025-09"], prorate=False)["weekly"]
+    for kwargs in ({"month": ["2025-09"], "from_": date(2025, 9, 1), "to": date(2025, 9, 2)},
+                   {"month": [], "from_": date(2025, 9, 2), "to": date(2025, 9, 1)},
+                   {"month": []}):
+        with pytest.raises(HTTPException):
+            asyncio.run(main.devices(**kwargs))
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from app import cache, display_names, main
+
+
+def test_merge_pairs_sorts_unique_names_across_sheets(tmp_path):
+    src = tmp_path / "Scalanie17.xlsx"
+    with pd.ExcelWriter(src, engine="openpyxl") as w:
+        pd.DataFrame({"Grupa zasobów": ["A1", "A1", 200], "Dział": ["x", "x", "y"], "NazwaUrz.": ["Tokarka", "Frezarka", None]}).to_excel(w, sheet_name="S1", index=False)
+        pd.DataFrame({"Grupa Zasobów": ["A1", None], "NazwaUrz.": ["Frezarka", "nan"]}).to_excel(w, sheet_name="S2", index=False)
+    table = display_names.read_table(src)
+    assert table.to_dict("records") == [
+        {"group": "", "names": ""}, {"group": "200", "names": ""}, {"group": "A1", "names": "Frezarka;Tokarka"}]
+
+
+def test_scalanie_map_from_workbook_then_csv_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    src = tmp_path / "Scalanie17.xlsx"
+    pd.DataFrame({"Grupa zasobów": ["A1 "], "NazwaUrz.": ["Frezarka"]}).to_excel(src, index=False)
+    csv = tmp_path / "scalanie_group_name.csv"
+    pd.DataFrame({"group": ["B2"], "names": ["Prasa"]}).to_csv(csv, index=False)
+    monkeypatch.setattr(main, "SCALANIE_FILE", src)
+    monkeypatch.setattr(main, "SCALANIE_CSV", csv)
+    monkeypatch.setattr(main, "_scalanie_cache", None)
+    monkeypatch.setattr(main, "_scalanie_key", None)
+
+    first = main.load_scalanie_map()
+    assert first == {"a1": "Frezarka"}
+    # same file version: the parsed map is reused
+    assert main.load_scalanie_map() is first
+
+    src.unlink()
+    assert main._scalanie_source() == csv
+    assert main.load_scalanie_map() == {"b2": "Prasa"}
@@ -0,0 +1,120 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine import build_load_cube
+
+
+def make_frames():
+    avail = pd.DataFrame({
+        "device": ["A1", "A1", "A1", "B2"],
+        "year": [2025, 2025, 2025, 2025],
+        "week": [36, 40, 53, 36],  # 2025 has no ISO week 53 -> dropped
+        "hours": [40.0, 40.0, 99.0, 20.0],
+    })
+    prod = pd.DataFrame({
+        "group": ["A1", "A1_x", "A1_x", "zzz"],
+        "year": [2025, 2025, 2025, 2025],
+        "week": [36, 36, 40, 36],
+        "praca_tpz": [10.0, 3.0, 5.0, 7.0],
+    })
+    return avail, prod
+
+
+def test_cube_axes_skip_invalid_weeks():
+    avail, prod = make_frames()
+    cube = build_load_cube(avail, prod)
+    assert cube.devices == ["A1", "B2"]
+    assert list(zip(cube.week_years, cube.week_numbers)) == [(2025, 36), (2025, 40)]
+
+
+def test_aggregate_month_with_boundary_week():
+    avail, prod = make_frames()
+    cube = build_load_cube(avail, prod)
+    agg = cube.aggregate([(date(2025, 9, 1), date(2025, 9, 30))])
+    # week 40 (Sep 29 - Oct 5) has 2 of 5 working days in September
+    assert agg["hours_full"][0] == pytest.approx(80.0)
+    assert agg["hours_prorated"][0] == pytest.approx(40.0 + 16.0)
+    # A1 resolves to the exact group only, in every week
+    assert cube.resolver.rules == ["exact", None]
+    assert agg["load_full"][0] == pytest.approx(10.0)
+    assert agg["load_prorated"][0] == pytest.approx(10.0)
+    assert agg["load_full"][1] == 0.0
+    assert list(agg["present"]) == [True, True]
+
+
+def test_aggregate_outside_data_has_no_devices():
+    avail, prod = make_frames()
+    cube = build_load_cube(avail, prod)
+    agg = cube.aggregate([(date(2024, 1, 1), date(2024, 1, 31))])
+    assert not agg["present"].any()
+
+
+def test_aggregate_months_matches_direct_aggregation():
+    avail = pd.DataFrame({
+        "device": ["A1"] * 8 + ["B2"] * 2,
+        "year": [2025] * 10,
+        "week": [31, 35, 36, 40, 44, 45, 48, 49, 35, 40],
+        "hours": [8.0, 40.0, 40.0, 40.0, 30.0, 30.0, 20.0, 20.0, 10.0, 10.0],
+    })
+    prod = pd.DataFrame({"group": ["A1", "A1", "B2"], "year": [2025] * 3, "week": [35, 40, 40], "praca_tpz": [5.0, 7.0, 3.0]})
+    cube = build_load_cube(avail, prod)
+
+    def month_range(y, m):
+        import calendar
+        return date(y, m, 1), date(y, m, calendar.monthrange(y, m)[1])
+
+    selections = [
+        [(2025, 9)],
+        [(2025, 8), (2025, 9)],              # Sep 1 2025 is a Monday: no shared week
+        [(2025, 9), (2025, 10), (2025, 11)],  # week 40 straddles Sep/Oct, week 44 Oct/Nov, week 48 Nov/Dec
+        [(2025, 9), (2025, 11)],             # not adjacent: nothing shared
+        [(2025, 10), (2025, 10)],            # repeated month counts twice when prorating
+    ]
+    for months in selections:
+        expected = cube.aggregate([month_range(*ym) for ym in months])
+        got = cube.aggregate_months(months)
+        for key in ("hours_full", "hours_prorated", "load_full", "load_prorated"):
+            assert got[key] == pytest.approx(expected[key]), (months, key)
+        assert list(got["present"]) == list(expected["present"])
+    # partials are memoized per month
+    assert set(cube._months) == {(2025, 8), (2025, 9), (2025, 10), (2025, 11)}
+
+
+@pytest.mark.parametrize("first,last", [
+    (date(2025, 9, 1), date(2025, 9, 30)),
+    (date(2025, 9, 3), date(2025, 9, 30)),   # starts mid-week
+    (date(2025, 9, 6), date(2025, 9, 7)),    # a weekend: touches week 36, no working days
+    (date(2025, 9, 15), date(2025, 9, 26)),  # only weeks without data
+    (date(2024, 12, 1), date(2026, 2, 1)),   # beyond both ends of the axis
+])
+def test_range_sums_match_direct_aggregation(first, last):
+    avail, prod = make_frames()
+    cube = build_load_cube(avail, prod)
+    got = cube.range_sums(first, last)
+    expected = cube.aggregate([(first, last)])
+    for key in ("hours_full", "hours_prorated", "load_full", "load_prorated"):
+        assert got[key] == pytest.approx(expected[key])
+    assert list(got["present"]) == list(expected["present"])
+
+
+def test_range_sums_over_a_stray_year_stay_sized_by_the_axis():
+    avail, prod = make_frames()
+    avail = pd.concat([avail, pd.DataFrame({"device": ["B2"], "year": [2060], "week": [10], "hours": [8.0]})])
+    cube = build_load_cube(avail, prod)
+    got = cube.range_sums(date(2025, 1, 1), date(2060, 12, 31))
+    expected = cube.aggregate([(date(2025, 1, 1), date(2060, 12, 31))])
+    for key in ("hours_full", "hours_prorated", "load_full", "load_prorated"):
+        assert got[key] == pytest.approx(expected[key])
+    # at most five working days per axis week, not 35 years of them
+    assert cube._prefix_sums()["daily"]["hours"].shape[1] <= 5 * len(cube.week_starts) + 1
+
+
+def test_group_load_keeps_the_cube_sums(small_snapshot):
+    cube = small_snapshot.cube
+    d, g = cube.resolver.pairs()
+    rebuilt = np.zeros_like(cube.load)
+    np.add.at(rebuilt, d, cube.group_load[g])
+    assert np.array_equal(rebuilt, cube.load)
@@ -0,0 +1,37 @@
+import time
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.snapshot import SnapshotManager
+
+
+def test_ready_after_warm_up_with_prerendered_default_view(monkeypatch, tmp_path, small_snapshot):
+    src = tmp_path / "avail.xlsx"
+    src.write_bytes(b"x")
+    built = []
+
+    def build(signature):
+        built.append(signature)
+        return small_snapshot
+
+    monkeypatch.setattr(main, "snapshots", SnapshotManager(lambda: {"availability": src}, build, poll_interval=3600))
+    monkeypatch.setattr(main, "responses", main.ResponseCache())
+    monkeypatch.setattr(main, "_warmup", {**main._warmup, "state": "pending"})
+    with TestClient(main.app) as client:
+        assert client.get("/health/live").json() == {"status": "live"}
+        for _ in range(100):
+            ready = client.get("/health/ready")
+            if ready.status_code == 200:
+                break
+            assert ready.status_code == 503
+            time.sleep(0.02)
+        assert ready.json()["status"] == "ready"
+        assert ready.json()["version"] == small_snapshot.version
+        assert len(built) == 1
+
+        month = date.today().strftime("%Y-%m")
+        r = client.get(f"/devices?month={month}")
+        assert r.status_code == 200
+        assert r.headers["X-Response-Cache"] == "hit"
@@ -0,0 +1,63 @@
+import json
+import logging
+import threading
+
+from fastapi.testclient import TestClient
+
+from app import logging_config, main
+from app.snapshot import SnapshotManager
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.gate.wait(5)
+        self.records.append(self.format(record))
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking():
+    slow = BlockingHandler()
+    handler, listener = logging_config.build_pipeline([slow], queue_size=2)
+    log = logging.getLogger("test.queued")
+    log.propagate = False
+    log.addHandler(handler)
+    try:
+        # the listener takes one record and blocks in emit; two more fill the queue
+        for i in range(10):
+            log.warning("line %d", i)
+        assert handler.dropped >= 6
+        slow.gate.set()
+    finally:
+        listener.stop()
+        log.removeHandler(handler)
+    assert len(slow.records) == 10 - handler.dropped
+    assert slow.records[0] == "line 0"
+
+
+def test_access_record_as_json_with_stage_timings():
+    record = logging.LogRecord(logging_config.ACCESS_LOGGER, logging.INFO, __file__, 1, "GET %s", ("/devices",), None)
+    record.access = {"method": "GET", "route": "/devices", "status": 200, "stages": {"aggregate": 0.0125}}
+    entry = json.loads(logging_config.LogFormatter(json_access=True).format(record))
+    assert entry["route"] == "/devices" and entry["stages"] == {"aggregate": 12.5}
+    assert "ts" in entry
+    assert logging_config.LogFormatter().format(record).endswith("GET /devices")
+
+
+def test_requests_log_to_app_access_with_route_and_stages(monkeypatch, tmp_path, small_snapshot, caplog):
+    src = tmp_path / "avail.xlsx"
+    src.write_bytes(b"x")
+    monkeypatch.setenv("WARMUP", "0")
+    monkeypatch.setattr(main, "snapshots", SnapshotManager(lambda: {"availability": src}, lambda sig: small_snapshot, poll_interval=3600))
+    monkeypatch.setattr(main, "responses", main.ResponseCache())
+    with caplog.at_level(logging.INFO, logger=logging_config.ACCESS_LOGGER), TestClient(main.app) as client:
+        assert client.get("/availability/B2?month=2025-09").status_code == 200
+        assert client.get("/availability/B2?month=2025-09").headers["X-Response-Cache"] == "hit"
+    records = [r for r in caplog.records if r.name == logging_config.ACCESS_LOGGER]
+    assert [r.access["cache"] for r in records] == ["miss", "hit"]
+    # a cache hit never reaches the router but is still labelled with its route template
+    assert {r.access["route"] for r in records} == {"/availability/{device_id}"}
+    assert "aggregate" in records[0].access["stages"]
@@ -56,4 +56,22 @@ def test_non_string_values_and_misnamed_columns(tmp_path: Path):
     # should have groups and names concatenated (numbers coerced to strings)
     assert "100" in res['group'].values
     row = res[res['group'] == '100']
-    assert not row.empty
\ No newline at end of file
+    assert not row.empty
+
+def test_only_changed_sheets_are_reparsed(tmp_path: Path, monkeypatch):
+    from app import cache, display_names
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    src = tmp_path / "Scalanie17.xlsx"
+
+    def write(second_names):
+        with pd.ExcelWriter(src, engine="openpyxl") as w:
+            pd.DataFrame({"Grupa Zasobów": ["100", "100"], "NazwaUrz.": ["B", "A"]}).to_excel(w, sheet_name="S1", index=False)
+            pd.DataFrame({"Grupa Zasobów": ["200"] * len(second_names), "NazwaUrz.": second_names}).to_excel(w, sheet_name="S2", index=False)
+
+    write(["C"])
+    assert [hit for _, _, hit in display_names.read_workbook_pairs(src)] == [False, False]
+    write(["D", "C"])
+    assert [hit for _, _, hit in display_names.read_workbook_pairs(src)] == [True, False]
+    res = m.main(str(src), str(tmp_path / "out.csv"))
+    assert res.to_dict("records") == [{"group": "100", "names": "A;B"}, {"group": "200", "names": "C;D"}]
+    assert pd.read_csv(tmp_path / "out.csv", dtype=str).equals(res)
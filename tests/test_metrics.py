@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main, metrics
+from app.concurrency import run_blocking
+from app.snapshot import SnapshotManager
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    h = registry.histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, "load")
+    registry.collector(lambda: [("demo_rows", "gauge", "Rows.", [({"table": 'a"b'}, 7), ({"table": "x"}, None)])])
+    text = registry.render()
+    assert 'obciazenie_demo_seconds_bucket{stage="load",le="0.1"} 1' in text
+    assert 'obciazenie_demo_seconds_bucket{stage="load",le="1.0"} 3' in text
+    assert 'obciazenie_demo_seconds_bucket{stage="load",le="+Inf"} 4' in text
+    assert 'obciazenie_demo_seconds_count{stage="load"} 4' in text
+    assert 'obciazenie_demo_rows{table="a\\"b"} 7' in text
+    assert 'table="x"' not in text
+
+
+def test_stages_are_collected_per_request_including_worker_threads():
+    def blocking():
+        with metrics.stage("parse.test"):
+            pass
+
+    async def handle():
+        stages, token = metrics.start_request()
+        try:
+            with metrics.stage("aggregate.test"):
+                await run_blocking(blocking)
+            with pytest.raises(ValueError), metrics.stage("serialize.test"):
+                raise ValueError("x")
+        finally:
+            metrics.end_request(token)
+        return stages
+
+    errors = metrics.ERRORS.value("serialize.test")
+    stages = asyncio.run(handle())
+    assert set(stages) == {"aggregate.test", "parse.test", "serialize.test"}
+    assert stages["aggregate.test"] >= stages["parse.test"]
+    assert metrics.ERRORS.value("serialize.test") == errors + 1
+    # outside a request only the histogram is updated
+    with metrics.stage("parse.test"):
+        pass
+    assert metrics.STAGE_SECONDS.snapshot("parse.test")[1] >= 2
+
+
+def test_metrics_endpoint_reports_routes_stages_and_snapshot(monkeypatch, tmp_path, small_snapshot):
+    src = tmp_path / "avail.xlsx"
+    src.write_bytes(b"x")
+    monkeypatch.setenv("WARMUP", "0")
+    monkeypatch.setattr(main, "snapshots", SnapshotManager(lambda: {"availability": src}, lambda sig: small_snapshot, poll_interval=3600))
+    monkeypatch.setattr(main, "responses", main.ResponseCache())
+    with TestClient(main.app) as client:
+        r = client.get("/devices?month=2025-09")
+        assert r.status_code == 200
+        assert "aggregate;dur=" in r.headers["Server-Timing"]
+        text = client.get("/metrics").text
+    assert 'obciazenie_http_request_duration_seconds_count{method="GET",route="/devices",status="200"}' in text
+    assert 'obciazenie_stage_seconds_count{stage="serialize"}' in text
+    assert f'obciazenie_snapshot_info{{version="{small_snapshot.version}"}} 1' in text
+    assert 'obciazenie_snapshot_rows{table="devices"} 3' in text
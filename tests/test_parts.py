@@ -0,0 +1,63 @@
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.parts import build_part_store
+
+
+def make_store():
+    df = pd.DataFrame({
+        "Numer części": ["P1", "P2", "P3", "P4", "P5"],
+        "Grupa zasobów": ["10250", "10250_Frezarki", "10250", "999", "10250"],
+        "Tydzień realizacji": [36, 40, "x", 36, 41],
+        "RokMiesiąc": ["2025-09", 2025, "2025-09", "2025-09", None],
+        "Praca + TPZ": [1.5, None, 2.0, 4.0, 3.0],
+        "ID zlecenia": pd.Series([3234586, None, 1, 2, 3], dtype=object),
+    })
+    return build_part_store(df)
+
+
+def test_unparsable_rows_are_dropped():
+    store = make_store()
+    # 'x' week and missing year are skipped
+    assert list(store.part_number) == ["P1", "P2", "P4"]
+    assert list(store.year) == [2025, 2025, 2025]
+
+
+def test_rows_for_prefers_exact_group_and_filters_months():
+    store = make_store()
+    rows = store.rows_for("10250", [(date(2025, 9, 1), date(2025, 9, 30))])
+    assert list(store.part_number[rows]) == ["P1"]
+    assert store.order_id[rows][0] == "3234586"
+
+
+def test_rows_for_falls_back_to_substring_and_digits():
+    store = make_store()
+    rows = store.rows_for("Frezarki", [(date(2025, 9, 1), date(2025, 10, 31))])
+    assert list(store.part_number[rows]) == ["P2"]
+    assert store.praca_tpz[rows][0] == 0.0
+    assert store.order_id[rows][0] is None
+    rows = store.rows_for("G-999", [(date(2025, 9, 1), date(2025, 9, 30))])
+    assert list(store.part_number[rows]) == ["P4"]
+
+
+def test_missing_columns_raise():
+    with pytest.raises(ValueError):
+        build_part_store(pd.DataFrame({"a": [1]}))
+
+
+def test_iter_ndjson_streams_rows_in_chunks():
+    store = make_store()
+    rows = np.arange(len(store))
+    chunks = list(store.iter_ndjson(rows, chunk_rows=2))
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"part_number": "P1", "week": 36, "year": 2025, "praca_tpz": 1.5, "order_id": "3234586"},
+        {"part_number": "P2", "week": 40, "year": 2025, "praca_tpz": 0.0, "order_id": None},
+        {"part_number": "P4", "week": 36, "year": 2025, "praca_tpz": 4.0, "order_id": "2"},
+    ]
+    assert list(store.iter_ndjson(rows[:0])) == []
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from app import cache
+from app import main
+
+
+def write_workbook(path, with_groups=True, with_parts=True):
+    raport = pd.DataFrame({
+        "Grupa zasobów": ["10011 KOM", "10011 KOM", "10250 PIŁA"],
+        "Tydzień realizacji": [36, 36, 37],
+        "RokMiesiąc": ["2025-09", "2025-09", "2025-09"],
+        "Praca + TPZ": [1.5, 2.0, 4.0],
+    })
+    if with_parts:
+        raport["Numer części"] = ["A-1", "A-2", "B-1"]
+        raport["ID zlecenia"] = ["Z1", "Z2", "Z3"]
+    with pd.ExcelWriter(path, engine="openpyxl") as xw:
+        raport.to_excel(xw, sheet_name="RaportProdukcja", index=False)
+        if with_groups:
+            pd.DataFrame({"Grupa zasobów": ["10011 KOM"], "Dział": ["Kompletacja"]}).to_excel(
+                xw, sheet_name="GrupaZasobów", index=False)
+
+
+@pytest.fixture
+def opens(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    (tmp_path / "cache").mkdir()
+    calls = []
+    real = main.open_workbook
+
+    def counting(path):
+        calls.append(path)
+        return real(path)
+
+    monkeypatch.setattr(main, "open_workbook", counting)
+    return calls
+
+
+def test_all_tables_come_from_one_open_then_from_cache(tmp_path, opens):
+    src = tmp_path / "Raport_dane.xlsx"
+    write_workbook(src)
+    tables = main._ingest_production_workbook(src)
+    assert len(opens) == 1
+    assert tables["production"].set_index("group")["praca_tpz"].to_dict() == {"10011 KOM": 3.5, "10250 PIŁA": 4.0}
+    assert len(tables["parts"]) == 3
+    assert tables["groups"]["department"].tolist() == ["Kompletacja"]
+
+    again = main._ingest_production_workbook(src)
+    assert len(opens) == 1
+    assert list(again["parts"].part_number) == ["A-1", "A-2", "B-1"]
+
+
+def test_bad_sheet_does_not_hide_the_others(tmp_path, opens):
+    src = tmp_path / "Raport_dane.xlsx"
+    write_workbook(src, with_groups=False, with_parts=False)
+    tables = main._ingest_production_workbook(src)
+    assert len(opens) == 1
+    assert isinstance(tables["parts"], ValueError)
+    assert tables["groups"].empty
+    assert tables["production"]["praca_tpz"].sum() == 7.5
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from app.resolver import DepartmentIndex, build_resolver, row_index
+
+
+def test_first_matching_rule_wins_per_device():
+    groups = ["10250", "10250 bis", "Frezarki CNC", "G-100 stara", "KOM 7"]
+    res = build_resolver(["10250", " frezarki ", "G100", "XYZ", ""], groups)
+    assert res.rules == ["exact", "contains", "digits", None, "contains"]
+    assert res.groups_for("10250") == ["10250"]
+    assert res.groups_for("FREZARKI") == ["Frezarki CNC"]
+    assert res.groups_for("g100") == ["G-100 stara"]
+    assert res.groups_for("xyz") == []
+    # the empty device id matches every group, as the substring fallback always did
+    assert len(res.groups_for("")) == len(groups)
+
+
+def test_pairs_and_unknown_devices():
+    res = build_resolver(["A1", "B2"], ["A1", "A1_x"], ["B2 old", "A1"])
+    assert res.groups == ["A1", "A1_x", "B2 old"]
+    d, g = res.pairs()
+    assert list(zip(d.tolist(), g.tolist())) == [(0, 0), (1, 2)]
+    # ids outside the availability sheet are resolved on the fly with the same rules
+    codes, rule = res.resolve("a1_")
+    assert rule == "contains" and codes.tolist() == [1]
+    assert res.resolve("C3")[1] is None and isinstance(res.resolve("C3")[0], np.ndarray)
+
+
+def test_department_index_matches_linear_scan():
+    group_map = {"10250 bis": "D2", "10250": "D1", "kom 7": "D3", "kom 7 nowa": "D4"}
+    idx = DepartmentIndex(group_map, ["10250", "KOM", "Kom 7 ", "xyz", ""])
+    assert idx.get("10250") == "D1"          # exact key wins over an earlier substring hit
+    assert idx.get("KOM") == "D3"            # first key in sheet order containing the device
+    assert idx.get("Kom 7 ") == "D3"
+    assert idx.get("xyz") is None and idx.get("") is None
+    # devices outside the index fall back to the same rules
+    assert idx.get("nowa") == "D4"
+
+
+def test_row_index_groups_rows_by_device_key():
+    rows = row_index(pd.Series(["A1", " a1", "B2", "A1", 10023, "b2 "]))
+    assert {k: v.tolist() for k, v in rows.items()} == {"a1": [0, 1, 3], "b2": [2, 5], "10023": [4]}
+    assert row_index(pd.Series([], dtype=object)) == {}
@@ -0,0 +1,58 @@
+from fastapi.testclient import TestClient
+
+from app import main
+from app.response_cache import ResponseCache, etag_matches, make_etag, query_key
+from app.snapshot import SnapshotManager
+
+
+def test_etag_depends_on_version_and_query_as_sent():
+    q1 = query_key([("month", "2025-09"), ("month", "2025-08")])
+    assert make_etag("v1", "/devices", q1) == make_etag("v1", "/devices", query_key([("month", "2025-09"), ("month", "2025-08")]))
+    # the handlers echo the months and keep the device order, so neither may be normalized away
+    for other in ([("month", "2025-08"), ("month", "2025-09")],
+                  [("month", " 2025-09"), ("month", "2025-08")],
+                  [("month", "2025-09"), ("month", "2025-08"), ("month", "2025-08")]):
+        assert make_etag("v1", "/devices", query_key(other)) != make_etag("v1", "/devices", q1)
+    assert make_etag("v2", "/devices", q1) != make_etag("v1", "/devices", q1)
+
+
+def test_if_none_match_parsing():
+    tag = make_etag("v1", "/devices", ())
+    assert etag_matches(f'"other", W/{tag}', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches('"other"', tag) and not etag_matches(None, tag)
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", b"1234", "application/json")
+    cache.put("b", b"5678", "application/json")
+    assert cache.get("a") == (b"1234", "application/json")  # a is now most recent
+    cache.put("c", b"90ab", "application/json")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.put("huge", b"x" * 11, "application/json")
+    assert cache.get("huge") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == 8
+
+
+def test_reordered_query_gets_its_own_body(monkeypatch, tmp_path, small_snapshot):
+    src = tmp_path / "avail.xlsx"
+    src.write_bytes(b"x")
+    monkeypatch.setenv("WARMUP", "0")
+    monkeypatch.setattr(main, "snapshots", SnapshotManager(lambda: {"availability": src}, lambda sig: small_snapshot, poll_interval=3600))
+    monkeypatch.setattr(main, "responses", main.ResponseCache())
+    with TestClient(main.app) as client:
+        first = client.get("/availability/A1?month=2025-09&month=2025-10")
+        second = client.get("/availability/A1?month=2025-10&month=2025-09")
+        assert first.headers["ETag"] != second.headers["ETag"]
+        assert second.headers["X-Response-Cache"] == "miss"
+        assert (first.json()["month"], second.json()["month"]) == ("2025-09,2025-10", "2025-10,2025-09")
+        stale = client.get("/availability/A1?month=2025-10&month=2025-09", headers={"If-None-Match": first.headers["ETag"]})
+        assert stale.status_code == 200
+
+        ab = client.get("/device_details?month=2025-09&device=A1&device=B2").json()
+        ba = client.get("/device_details?month=2025-09&device=B2&device=A1").json()
+        assert [d["device_id"] for d in ab["devices"]] == ["A1", "B2"]
+        assert [d["device_id"] for d in ba["devices"]] == ["B2", "A1"]
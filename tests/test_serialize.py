@@ -0,0 +1,23 @@
+from datetime import date
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app import main
+from app.serialize import check_fields, dumps, records
+
+
+def test_check_fields_rejects_drift():
+    with pytest.raises(TypeError):
+        check_fields(main.DevicePartLoad, ("part_number", "year", "week", "praca_tpz", "order_id"))
+    assert check_fields(main.DevicePartLoad, main.PART_FIELDS) == main.PART_FIELDS
+
+
+def test_encoded_rows_equal_model_json():
+    rows = records(main.PART_FIELDS, ["Ż-1", "P2"], [36, 40], [2025, 2025], [1.5, float("nan")], ["Z1", None])
+    models = [main.DevicePartLoad(**r) for r in rows]
+    assert dumps(rows) == TypeAdapter(List[main.DevicePartLoad]).dump_json(models)
+    week = records(main.WEEKLY_FIELDS, [36], [2025], [40.0], [date(2025, 9, 1)], [date(2025, 9, 7)], [40.0], [1e16], [0.1])
+    assert dumps(week) == TypeAdapter(List[main.WeeklyAvailability]).dump_json([main.WeeklyAvailability(**r) for r in week])
+
@@ -0,0 +1,43 @@
+import asyncio
+import json
+from datetime import date
+
+from app import main, shared
+
+
+def render(snap):
+    token = main.snapshots.pin(snap)
+    try:
+        out = []
+        for endpoint, args in [
+            (main.devices, {"month": ["2025-09", "2025-10"]}),
+            (main.devices, {"month": [], "from_": date(2025, 9, 3), "to": date(2025, 10, 1)}),
+            (main.availability, {"device_id": "B2", "month": ["2025-09"], "prorate": True}),
+            (main.device_parts, {"device_id": "a1", "month": ["2025-09"]}),
+            (main.device_details, {"month": ["2025-09"], "device": ["C3"], "top": 2, "prorate": False}),
+            (main.what_if, {"req": main.WhatIfRequest(month=["2025-09"], moves=[main.LoadMove(group="B2", year=2025, week=36, to_week=40)])}),
+        ]:
+            out.append(json.loads(asyncio.run(endpoint(**args)).body))
+        return out
+    finally:
+        main.snapshots.unpin(token)
+
+
+def test_attached_snapshot_serves_the_same_responses(tmp_path, small_snapshot):
+    shared.publish(small_snapshot, tmp_path)
+    attached = shared.attach(tmp_path, (("shared",),))
+    assert attached.version == small_snapshot.version
+    assert attached.cube.load.base is not None  # a view of the mapped cell table, not a copy
+    assert render(attached) == render(small_snapshot)
+    assert render(attached)[0][0]["department"] == "Frezowanie"
+
+
+def test_republish_switches_pointer_and_prunes_old_versions(tmp_path, small_snapshot):
+    shared.publish(small_snapshot, tmp_path)
+    for i in range(3):
+        small_snapshot.version = f"v{i}"
+        shared.publish(small_snapshot, tmp_path)
+    assert json.loads((tmp_path / shared.CURRENT).read_text())["version"] == "v2"
+    kept = sorted(p.name for p in tmp_path.iterdir() if p.is_dir())
+    assert kept == ["v1", "v2"]
+    assert shared.attach(tmp_path, ()).version == "v2"
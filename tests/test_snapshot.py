@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from app.snapshot import DataSnapshot, SnapshotManager
+
+
+def make_manager(tmp_path, fail=None):
+    src = tmp_path / "data.txt"
+    src.write_text("v1", encoding="utf-8")
+    fail = fail if fail is not None else {"on": False}
+
+    def build(signature):
+        if fail["on"]:
+            raise OSError("share unreachable")
+        return DataSnapshot(signature, text=src.read_text(encoding="utf-8"))
+
+    mgr = SnapshotManager(lambda: {"data": src}, build, poll_interval=3600)
+    return mgr, src, fail
+
+
+def bump(path, text):
+    path.write_text(text, encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_unchanged_sources_reuse_snapshot(tmp_path):
+    mgr, _, _ = make_manager(tmp_path)
+    first = mgr.get()
+    assert first.text == "v1"
+    assert mgr.refresh() is first
+    assert mgr.builds == 1
+    mgr.stop()
+
+
+def test_change_is_swapped_in_and_failures_keep_last_good(tmp_path):
+    mgr, src, fail = make_manager(tmp_path)
+    first = mgr.get()
+    bump(src, "v2")
+    second = mgr.refresh()
+    assert second.text == "v2" and second.version != first.version
+    assert mgr.current is second
+
+    fail["on"] = True
+    bump(src, "v3")
+    assert mgr.refresh() is second
+    status = mgr.status()
+    assert "share unreachable" in status["last_error"]
+    assert status["version"] == second.version
+    assert status["age_seconds"] >= 0
+    mgr.stop()
+
+
+def test_first_build_failure_raises(tmp_path):
+    mgr, _, _ = make_manager(tmp_path, fail={"on": True})
+    with pytest.raises(OSError):
+        mgr.get()
+    assert mgr.current is None
+    mgr.stop()
+
+
+def test_pinned_snapshot_is_served_in_its_context(tmp_path):
+    mgr, src, _ = make_manager(tmp_path)
+    first = mgr.get()
+    token = mgr.pin(first)
+    bump(src, "v2")
+    mgr.refresh()
+    assert mgr.get() is first
+    mgr.unpin(token)
+    assert mgr.get().text == "v2"
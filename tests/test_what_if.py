@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.business_calendar import get_calendar
+from app.engine import build_load_cube
+
+
+def what_if(month, *moves):
+    req = main.WhatIfRequest(month=month, moves=[main.LoadMove(**m) for m in moves])
+    return json.loads(asyncio.run(main.what_if(req)).body)
+
+
+def test_moves_match_a_rebuilt_cube(snap):
+    month = ["2025-09", "2025-10"]
+    got = what_if(month,
+                  {"group": "B2", "year": 2025, "week": 40, "to_week": 36},
+                  {"group": "a1", "year": 2025, "week": 36, "to_group": "B2", "hours": 4})
+    main.WhatIfResponse.model_validate(got)
+    assert [m["hours"] for m in got["moves"]] == [15.0, 4.0]
+    assert got["moves"][1]["group"] == "A1" and got["moves"][1]["to_week"] == 36
+
+    prod = pd.DataFrame({"group": ["A1", "B2"], "year": [2025, 2025], "week": [36, 36], "praca_tpz": [6.0, 49.0]})
+    after = build_load_cube(snap.availability, prod).aggregate_months([(2025, 9), (2025, 10)])
+    before = snap.cube.aggregate_months([(2025, 9), (2025, 10)])
+    changed = {d["device_id"]: d for d in got["devices"]}
+    assert set(changed) == {"A1", "B2"}
+    for dev, row in changed.items():
+        i = snap.cube.devices.index(dev)
+        assert row["monthly_load_full_sum"] == pytest.approx(after["load_full"][i])
+        assert row["monthly_load_prorated_sum"] == pytest.approx(after["load_prorated"][i])
+        assert row["shortage_prorated_before"] == pytest.approx(before["hours_prorated"][i] - before["load_prorated"][i])
+    # most negative prorated shortage first, as in /devices
+    shortages = [d["shortage_prorated"] for d in got["devices"]]
+    assert shortages == sorted(shortages)
+
+
+def test_moves_outside_the_months_change_nothing_and_bad_moves_are_rejected(snap):
+    assert what_if(["2025-08"], {"group": "B2", "year": 2025, "week": 40, "to_week": 36})["devices"] == []
+    for move, status in (({"group": "nope", "year": 2025, "week": 36}, 400),
+                         ({"group": "B2", "year": 2025, "week": 54}, 422),
+                         ({"group": "B2", "year": 10 ** 6, "week": 36}, 422),
+                         ({"group": "B2", "year": 2025, "week": 36, "to_year": 2070}, 422),
+                         ({"group": "B2", "year": 2025, "week": 41}, 422),  # a real week, but not on the cube's axis
+                         ({"group": "B2", "year": 2025, "week": 36, "hours": -1}, 400),
+                         ({"group": "B2", "year": 2025, "week": 36, "hours": float("inf")}, 400),
+                         ({"group": "B2", "year": 2025, "week": 36, "hours": float("nan")}, 400),
+                         ({"group": "B2", "year": 2025, "week": 36, "order_id": "X"}, 400)):
+        with pytest.raises(HTTPException) as exc:
+            what_if(["2025-09"], move)
+        assert exc.value.status_code == status
+
+
+def test_moves_never_widen_the_shared_calendar(snap):
+    calendar = get_calendar()
+    with pytest.raises(HTTPException):
+        what_if(["2025-09"], {"group": "B2", "year": 2025, "week": 36, "to_year": 2070})
+    assert get_calendar() is calendar
+
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+
+from app.xlsx_reader import open_workbook, read_columns
+
+
+def make_sheet(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "RaportProdukcja"
+    ws.append(["Grupa zasobów", "Opis", "Tydzień realizacji", "Praca + TPZ", "Termin realizacji", "Opis"])
+    for i in range(30):
+        # digit-only text in the first rows, text further down: the column must stay text
+        group = str(10000 + i) if i < 20 else f"KOM {i}"
+        ws.append([group, "x" * i, 36 + i % 3, 1.5 * i, datetime(2025, 9, 1 + i % 28), "y"])
+    ws.append([None] * 6)
+    ws.append(["10011", None, "#N/A", 2.0, None, None])
+    ws.append([None] * 6)
+    wb.save(path)
+
+
+def test_matches_read_excel_across_chunks(tmp_path):
+    path = tmp_path / "raport.xlsx"
+    make_sheet(path)
+    expected = pd.read_excel(path, sheet_name="RaportProdukcja")
+    wb = open_workbook(path)
+    try:
+        got = read_columns(wb["RaportProdukcja"], chunk_rows=7)
+    finally:
+        wb.close()
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_projects_columns_by_header(tmp_path):
+    path = tmp_path / "raport.xlsx"
+    make_sheet(path)
+    wb = open_workbook(path)
+    try:
+        got = read_columns(wb["RaportProdukcja"], lambda names: [n for n in names if "Opis" not in n], chunk_rows=4)
+    finally:
+        wb.close()
+    assert list(got.columns) == ["Grupa zasobów", "Tydzień realizacji", "Praca + TPZ", "Termin realizacji"]
+    expected = pd.read_excel(path, sheet_name="RaportProdukcja")[list(got.columns)]
+    pd.testing.assert_frame_equal(got, expected)